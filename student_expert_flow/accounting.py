@@ -0,0 +1,228 @@
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# USD per 1M tokens: (input, cached input, output). Dated snapshots (e.g. "gpt-4.1-mini-2025-04-14")
+# match on the longest prefix. Unknown models are costed at 0 with a one-time warning.
+MODEL_PRICING: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+_warned_models = set()
+
+
+def _as_int(value: Any) -> int:
+    """Returns value if it is an int, else 0 (usage fields can be missing or None)."""
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
+def get_pricing(model: str) -> Optional[Tuple[float, float, float]]:
+    """Looks up per-1M-token prices for a model by longest matching prefix."""
+    matches = [name for name in MODEL_PRICING if model.startswith(name)]
+    if not matches:
+        return None
+    return MODEL_PRICING[max(matches, key=len)]
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    """Estimates the USD cost of one call. Cached input tokens are billed at the cached rate."""
+    pricing = get_pricing(model)
+    if pricing is None:
+        if model not in _warned_models:
+            _warned_models.add(model)
+            logger.warning(
+                f"No pricing known for model '{model}'; its cost is reported as 0.")
+        return 0.0
+    input_price, cached_price, output_price = pricing
+    uncached = max(input_tokens - cached_tokens, 0)
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+
+class CallUsage(BaseModel):
+    """Token usage, wall-clock latency and estimated cost of one model call."""
+    stage: str  # 'expert', 'student', 'summary' or 'fold'
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    latency_s: float = 0.0
+    cost: float = 0.0
+    from_cache: bool = False  # Served from the response cache (no tokens billed)
+    ttft_s: Optional[float] = None  # Streaming only: seconds until the first text delta
+    tokens_per_s: Optional[float] = None  # Streaming only: output tokens / generation time
+    hedged: bool = False  # A duplicate of this call was started (see hedging.py)
+    # Upper bound on the cost of the cancelled copy of a hedged call: the winner's cost. The loser
+    # was cut off before finishing, so it was billed for at most as many output tokens
+    hedge_cost_upper_bound: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+def make_call_usage(stage: str, model: str, input_tokens: int, output_tokens: int, cached_tokens: int, latency_s: float) -> CallUsage:
+    """Builds a CallUsage with its cost filled in."""
+    return CallUsage(
+        stage=stage, model=model,
+        input_tokens=input_tokens, output_tokens=output_tokens, cached_tokens=cached_tokens,
+        latency_s=latency_s,
+        cost=estimate_cost(model, input_tokens, output_tokens, cached_tokens))
+
+
+def usage_from_run_result(result: Any, stage: str, model: str, latency_s: float) -> CallUsage:
+    """Sums the usage of every raw model response in an agents ``RunResult``.
+
+    A single ``Runner.run`` can make several model requests (e.g. around hosted tool calls).
+    """
+    input_tokens = output_tokens = cached_tokens = 0
+    for response in getattr(result, 'raw_responses', None) or []:
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            continue
+        input_tokens += _as_int(getattr(usage, 'input_tokens', 0))
+        output_tokens += _as_int(getattr(usage, 'output_tokens', 0))
+        details = getattr(usage, 'input_tokens_details', None)
+        cached_tokens += _as_int(getattr(details, 'cached_tokens', 0))
+    return make_call_usage(stage, model, input_tokens, output_tokens, cached_tokens, latency_s)
+
+
+def usage_from_completion(response: Any, stage: str, model: str, latency_s: float) -> CallUsage:
+    """Extracts usage from a Chat Completions response (``response.usage``)."""
+    usage = getattr(response, 'usage', None)
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return make_call_usage(
+        stage, model,
+        _as_int(getattr(usage, 'prompt_tokens', 0)),
+        _as_int(getattr(usage, 'completion_tokens', 0)),
+        _as_int(getattr(details, 'cached_tokens', 0)),
+        latency_s)
+
+
+class RetryRecord(BaseModel):
+    """One failed attempt of an expert/student call that was retried (see retry.py)."""
+    stage: str
+    turn: int
+    attempt: int  # 1 for the first retry
+    kind: str  # 'transient' or 'parse'
+    error: str
+    delay_s: float = 0.0  # Backoff before the retry
+    cost_before: float = 0.0  # Dialogue spend when the call failed
+    tokens_before: int = 0
+    recovered: bool = False  # A later attempt of the same call succeeded
+
+
+class CancellationRecord(BaseModel):
+    """An expert/student call cancelled by the turn timeout or the dialogue deadline."""
+    stage: str
+    turn: int
+    reason: str  # 'turn_timeout' or 'dialogue_deadline'
+    timeout_s: float  # Time the call was allowed
+    elapsed_s: float  # Dialogue time when it was cancelled
+
+
+class DialogueReport(BaseModel):
+    """Per-dialogue accounting: every model call, totals, and why the dialogue stopped."""
+    calls: List[CallUsage] = []
+    stop_reason: Optional[str] = None
+    tokens_saved_by_compaction: int = 0
+    summary_mode: Optional[str] = None  # 'rolling' or 'posthoc'
+    summary_tail_latency_s: Optional[float] = None  # Time from dialogue end until the summary was ready
+    summary_latency_saved_s: Optional[float] = None  # Rolling mode: estimated saving vs. post-hoc
+    retries: List[RetryRecord] = []
+    cancellations: List[CancellationRecord] = []
+
+    def add(self, call: CallUsage) -> None:
+        self.calls.append(call)
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(c.input_tokens for c in self.calls)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(c.output_tokens for c in self.calls)
+
+    @property
+    def cached_tokens(self) -> int:
+        return sum(c.cached_tokens for c in self.calls)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(c.total_tokens for c in self.calls)
+
+    @property
+    def total_cost(self) -> float:
+        """Estimated spend, including an upper bound on the cancelled copies of hedged calls."""
+        return sum(c.cost + c.hedge_cost_upper_bound for c in self.calls)
+
+    @property
+    def hedge_cost_upper_bound(self) -> float:
+        return sum(c.hedge_cost_upper_bound for c in self.calls)
+
+    def _first_recovered_retry(self) -> Optional[RetryRecord]:
+        return next((r for r in self.retries if r.recovered), None)
+
+    @property
+    def spend_saved_by_retries(self) -> float:
+        """Spend a dialogue without retries would have thrown away: all of it up to the first recovered error.
+
+        Failed attempts are not included in the spend (their usage is unknown).
+        """
+        first = self._first_recovered_retry()
+        return first.cost_before if first is not None else 0.0
+
+    @property
+    def tokens_saved_by_retries(self) -> int:
+        first = self._first_recovered_retry()
+        return first.tokens_before if first is not None else 0
+
+    @property
+    def model_latency_s(self) -> float:
+        return sum(c.latency_s for c in self.calls)
+
+    @property
+    def blocking_latency_s(self) -> float:
+        """Model time the dialogue actually waited for: agent calls plus the end-of-dialogue summary wait.
+
+        Background work (context folds, rolling summary updates) overlaps with the turns and is excluded.
+        """
+        agent_latency = sum(
+            c.latency_s for c in self.calls if c.stage in ('expert', 'student'))
+        return agent_latency + (self.summary_tail_latency_s or 0.0)
+
+    def budget_exceeded(self, max_total_tokens: Optional[int] = None, max_cost: Optional[float] = None) -> Optional[str]:
+        """Returns a description of the first exceeded budget, or None if within budget."""
+        if max_total_tokens is not None and self.total_tokens >= max_total_tokens:
+            return f"token budget exceeded ({self.total_tokens} >= {max_total_tokens})"
+        if max_cost is not None and self.total_cost >= max_cost:
+            return f"cost budget exceeded (${self.total_cost:.4f} >= ${max_cost:.4f})"
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializes the report including its computed totals."""
+        data = self.model_dump()
+        data['totals'] = {
+            "calls": len(self.calls),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": self.cached_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": self.total_cost,
+            "model_latency_s": self.model_latency_s,
+            "blocking_latency_s": self.blocking_latency_s,
+            "hedged_calls": sum(1 for c in self.calls if c.hedged),
+            "hedge_cost_upper_bound": self.hedge_cost_upper_bound,
+            "retries": len(self.retries),
+            "reasks": sum(1 for r in self.retries if r.kind == 'parse'),
+            "recovered_calls": len({(r.stage, r.turn) for r in self.retries if r.recovered}),
+            "spend_saved_by_retries": self.spend_saved_by_retries,
+            "tokens_saved_by_retries": self.tokens_saved_by_retries,
+        }
+        return data
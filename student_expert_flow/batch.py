@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import time
+from typing import List, Dict, Any, Optional, Literal, Tuple
+
+from pydantic import BaseModel
+
+from student_expert_flow.config import AdaptiveConcurrencyConfig, BatchJob, get_config_registry
+from student_expert_flow.concurrency import AIMDLimiter, ConcurrencyMetrics
+from student_expert_flow.scheduler import get_scheduler
+from student_expert_flow.participants import get_agent_registry
+from student_expert_flow.runner import run_dialogue, resume_dialogue
+from student_expert_flow.checkpoint import find_checkpoints
+from student_expert_flow.accounting import DialogueReport
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJobResult(BaseModel):
+    """Outcome of a single job in a batch run."""
+    index: int
+    name: str
+    status: Literal['completed', 'failed']
+    goal_achieved: bool = False
+    history_length: int = 0
+    turns: int = 0
+    duration_s: float = 0.0
+    total_tokens: int = 0
+    cost: float = 0.0
+    hedge_cost_upper_bound: float = 0.0  # Upper bound on the cost of cancelled hedge duplicates (included in cost)
+    retries: int = 0  # Retried or re-asked expert/student calls
+    spend_saved_by_retries: float = 0.0  # Spend that aborting on the first recovered error would have wasted
+    model_latency_s: float = 0.0  # Time spent waiting on model calls (excluding background folds)
+    summary_tail_latency_s: Optional[float] = None  # Wait for the summary after the dialogue ended
+    stop_reason: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchReport(BaseModel):
+    """Per-job results plus aggregate throughput figures for a batch run."""
+    results: List[BatchJobResult]
+    concurrency: int
+    total_duration_s: float
+    completed: int
+    failed: int
+    dialogues_per_second: float
+    turns_per_second: float
+    total_tokens: int = 0
+    total_cost: float = 0.0
+    total_hedge_cost_upper_bound: float = 0.0
+    total_retries: int = 0
+    total_spend_saved_by_retries: float = 0.0
+    # Adaptive mode only: final limits and their history, keyed 'dialogues' and 'calls'
+    concurrency_metrics: Optional[Dict[str, ConcurrencyMetrics]] = None
+
+
+def _job_name(index: int, job: BatchJob) -> str:
+    """Returns a human-readable label for a job (its explicit name or its index and configs)."""
+    if job.name:
+        return job.name
+    if job.resume_from:
+        return f"job-{index} (resume {os.path.basename(job.resume_from)})"
+    return f"job-{index} ({job.student_config} x {job.expert_config})"
+
+
+def _count_turns(history: List[Dict[str, Any]]) -> int:
+    """Counts completed turns in a dialogue history (one turn starts with each expert response)."""
+    return sum(1 for entry in history if entry.get('role') == 'assistant')
+
+
+def _make_adaptive_limiters(concurrency: int, adaptive: AdaptiveConcurrencyConfig) -> Tuple[AIMDLimiter, AIMDLimiter]:
+    """Builds the dialogue-level and call-level AIMD limiters, both starting at ``concurrency``."""
+    options = dict(target_p95_s=adaptive.target_p95_s, increase=adaptive.increase,
+                   decrease_factor=adaptive.decrease_factor, window=adaptive.window)
+    dialogues = AIMDLimiter('dialogues', concurrency, min_limit=adaptive.min_dialogues,
+                            max_limit=adaptive.max_dialogues or 4 * concurrency, **options)
+    calls = AIMDLimiter('calls', concurrency, min_limit=adaptive.min_calls,
+                        max_limit=adaptive.max_calls or 4 * concurrency, **options)
+    return dialogues, calls
+
+
+def unfinished_jobs(output_dirs: List[str]) -> List[BatchJob]:
+    """Returns one resume job per checkpoint of an unfinished dialogue in ``output_dirs``."""
+    return [BatchJob(resume_from=path) for path in find_checkpoints(output_dirs)]
+
+
+async def run_batch(jobs: List[BatchJob], concurrency: int = 8, max_turns: int = 5, output_dir: str = "transcripts",
+                    adaptive: Optional[AdaptiveConcurrencyConfig] = None, **dialogue_kwargs) -> BatchReport:
+    """Runs many dialogues concurrently on the current event loop.
+
+    Nearly all of a dialogue's wall time is spent awaiting ``Runner.run``, so a single process can
+    drive many dialogues at once. A semaphore bounds how many dialogues are in flight.
+
+    Args:
+        jobs: The dialogue jobs to run.
+        concurrency: Maximum number of dialogues running at the same time.
+        max_turns: Default maximum turns for jobs that do not set their own.
+        output_dir: Default output directory for jobs that do not set their own.
+        adaptive: Optional AIMD settings. The dialogue limit and a limit on model calls in flight
+            then start at ``concurrency`` and follow the latency and error feedback of every call.
+        **dialogue_kwargs: Extra options forwarded to every ``run_dialogue`` call (budgets, cache, ...).
+
+    Returns:
+        A BatchReport with one result per job (in job order) and aggregate throughput.
+    """
+    scheduler = get_scheduler()
+    call_limiter = None
+    if adaptive is not None:
+        semaphore, call_limiter = _make_adaptive_limiters(concurrency, adaptive)
+        scheduler.call_limiter = call_limiter
+        scheduler.feedback_limiters.append(semaphore)
+    else:
+        semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run_job(index: int, job: BatchJob) -> BatchJobResult:
+        name = _job_name(index, job)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                dialogue_report = DialogueReport()
+                if job.resume_from:
+                    history = await resume_dialogue(
+                        job.resume_from, report=dialogue_report, **dialogue_kwargs)
+                else:
+                    registry, configs = get_agent_registry(), get_config_registry()
+                    student = registry.student(configs.get(job.student_config, 'student'))
+                    expert = registry.expert(configs.get(job.expert_config, 'expert'))
+                    history = await run_dialogue(
+                        student, expert,
+                        max_turns=job.max_turns or max_turns,
+                        output_dir=job.output_dir or output_dir,
+                        report=dialogue_report,
+                        **dialogue_kwargs)
+                result = BatchJobResult(
+                    index=index,
+                    name=name,
+                    status='completed',
+                    goal_achieved=bool(
+                        history and history[-1].get('goal_achieved_flag')),
+                    history_length=len(history),
+                    turns=_count_turns(history),
+                    duration_s=time.perf_counter() - start,
+                    total_tokens=dialogue_report.total_tokens,
+                    cost=dialogue_report.total_cost,
+                    hedge_cost_upper_bound=dialogue_report.hedge_cost_upper_bound,
+                    retries=len(dialogue_report.retries),
+                    spend_saved_by_retries=dialogue_report.spend_saved_by_retries,
+                    model_latency_s=dialogue_report.blocking_latency_s,
+                    summary_tail_latency_s=dialogue_report.summary_tail_latency_s,
+                    stop_reason=dialogue_report.stop_reason)
+            except Exception as e:
+                logger.error(f"Batch job '{name}' failed: {e}")
+                result = BatchJobResult(
+                    index=index, name=name, status='failed', error=str(e),
+                    duration_s=time.perf_counter() - start)
+        logger.info(
+            f"Batch job '{name}' {result.status} in {result.duration_s:.2f}s ({result.turns} turns)")
+        return result
+
+    logger.info(
+        f"--- Starting Batch --- Jobs: {len(jobs)} --- Concurrency: {concurrency} ---")
+    batch_start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(_run_job(i, job) for i, job in enumerate(jobs)))
+    finally:
+        if call_limiter is not None:
+            scheduler.call_limiter = None
+            scheduler.feedback_limiters.remove(semaphore)
+    total_duration = time.perf_counter() - batch_start
+
+    completed = sum(1 for r in results if r.status == 'completed')
+    total_turns = sum(r.turns for r in results)
+    report = BatchReport(
+        results=list(results),
+        concurrency=concurrency,
+        total_duration_s=total_duration,
+        completed=completed,
+        failed=len(results) - completed,
+        dialogues_per_second=completed / total_duration if total_duration > 0 else 0.0,
+        turns_per_second=total_turns / total_duration if total_duration > 0 else 0.0,
+        total_tokens=sum(r.total_tokens for r in results),
+        total_cost=sum(r.cost for r in results),
+        total_hedge_cost_upper_bound=sum(r.hedge_cost_upper_bound for r in results),
+        total_retries=sum(r.retries for r in results),
+        total_spend_saved_by_retries=sum(r.spend_saved_by_retries for r in results),
+        concurrency_metrics={limiter.name: limiter.metrics() for limiter in (
+            semaphore, call_limiter)} if call_limiter is not None else None,
+    )
+    logger.info(
+        f"--- Batch End --- Completed: {report.completed} --- Failed: {report.failed} --- "
+        f"Duration: {report.total_duration_s:.2f}s --- "
+        f"Throughput: {report.dialogues_per_second:.3f} dialogues/s, {report.turns_per_second:.3f} turns/s --- "
+        f"Tokens: {report.total_tokens} (~${report.total_cost:.4f}) ---")
+    if report.total_retries:
+        logger.info(
+            f"Retries: {report.total_retries} --- Spend kept by recovering instead of aborting: "
+            f"~${report.total_spend_saved_by_retries:.4f}")
+    if report.concurrency_metrics:
+        for metrics in report.concurrency_metrics.values():
+            logger.info(
+                f"Adaptive concurrency ({metrics.name}): final limit {metrics.limit} "
+                f"(range {min(c.limit for c in metrics.history)}-{max(c.limit for c in metrics.history)}, "
+                f"{len(metrics.history) - 1} changes)")
+    return report
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats(BaseModel):
+    """Hit/miss/eviction counters for a ResponseCache."""
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def make_cache_key(**parts: Any) -> str:
+    """Returns a content hash of the given request parts (model, instructions, input, ...)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Persistent, content-addressed cache of model responses backed by a single SQLite file.
+
+    Values are JSON-serializable dicts. Entries older than ``max_age_seconds`` are treated as misses
+    and removed; when ``max_entries`` or ``max_bytes`` is exceeded the least recently used entries
+    are evicted. Eviction runs once a put takes the cache over ``max_entries``/``max_bytes`` and
+    otherwise every ``evict_every`` puts, not on every insert.
+
+    Dialogues use ``get_async``/``put_async``, which run the SQLite work in a thread with
+    ``asyncio.to_thread`` (one connection, serialized by a lock, is shared by those threads).
+
+    Args:
+        path: Path of the SQLite database file (created if missing).
+        max_entries: Optional maximum number of entries.
+        max_bytes: Optional maximum total size of the stored values.
+        max_age_seconds: Optional time-to-live of an entry since it was written.
+        evict_every: Number of puts between periodic evictions of expired entries.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, evict_every: int = 64):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.evict_every = evict_every
+        self.stats = CacheStats()
+        self._puts_since_evict = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Several processes may share one cache file (batch workers), so use WAL and a busy timeout
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+        # Approximate totals (replaced keys count twice) used to decide when a put must evict
+        self._entries, self._size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    async def get_async(self, key: str) -> Optional[Dict[str, Any]]:
+        """Like ``get``, but runs the lookup off the event loop."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key: str, value: Dict[str, Any]) -> None:
+        """Like ``put``, but runs the write (and any eviction) off the event loop."""
+        await asyncio.to_thread(self.put, key, value)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached value for ``key``, or None on a miss (including expired entries)."""
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.max_age_seconds is not None and now - row[1] > self.max_age_seconds):
+            if row is not None:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats.evictions += 1
+            self.stats.misses += 1
+            return None
+        self._conn.execute(
+            "UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.stats.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Stores ``value`` under ``key``, evicting if the cache is over its limits or
+        ``evict_every`` puts have passed since the last eviction."""
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now))
+            self._conn.commit()
+            self.stats.writes += 1
+            self._entries += 1
+            self._size += size
+            self._puts_since_evict += 1
+            over_limit = (self.max_entries is not None and self._entries > self.max_entries) or \
+                (self.max_bytes is not None and self._size > self.max_bytes)
+            if over_limit or self._puts_since_evict >= self.evict_every:
+                self._evict()
+
+    def evict(self) -> int:
+        """Removes expired entries, then least recently used ones until within limits."""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self) -> int:
+        removed = 0
+        if self.max_age_seconds is not None:
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age_seconds,)).rowcount
+        if self.max_entries is not None:
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+        if self.max_bytes is not None:
+            total = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            while total > self.max_bytes:
+                row = self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed ASC LIMIT 1").fetchone()
+                if row is None:
+                    break
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key = ?", (row[0],))
+                total -= row[1]
+                removed += 1
+        self._conn.commit()
+        self.stats.evictions += removed
+        self._puts_since_evict = 0
+        # Other processes sharing the file also write to it, so resync the totals
+        self._entries, self._size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return removed
+
+    def refresh_stats(self) -> CacheStats:
+        """Updates and returns the stats, including the current entry count and stored size."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self.stats.entries = entries
+        self.stats.size_bytes = size
+        return self.stats
+
+    def log_stats(self) -> None:
+        """Logs the cache's hit/miss statistics."""
+        stats = self.refresh_stats()
+        logger.info(
+            f"Response cache: {stats.hits} hits, {stats.misses} misses (hit rate {stats.hit_rate:.0%}), "
+            f"{stats.writes} writes, {stats.evictions} evictions, {stats.entries} entries, {stats.size_bytes / 1024:.1f} KiB")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,123 @@
+"""Per-turn checkpoints of running dialogues, so a crashed or killed run can be resumed.
+
+``run_dialogue`` writes a ``DialogueCheckpoint`` next to its transcript after every completed
+expert or student call, atomically (temporary file, fsync, rename). It holds everything needed to
+continue without repeating a model call: both agent configs, the shared ``full_history`` (each
+agent's model input is rebuilt from it), the turn counter, the goal status, the context compaction
+state and the usage recorded so far. The checkpoint is deleted once the dialogue's transcript,
+summary and report are saved, so any checkpoint left on disk belongs to an unfinished dialogue.
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from .accounting import CallUsage
+from .config import ExpertConfig, StudentConfig
+from .transcript import _fsync_directory
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+class HistoryViewState(BaseModel):
+    """Context compaction state of one agent's history view (see history.ContextCompactor)."""
+    summary: Optional[str] = None
+    summarized_upto: int = 1
+    tokens_saved: int = 0
+    usage: List[CallUsage] = []  # Fold calls not yet added to the report
+
+
+class DialogueCheckpoint(BaseModel):
+    """State of a dialogue after its last completed model call."""
+    version: int = 1
+    student_config: StudentConfig
+    expert_config: ExpertConfig
+    max_turns: int
+    output_dir: str
+    current_turn: int  # Turn of the last completed call
+    goal_achieved: bool = False
+    stop_reason: Optional[str] = None  # Set once the turn loop has ended (only saving was left)
+    full_history: List[Dict[str, Any]]
+    calls: List[CallUsage] = []  # Usage recorded in the dialogue report so far
+    history_views: List[HistoryViewState] = []  # Expert view, then student view
+    transcript_part_paths: List[str] = []  # Partial transcript files superseded by a resumed run
+
+    @property
+    def next_stage(self) -> str:
+        """'student' if the last entry is an expert response, else 'expert'."""
+        return 'student' if self.full_history and self.full_history[-1].get('role') == 'assistant' else 'expert'
+
+
+def checkpoint_path_for(transcript_path: str) -> str:
+    """Returns the checkpoint path that belongs to a transcript path (``.md`` or ``.md.part``)."""
+    base = transcript_path[:-len(".part")] if transcript_path.endswith(".part") else transcript_path
+    return os.path.splitext(base)[0] + CHECKPOINT_SUFFIX
+
+
+def _write_atomic(text: str, path: str, fsync: bool) -> None:
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    if fsync:
+        _fsync_directory(os.path.dirname(path) or ".")
+
+
+def save_checkpoint(checkpoint: DialogueCheckpoint, path: str, fsync: bool = True) -> None:
+    """Writes the checkpoint atomically: a crash leaves either the old or the new checkpoint."""
+    _write_atomic(checkpoint.model_dump_json(), path, fsync)
+
+
+async def save_checkpoint_async(checkpoint: DialogueCheckpoint, path: str, fsync: bool = True) -> None:
+    """Like ``save_checkpoint``, but writes and fsyncs in a worker thread.
+
+    The checkpoint is serialized first, on the calling thread, so later changes to the dialogue
+    cannot leak into it. Other dialogues on the event loop keep running during the fsync.
+    """
+    await asyncio.to_thread(_write_atomic, checkpoint.model_dump_json(), path, fsync)
+
+
+def load_checkpoint(path: str) -> DialogueCheckpoint:
+    """Loads a checkpoint written by ``save_checkpoint``.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If it is not a valid checkpoint.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return DialogueCheckpoint.model_validate(json.load(f))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Checkpoint not found: {path}")
+    except (json.JSONDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid checkpoint {path}: {e}")
+
+
+def find_checkpoints(directories: Iterable[str]) -> List[str]:
+    """Returns the checkpoints of unfinished dialogues in the given directories, oldest first."""
+    paths = set()
+    for directory in directories:
+        paths.update(glob.glob(os.path.join(directory, "*" + CHECKPOINT_SUFFIX)))
+    return sorted(paths, key=os.path.getmtime)
+
+
+def remove_files(paths: Iterable[Optional[str]]) -> None:
+    """Deletes checkpoints or superseded partial transcripts, ignoring files that are already gone."""
+    for path in paths:
+        if path is None:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove {path}: {e}")
@@ -0,0 +1,174 @@
+"""Central factory for the one OpenAI client (and HTTP connection pool) shared by every model call.
+
+Without it the agents SDK builds a fresh ``AsyncOpenAI`` for every ``Runner.run`` that has no
+default client (so each turn pays for a new TCP/TLS handshake), and the summarizer keeps a second
+client of its own. ``configure_clients`` creates a single client with explicit pool limits,
+keep-alive and timeouts, and registers it as the SDK default, so expert, student, summary, fold and
+web search calls (a hosted tool, executed inside the expert's Responses call) all share one pool.
+"""
+import logging
+import os
+from typing import Optional
+
+import openai
+from openai import AsyncOpenAI, OpenAIError
+from pydantic import BaseModel
+
+from .config import ClientSettings
+
+logger = logging.getLogger(__name__)
+
+# httpx.Limits of the httpx flavour the installed openai package was built against
+_Limits = type(openai.DEFAULT_CONNECTION_LIMITS)
+
+_settings = ClientSettings()
+_client: Optional[AsyncOpenAI] = None
+_tracker: Optional["_ConnectionTracker"] = None
+
+
+class PoolStats(BaseModel):
+    """Connection reuse of the shared client since it was created."""
+    requests: int = 0
+    connections_opened: int = 0
+    open_connections: int = 0  # Currently in the pool (busy or idle)
+    idle_connections: int = 0
+    max_connections: int = 0
+
+    @property
+    def reused_requests(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+    @property
+    def reuse_rate(self) -> float:
+        """Fraction of requests served on an already open connection."""
+        return self.reused_requests / self.requests if self.requests else 0.0
+
+
+class _ConnectionTracker:
+    """Counts requests and newly opened connections through httpcore's ``trace`` extension."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+
+    async def on_request(self, request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+
+def create_http_client(settings: ClientSettings, tracker: Optional[_ConnectionTracker] = None):
+    """Builds the pooled async HTTP client described by ``settings``."""
+    limits = _Limits(max_connections=settings.max_connections,
+                     max_keepalive_connections=settings.max_keepalive_connections,
+                     keepalive_expiry=settings.keepalive_expiry)
+    timeout = openai.Timeout(settings.timeout, connect=settings.connect_timeout)
+    event_hooks = {"request": [tracker.on_request]} if tracker is not None else None
+    return openai.DefaultAsyncHttpxClient(limits=limits, timeout=timeout, event_hooks=event_hooks)
+
+
+def set_client_settings(settings: Optional[ClientSettings]) -> None:
+    """Sets the settings used when the shared client is (next) created."""
+    global _settings
+    if _client is not None:
+        logger.warning(
+            "Shared OpenAI client already exists; new HTTP settings apply to the next client only.")
+    _settings = settings or ClientSettings()
+
+
+def get_client_settings() -> ClientSettings:
+    return _settings
+
+
+def configure_clients(settings: Optional[ClientSettings] = None) -> AsyncOpenAI:
+    """Creates the shared client and makes the agents SDK use it for model calls and tracing.
+
+    Args:
+        settings: Pool limits and timeouts; defaults to the settings from ``set_client_settings``.
+
+    Returns:
+        The shared AsyncOpenAI client.
+
+    Raises:
+        OpenAIError: If the client cannot be created (e.g. OPENAI_API_KEY is not set).
+    """
+    global _client, _tracker
+    # Imported here so that merely importing this module stays cheap
+    from agents import set_default_openai_client
+
+    if settings is not None:
+        set_client_settings(settings)
+    tracker = _ConnectionTracker()
+    client = AsyncOpenAI(http_client=create_http_client(_settings, tracker),
+                         max_retries=_settings.max_retries)
+    set_default_openai_client(client)
+    _client, _tracker = client, tracker
+    logger.info(
+        f"Shared OpenAI client: max_connections={_settings.max_connections}, "
+        f"max_keepalive={_settings.max_keepalive_connections}, keepalive_expiry={_settings.keepalive_expiry}s, "
+        f"timeout={_settings.timeout}s (connect {_settings.connect_timeout}s), max_retries={_settings.max_retries}")
+    return client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Returns the shared client, creating it on first use (raises OpenAIError without an API key)."""
+    if _client is None:
+        return configure_clients()
+    return _client
+
+
+def ensure_configured() -> Optional[AsyncOpenAI]:
+    """Like ``get_openai_client`` but returns None when no client can be created.
+
+    Used before agent runs: when the key is missing (offline replays, synthetic providers) the
+    SDK's own behaviour, and error message, is left untouched.
+    """
+    if _client is not None:
+        return _client
+    # Checked up front: building a client that then fails still costs an SSL context (~tens of ms)
+    if not os.environ.get("OPENAI_API_KEY"):
+        return None
+    try:
+        return configure_clients()
+    except OpenAIError as e:
+        logger.debug(f"Shared OpenAI client not configured: {e}")
+        return None
+
+
+def get_pool_stats() -> PoolStats:
+    """Returns request/connection counters and a snapshot of the shared client's pool."""
+    if _client is None or _tracker is None:
+        return PoolStats()
+    stats = PoolStats(requests=_tracker.requests,
+                      connections_opened=_tracker.connections_opened,
+                      max_connections=_settings.max_connections)
+    # The pool is internal to httpx/httpcore; a missing attribute just leaves the snapshot empty
+    pool = getattr(getattr(_client._client, "_transport", None), "_pool", None)
+    for connection in getattr(pool, "connections", None) or []:
+        stats.open_connections += 1
+        if connection.is_idle():
+            stats.idle_connections += 1
+    return stats
+
+
+def log_pool_stats() -> None:
+    """Logs the shared pool's connection reuse (nothing when no client was created)."""
+    if _client is None:
+        return
+    stats = get_pool_stats()
+    logger.info(
+        f"--- HTTP Pool --- Requests: {stats.requests} --- Connections opened: {stats.connections_opened} --- "
+        f"Reuse: {stats.reuse_rate:.1%} --- Open: {stats.open_connections} ({stats.idle_connections} idle) ---")
+
+
+async def aclose_clients() -> None:
+    """Closes the shared client and its pool; the next use creates a fresh one."""
+    global _client, _tracker
+    if _client is not None:
+        from agents import set_default_openai_client
+        set_default_openai_client(None, use_for_tracing=False)
+        await _client.close()
+    _client, _tracker = None, None
@@ -0,0 +1,179 @@
+"""AIMD (additive increase, multiplicative decrease) concurrency limits driven by call feedback.
+
+An ``AIMDLimiter`` is a semaphore whose limit moves with the provider's behaviour. Every finished
+model call reports its latency (or that it was rate limited / timed out). While the p95 latency of
+the recent calls stays within the target, the limit grows by ``increase`` for each round of calls
+at the current limit. A 429, a timeout or a p95 above the target cuts it by ``decrease_factor``.
+Batches use one limiter for dialogues in flight and one for model calls in flight; both are fed by
+the scheduler that every model call passes through.
+"""
+import asyncio
+import collections
+import logging
+import time
+from typing import Deque, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class LimitChange(BaseModel):
+    """One change of a limiter's limit."""
+    t: float  # Seconds since the limiter was created
+    limit: int
+    reason: str  # 'start', 'increase', 'rate_limited', 'timeout' or 'latency'
+    p95_s: Optional[float] = None
+
+
+class ConcurrencyMetrics(BaseModel):
+    """Current state and limit history of an AIMDLimiter."""
+    name: str
+    limit: int
+    in_flight: int
+    min_limit: int
+    max_limit: int
+    target_p95_s: float
+    recent_p95_s: Optional[float] = None
+    history: List[LimitChange]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AIMDLimiter:
+    """An async semaphore whose limit is adjusted AIMD-style from call outcomes.
+
+    Args:
+        name: Label for logs and metrics (e.g. 'dialogues' or 'calls').
+        initial: Starting limit.
+        min_limit: The limit never drops below this.
+        max_limit: The limit never grows above this.
+        target_p95_s: p95 latency (seconds) up to which the limit keeps growing.
+        increase: Added to the limit after each round of on-target calls (one round = as many
+            calls as the current limit).
+        decrease_factor: The limit is multiplied by this on a 429, a timeout or a p95 above target.
+        window: Number of recent call latencies the p95 is computed over.
+    """
+
+    def __init__(self, name: str, initial: int, min_limit: int = 1, max_limit: int = 64,
+                 target_p95_s: float = 30.0, increase: float = 1.0, decrease_factor: float = 0.5,
+                 window: int = 20):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.target_p95_s = target_p95_s
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self._limit = float(min(max(initial, min_limit), self.max_limit))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        self._latencies: Deque[float] = collections.deque(maxlen=window)
+        self._on_target = 0  # On-target calls since the last increase
+        # Calls finished since the last decrease; one decrease per round of calls, so a burst of
+        # 429s from calls that were already in flight only cuts the limit once
+        self._since_decrease: Optional[int] = None
+        self._start = time.monotonic()
+        self.history: List[LimitChange] = [
+            LimitChange(t=0.0, limit=self.limit, reason='start')]
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    # --- Semaphore --- #
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def __aenter__(self) -> "AIMDLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+    # --- Feedback --- #
+
+    def record(self, latency_s: Optional[float], error: Optional[str] = None) -> None:
+        """Feeds back one finished call.
+
+        Args:
+            latency_s: The call's latency (ignored for errors).
+            error: None for a success, 'rate_limited' for a 429 or 'timeout' for a timed out call.
+        """
+        if self._since_decrease is not None:
+            self._since_decrease += 1
+        if error is not None:
+            self._decrease(error)
+            return
+        if latency_s is None:
+            return
+        self._latencies.append(latency_s)
+        if len(self._latencies) < self._latencies.maxlen:
+            return
+        p95 = percentile(list(self._latencies), 0.95)
+        if p95 > self.target_p95_s:
+            # Start a fresh window, so the same slow calls do not cut the limit again
+            if self._decrease('latency', p95):
+                self._latencies.clear()
+            return
+        self._on_target += 1
+        if self._on_target >= self.limit and self._limit < self.max_limit:
+            self._on_target = 0
+            self._set_limit(min(self._limit + self.increase, self.max_limit), 'increase', p95)
+
+    def _decrease(self, reason: str, p95: Optional[float] = None) -> bool:
+        if self._since_decrease is not None and self._since_decrease < self.limit:
+            return False
+        self._since_decrease = 0
+        self._on_target = 0
+        self._set_limit(max(self._limit * self.decrease_factor, self.min_limit), reason, p95)
+        return True
+
+    def _set_limit(self, value: float, reason: str, p95: Optional[float]) -> None:
+        previous = self.limit
+        self._limit = value
+        if self.limit == previous:
+            return
+        self.history.append(LimitChange(t=time.monotonic() - self._start, limit=self.limit,
+                                        reason=reason, p95_s=p95))
+        logger.info(
+            f"Adaptive concurrency ({self.name}): {previous} -> {self.limit} ({reason}"
+            + (f", p95 {p95:.2f}s)" if p95 is not None else ")"))
+        self._wake()
+
+    def metrics(self) -> ConcurrencyMetrics:
+        """Returns the current limit, in-flight count and the limit history."""
+        return ConcurrencyMetrics(
+            name=self.name, limit=self.limit, in_flight=self.in_flight,
+            min_limit=self.min_limit, max_limit=self.max_limit, target_p95_s=self.target_p95_s,
+            recent_p95_s=percentile(list(self._latencies), 0.95) if self._latencies else None,
+            history=list(self.history))
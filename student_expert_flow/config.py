@@ -1,6 +1,14 @@
+import hashlib
+import logging
+import os
 import yaml
-from pydantic import BaseModel, Field, ValidationError
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import Dict, List, NamedTuple, Optional, Literal, Tuple
+
+logger = logging.getLogger(__name__)
+
+# libyaml's loader parses several times faster than the pure-Python one; PyYAML without libyaml lacks it
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 
 class ExpertConfig(BaseModel):
@@ -9,6 +17,13 @@ class ExpertConfig(BaseModel):
     model: str = "gpt-4.1-mini"
     max_tokens: int = 150
     tools: Optional[List[str]] = None  # Placeholder for now
+    # History policy: keep the last K turns verbatim and fold older turns into a running summary.
+    # None disables compaction and the whole conversation is resent every turn.
+    history_keep_turns: Optional[int] = Field(default=None, ge=1)
+    history_summary_model: Optional[str] = None  # Defaults to the agent's own model
+    # Transcripts longer than this (approximate tokens) are summarized in chunks of whole turns that
+    # are merged afterwards; None always summarizes in a single call. The summary uses this model.
+    summary_chunk_tokens: Optional[int] = Field(default=8000, ge=100)
 
 
 class StudentConfig(BaseModel):
@@ -19,21 +34,139 @@ class StudentConfig(BaseModel):
     max_iterations: int = 10
     critique_style: Literal['constructive',
                             'concise', 'detailed'] = 'constructive'
+    # History policy (see ExpertConfig)
+    history_keep_turns: Optional[int] = Field(default=None, ge=1)
+    history_summary_model: Optional[str] = None
+    # Optional per-dialogue budgets; the dialogue ends cleanly once either is reached
+    max_total_tokens: Optional[int] = Field(default=None, ge=1)
+    max_cost: Optional[float] = Field(default=None, gt=0)  # Estimated USD
+    # Optional time limits in seconds: for each expert/student call (its retries included) and for
+    # the whole turn loop. A call that runs over is cancelled and the dialogue ends, still saved.
+    turn_timeout: Optional[float] = Field(default=None, gt=0)
+    dialogue_deadline: Optional[float] = Field(default=None, gt=0)
 
 
-def load_config(config_path: str, config_type: Literal['expert', 'student']) -> BaseModel:
-    """Loads and validates agent configuration from a YAML file."""
+class ClientSettings(BaseModel):
+    """Connection pool limits and timeouts of the shared OpenAI client (see clients.py)."""
+    max_connections: int = Field(default=100, ge=1)
+    max_keepalive_connections: int = Field(default=100, ge=0)
+    # Idle connections are kept this long; longer than a typical turn, so the next call reuses them
+    keepalive_expiry: float = Field(default=60.0, ge=0)
+    timeout: float = Field(default=300.0, gt=0)  # Read/write/pool timeout in seconds
+    connect_timeout: float = Field(default=10.0, gt=0)
+    max_retries: int = Field(default=2, ge=0)
+
+
+class ModelRateLimit(BaseModel):
+    """Provider quota for one model (None leaves that dimension unlimited)."""
+    rpm: Optional[int] = Field(default=None, ge=1)  # Requests per minute
+    tpm: Optional[int] = Field(default=None, ge=1)  # Tokens per minute
+
+
+class RateLimitConfig(BaseModel):
+    """Per-model quotas and retry policy of the call scheduler (see scheduler.py)."""
+    # Keys match model names by longest prefix, so "gpt-4.1-mini" covers its dated snapshots
+    models: Dict[str, ModelRateLimit] = Field(default_factory=dict)
+    headroom: float = Field(default=0.9, gt=0, le=1)  # Fraction of each quota the scheduler uses
+    max_retries: int = Field(default=8, ge=0)  # Retries of a rate-limited call before it fails
+    base_delay_s: float = Field(default=1.0, gt=0)  # Backoff without a retry-after header
+    max_delay_s: float = Field(default=60.0, gt=0)
+
+
+class AdaptiveConcurrencyConfig(BaseModel):
+    """AIMD limits on dialogues and model calls in flight (see concurrency.py).
+
+    Both limits start at the batch concurrency, grow while the p95 call latency stays within
+    ``target_p95_s`` and are cut on 429s, timeouts and latency above the target.
+    """
+    target_p95_s: float = Field(default=30.0, gt=0)
+    min_dialogues: int = Field(default=1, ge=1)
+    max_dialogues: Optional[int] = Field(default=None, ge=1)  # Defaults to 4x the starting concurrency
+    min_calls: int = Field(default=1, ge=1)
+    max_calls: Optional[int] = Field(default=None, ge=1)  # Defaults to 4x the starting concurrency
+    increase: float = Field(default=1.0, gt=0)  # Added after each round of on-target calls
+    decrease_factor: float = Field(default=0.5, gt=0, lt=1)
+    window: int = Field(default=20, ge=1)  # Recent calls the p95 is computed over
+
+
+class HedgingConfig(BaseModel):
+    """Hedged requests: duplicate a call that is slower than a percentile of recent latency (see hedging.py)."""
+    percentile: float = Field(default=0.95, gt=0, lt=1)  # Hedge once a call outlives this latency percentile
+    max_hedge_rate: float = Field(default=0.1, gt=0, le=1)  # At most this fraction of calls is duplicated
+    min_samples: int = Field(default=20, ge=1)  # Recent latencies needed before hedging starts
+    window: int = Field(default=200, ge=1)  # Recent latencies kept per stage
+    min_delay_s: float = Field(default=1.0, ge=0)  # Never hedge earlier than this
+    stages: List[Literal['expert', 'student']] = ['expert']
+
+
+class TurnRetryConfig(BaseModel):
+    """Retry policy for failed expert/student calls (see retry.py)."""
+    max_retries: int = Field(default=2, ge=0)  # Retries of a call after transient errors
+    base_delay_s: float = Field(default=0.5, gt=0)  # Jittered exponential backoff between them
+    max_delay_s: float = Field(default=20.0, gt=0)
+    max_reasks: int = Field(default=1, ge=0)  # Re-asks of a call whose output could not be parsed
+
+
+class BatchJob(BaseModel):
+    """A single dialogue job inside a batch manifest."""
+    student_config: Optional[str] = None
+    expert_config: Optional[str] = None
+    max_turns: Optional[int] = None  # Falls back to the manifest default
+    output_dir: Optional[str] = None  # Falls back to the manifest output_dir
+    name: Optional[str] = None
+    # Continue an unfinished dialogue from its checkpoint instead (configs, max_turns and output_dir
+    # then come from the checkpoint)
+    resume_from: Optional[str] = None
+
+    @model_validator(mode='after')
+    def _configs_or_checkpoint(self) -> 'BatchJob':
+        if self.resume_from is None and not (self.student_config and self.expert_config):
+            raise ValueError(
+                "a job needs student_config and expert_config (or resume_from)")
+        return self
+
+
+class BatchManifest(BaseModel):
+    """A batch of dialogue jobs to run concurrently on one event loop."""
+    concurrency: int = Field(default=8, ge=1)
+    max_turns: int = 5
+    output_dir: str = "transcripts"
+    http: Optional[ClientSettings] = None  # Shared client settings (CLI --http-* options take precedence)
+    rate_limits: Optional[RateLimitConfig] = None  # Used unless --rate-limits is given
+    adaptive: Optional[AdaptiveConcurrencyConfig] = None  # Adapt concurrency instead of fixing it
+    hedging: Optional[HedgingConfig] = None  # Used unless --hedge is given
+    retry: Optional[TurnRetryConfig] = None  # Used unless --turn-retries/--max-reasks is given
+    jobs: List[BatchJob]
+
+
+def _parse_yaml(data, config_path: str):
+    """Parses YAML text (or bytes), raising ValueError for invalid/empty files."""
     try:
-        with open(config_path, 'r') as f:
-            raw_config = yaml.safe_load(f)
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Configuration file not found: {config_path}")
+        raw_config = yaml.load(data, Loader=_YAML_LOADER)
     except yaml.YAMLError as e:
         raise ValueError(f"Error parsing YAML file {config_path}: {e}")
 
     if not raw_config:
         raise ValueError(f"Configuration file is empty: {config_path}")
+    return raw_config
 
+
+def _read_yaml(config_path: str):
+    """Reads a YAML file, raising the loader's usual errors for missing/invalid/empty files."""
+    try:
+        with open(config_path, 'r') as f:
+            data = f.read()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Configuration file not found: {config_path}")
+    return _parse_yaml(data, config_path)
+
+
+def load_config(config_path: str, config_type: Literal['expert', 'student']) -> BaseModel:
+    """Loads and validates agent configuration from a YAML file."""
+    return _validate_config(_read_yaml(config_path), config_path, config_type)
+
+
+def _validate_config(raw_config, config_path: str, config_type: Literal['expert', 'student']) -> BaseModel:
     try:
         if config_type == 'expert':
             return ExpertConfig(**raw_config)
@@ -45,3 +178,112 @@ def load_config(config_path: str, config_type: Literal['expert', 'student']) ->
     except ValidationError as e:
         raise ValueError(
             f"Configuration validation error in {config_path}:\n{e}")
+
+
+class _CachedConfig(NamedTuple):
+    stat: Tuple[int, int]  # (mtime_ns, size) of the file when it was last checked
+    digest: str  # SHA-256 of the file's contents
+    config: BaseModel
+
+
+class ConfigRegistry:
+    """Caches validated Expert/Student configs by path and re-parses a file only when it changed.
+
+    A lookup costs one ``os.stat``. When the file's mtime or size changed, its bytes are hashed and
+    only a different hash leads to parsing and validating it again (so a touched but unchanged file
+    keeps its config object). Configs are shared between callers and must not be modified.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.parses = 0
+        self._configs: Dict[Tuple[str, str], _CachedConfig] = {}
+
+    def get(self, config_path: str, config_type: Literal['expert', 'student']) -> BaseModel:
+        """Like ``load_config``, but parses each file version only once."""
+        key = (os.path.abspath(config_path), config_type)
+        try:
+            st = os.stat(config_path)
+        except FileNotFoundError:
+            self._configs.pop(key, None)
+            raise FileNotFoundError(f"Configuration file not found: {config_path}")
+        return self._get(key, config_path, config_type, (st.st_mtime_ns, st.st_size))
+
+    def _get(self, key: Tuple[str, str], config_path: str, config_type: Literal['expert', 'student'],
+             stat: Tuple[int, int]) -> BaseModel:
+        cached = self._configs.get(key)
+        if cached is not None and cached.stat == stat:
+            self.hits += 1
+            return cached.config
+        with open(config_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if cached is not None and cached.digest == digest:
+            self.hits += 1
+            config = cached.config
+        else:
+            config = _validate_config(_parse_yaml(data, config_path), config_path, config_type)
+            self.parses += 1
+        self._configs[key] = _CachedConfig(stat, digest, config)
+        return config
+
+    def load_directory(self, directory: str = "configs") -> Dict[str, BaseModel]:
+        """Loads every participant config in ``directory`` (student_*.yaml / expert_*.yaml) in one pass.
+
+        Files that fail to load are logged and left out; a later ``get`` of them raises the error.
+
+        Returns:
+            The configs by path (``os.path.join(directory, filename)``).
+        """
+        configs = {}
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                config_type = entry.name.split('_', 1)[0]
+                if config_type not in ('student', 'expert') or not entry.name.endswith(('.yaml', '.yml')) \
+                        or not entry.is_file():
+                    continue
+                st = entry.stat()  # Usually served from the directory listing, without another syscall
+                try:
+                    configs[entry.path] = self._get((os.path.abspath(entry.path), config_type), entry.path,
+                                                    config_type, (st.st_mtime_ns, st.st_size))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping config {entry.path}: {e}")
+        return configs
+
+    def clear(self) -> None:
+        self._configs.clear()
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+
+# Process-wide registry used by batch runs, the daemon and queue workers
+_config_registry = ConfigRegistry()
+
+
+def get_config_registry() -> ConfigRegistry:
+    return _config_registry
+
+
+def load_batch_manifest(manifest_path: str) -> BatchManifest:
+    """Loads and validates a batch manifest from a YAML file.
+
+    Relative config paths in the manifest are resolved as given (i.e. relative to the
+    current working directory), matching how the single-dialogue CLI treats its arguments.
+    """
+    raw_manifest = _read_yaml(manifest_path)
+    try:
+        return BatchManifest(**raw_manifest)
+    except ValidationError as e:
+        raise ValueError(
+            f"Batch manifest validation error in {manifest_path}:\n{e}")
+
+
+def load_rate_limits(config_path: str) -> RateLimitConfig:
+    """Loads and validates per-model rate limits from a YAML file."""
+    raw_config = _read_yaml(config_path)
+    try:
+        return RateLimitConfig(**raw_config)
+    except ValidationError as e:
+        raise ValueError(
+            f"Rate limit configuration validation error in {config_path}:\n{e}")
@@ -0,0 +1,384 @@
+"""Long-lived daemon that keeps clients and agents warm and runs dialogue jobs sent over HTTP.
+
+A one-off CLI run pays for interpreter startup, importing ``agents``/``openai``, parsing the YAML
+configs, building the agents and a TLS handshake before its first token; for short dialogues that
+is more than the dialogue itself. The daemon pays it once. The shared OpenAI client and its pooled
+connections, the parsed configs and constructed agents (rebuilt only when their config file
+changes) and the process-wide scheduler stay alive between jobs. Jobs are queued and run by ``concurrency`` worker
+tasks on one event loop.
+
+The server speaks minimal HTTP/1.1 with JSON bodies, on a local TCP port or a Unix socket:
+
+    POST /jobs              Submit a job (BatchJob fields). Returns 202 with the job's status.
+    GET  /jobs              Status of every known job.
+    GET  /jobs/<id>         Status of one job.
+    GET  /jobs/<id>/result  History and report of a finished job (409 while it is queued or running).
+    GET  /health            Queue depth, running jobs, warm agents and connection pool statistics.
+
+Jobs name config files, checkpoints and output directories on the daemon's machine, so whoever can
+reach the server can read those files into a dialogue and write transcripts anywhere the daemon
+can. The server therefore only listens on loopback addresses (or a Unix socket readable by its user
+alone) unless a token is set. With a token, every request except ``GET /health`` must send
+``Authorization: Bearer <token>``. ``allowed_root`` additionally confines the paths jobs may use to
+one directory tree, including the output directory stored in a resumed job's checkpoint.
+"""
+import asyncio
+import collections
+import hmac
+import http
+import ipaddress
+import json
+import logging
+import os
+import signal
+import time
+import uuid
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+from . import clients
+from .accounting import DialogueReport
+from .batch import _count_turns
+from .checkpoint import load_checkpoint
+from .config import BatchJob, get_config_registry
+from .participants import get_agent_registry
+from .runner import resume_dialogue, run_dialogue
+
+logger = logging.getLogger(__name__)
+
+_MAX_BODY_BYTES = 1024 * 1024
+TOKEN_ENV_VAR = "STUDENT_EXPERT_FLOW_DAEMON_TOKEN"
+
+
+def is_loopback_host(host: str) -> bool:
+    """True if ``host`` only accepts connections from this machine."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # Other host names may resolve to any interface
+
+
+class DaemonJobStatus(BaseModel):
+    """State of one job submitted to the daemon."""
+    id: str
+    name: str
+    status: Literal['queued', 'running', 'completed', 'failed']
+    submitted_at: float  # Unix timestamps
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    turns: int = 0
+    goal_achieved: bool = False
+    stop_reason: Optional[str] = None
+    error: Optional[str] = None
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class DialogueDaemon:
+    """Job queue, worker tasks and warm agents behind the daemon's HTTP endpoints.
+
+    Args:
+        concurrency: Number of dialogues run at the same time.
+        max_turns: Default maximum turns for jobs that do not set their own.
+        output_dir: Default output directory for jobs that do not set their own.
+        max_finished_jobs: Finished jobs (and their results) kept for the status and result
+            endpoints; the oldest are dropped beyond this.
+        token: Optional bearer token every request except ``GET /health`` must present. Required to
+            listen on a non-loopback address.
+        allowed_root: Optional directory that every config, checkpoint and output path of a job must
+            be inside (403 otherwise).
+        request_timeout_s: Seconds a client has to send its whole request before it gets a 408.
+        **dialogue_kwargs: Extra options forwarded to every ``run_dialogue`` call (budgets, cache, ...).
+    """
+
+    def __init__(self, concurrency: int = 4, max_turns: int = 5, output_dir: str = "transcripts",
+                 max_finished_jobs: int = 1000, token: Optional[str] = None,
+                 allowed_root: Optional[str] = None, request_timeout_s: float = 30.0, **dialogue_kwargs):
+        self.concurrency = concurrency
+        self.max_turns = max_turns
+        self.output_dir = output_dir
+        self.max_finished_jobs = max_finished_jobs
+        self.token = token
+        self.allowed_root = os.path.realpath(allowed_root) if allowed_root else None
+        self.request_timeout_s = request_timeout_s
+        self.dialogue_kwargs = dialogue_kwargs
+        self._jobs: "collections.OrderedDict[str, DaemonJobStatus]" = collections.OrderedDict()
+        self._requests: Dict[str, BatchJob] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        # Agents in use by (kind, config path)
+        self._agents: Dict[Tuple[str, str], Any] = {}
+
+    # --- Lifecycle --- #
+
+    async def start(self) -> None:
+        """Warms the shared client and starts the worker tasks."""
+        await self._prewarm()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"Daemon ready: {self.concurrency} workers, default output dir {self.output_dir}")
+
+    async def _prewarm(self) -> None:
+        client = clients.ensure_configured()
+        if client is None:
+            return
+        # One cheap request opens a pooled connection, so the first job skips the TLS handshake
+        try:
+            await client.models.list()
+        except Exception as e:
+            logger.debug(f"Connection pre-warm failed (the first job will connect instead): {e}")
+
+    async def aclose(self) -> None:
+        """Cancels the workers; running dialogues keep their checkpoints and can be resumed."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # --- Jobs --- #
+
+    def submit(self, job: BatchJob) -> DaemonJobStatus:
+        job_id = uuid.uuid4().hex[:12]
+        name = job.name or (f"resume {os.path.basename(job.resume_from)}" if job.resume_from
+                            else f"{job.student_config} x {job.expert_config}")
+        status = DaemonJobStatus(id=job_id, name=name, status='queued', submitted_at=time.time())
+        self._jobs[job_id] = status
+        self._requests[job_id] = job
+        self._queue.put_nowait(job_id)
+        logger.info(f"Job {job_id} queued ({name}); {self._queue.qsize()} waiting")
+        return status
+
+    def get_status(self, job_id: str) -> Optional[DaemonJobStatus]:
+        return self._jobs.get(job_id)
+
+    def get_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._results.get(job_id)
+
+    def health(self) -> Dict[str, Any]:
+        counts = collections.Counter(status.status for status in self._jobs.values())
+        stats = clients.get_pool_stats()
+        return {
+            "status": "ok",
+            "workers": len(self._workers),
+            "queued": counts['queued'],
+            "running": counts['running'],
+            "completed": counts['completed'],
+            "failed": counts['failed'],
+            "warm_agents": len(self._agents),
+            "pool": stats.model_dump(),
+        }
+
+    def _agent(self, kind: Literal['student', 'expert'], path: str):
+        """Returns the agent built from ``path``, rebuilding it only if the file changed."""
+        # The config registry re-parses the file only if it changed; equal configs map to the same agent
+        config = get_config_registry().get(path, kind)
+        registry = get_agent_registry()
+        agent = registry.student(config) if kind == 'student' else registry.expert(config)
+        self._agents[(kind, path)] = agent
+        return agent
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        status, job = self._jobs[job_id], self._requests.pop(job_id)
+        status.status, status.started_at = 'running', time.time()
+        report = DialogueReport()
+        try:
+            if job.resume_from:
+                # The checkpoint may have been replaced while the job was queued
+                self._check_checkpoint(job.resume_from)
+                history = await resume_dialogue(job.resume_from, report=report, **self.dialogue_kwargs)
+            else:
+                history = await run_dialogue(
+                    self._agent('student', job.student_config), self._agent('expert', job.expert_config),
+                    max_turns=job.max_turns or self.max_turns, output_dir=job.output_dir or self.output_dir,
+                    report=report, **self.dialogue_kwargs)
+            status.status = 'completed'
+            status.turns = _count_turns(history)
+            status.goal_achieved = bool(history and history[-1].get('goal_achieved_flag'))
+            status.stop_reason = report.stop_reason
+            self._results[job_id] = {"id": job_id, "history": history, "report": report.to_dict()}
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            status.status, status.error = 'failed', str(e)
+        finally:
+            status.finished_at = time.time()
+            self._evict_finished()
+        logger.info(f"Job {job_id} {status.status} in {status.finished_at - status.started_at:.2f}s")
+
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, status in self._jobs.items()
+                    if status.status in ('completed', 'failed')]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job_id]
+            self._results.pop(job_id, None)
+
+    # --- HTTP --- #
+
+    def _authorize(self, headers: Dict[str, str]) -> None:
+        if self.token is None:
+            return
+        expected = f"Bearer {self.token}".encode('utf-8')
+        if not hmac.compare_digest(headers.get('authorization', '').encode('utf-8'), expected):
+            raise _HTTPError(401, "Missing or invalid token")
+
+    def _check_paths(self, job: BatchJob) -> None:
+        """Rejects a job whose files lie outside ``allowed_root`` (after resolving symlinks)."""
+        if self.allowed_root is None:
+            return
+        for field in ('student_config', 'expert_config', 'resume_from', 'output_dir'):
+            path = getattr(job, field)
+            if path is not None:
+                self._check_path(field, path)
+        if job.resume_from:
+            self._check_checkpoint(job.resume_from)
+
+    def _check_checkpoint(self, path: str) -> None:
+        """Rejects a checkpoint whose dialogue would write outside ``allowed_root``."""
+        if self.allowed_root is None:
+            return
+        try:
+            checkpoint = load_checkpoint(path)
+        except (FileNotFoundError, ValueError) as e:
+            raise _HTTPError(400, str(e))
+        self._check_path('output_dir of the checkpoint', checkpoint.output_dir)
+
+    def _check_path(self, field: str, path: str) -> None:
+        resolved = os.path.realpath(path)
+        if os.path.commonpath([self.allowed_root, resolved]) != self.allowed_root:
+            raise _HTTPError(403, f"{field} is outside the daemon's allowed root: {path}")
+
+    def _route(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Any]:
+        parts = [part for part in path.split('?', 1)[0].split('/') if part]
+        if parts == ['health'] and method == 'GET':
+            return 200, self.health()
+        self._authorize(headers)
+        if parts == ['jobs'] and method == 'POST':
+            try:
+                job = BatchJob.model_validate(json.loads(body or b'{}'))
+            except (json.JSONDecodeError, ValidationError) as e:
+                raise _HTTPError(400, f"Invalid job: {e}")
+            self._check_paths(job)
+            return 202, self.submit(job).model_dump()
+        if parts == ['jobs'] and method == 'GET':
+            return 200, [status.model_dump() for status in self._jobs.values()]
+        if len(parts) in (2, 3) and parts[0] == 'jobs' and method == 'GET':
+            status = self.get_status(parts[1])
+            if status is None:
+                raise _HTTPError(404, f"Unknown job: {parts[1]}")
+            if len(parts) == 2:
+                return 200, status.model_dump()
+            if parts[2] == 'result':
+                result = self.get_result(parts[1])
+                if result is None:
+                    # Failed jobs have no result; their status carries the error
+                    raise _HTTPError(409, f"Job {parts[1]} is {status.status}")
+                return 200, result
+        raise _HTTPError(404, f"Not found: {method} {path}")
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        """Reads one request and returns its (method, path, headers, body)."""
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) < 2:
+            raise _HTTPError(400, "Malformed request line")
+        method, path = request_line[0].upper(), request_line[1]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > _MAX_BODY_BYTES:
+            raise _HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method, path, headers, body
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves one HTTP request, then closes the connection."""
+        try:
+            try:
+                # A client that never finishes its request would otherwise hold the connection forever
+                method, path, headers, body = await asyncio.wait_for(
+                    self._read_request(reader), self.request_timeout_s)
+                status, payload = self._route(method, path, headers, body)
+            except asyncio.TimeoutError:
+                status, payload = 408, {"error": f"Request not received within {self.request_timeout_s:g}s"}
+            except _HTTPError as e:
+                status, payload = e.status, {"error": str(e)}
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                status, payload = 400, {"error": f"Malformed request: {e}"}
+            data = json.dumps(payload, default=str).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + data)
+            await writer.drain()
+        except ConnectionError as e:
+            logger.debug(f"Client disconnected: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765,
+                    socket_path: Optional[str] = None) -> asyncio.AbstractServer:
+        """Starts the workers and the HTTP server (on ``socket_path`` if given, else on host:port).
+
+        Raises:
+            ValueError: If ``host`` is not a loopback address and no token is set.
+        """
+        if not socket_path and not is_loopback_host(host) and self.token is None:
+            raise ValueError(
+                f"Refusing to listen on {host!r} without a token: anyone who can reach it could run jobs "
+                f"reading and writing files as this user. Set {TOKEN_ENV_VAR} or listen on 127.0.0.1.")
+        await self.start()
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)  # Left behind by a daemon that did not shut down cleanly
+            # Create the socket with mode 0600 so that only this user may ever connect
+            old_umask = os.umask(0o177)
+            try:
+                server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+            finally:
+                os.umask(old_umask)
+            logger.info(f"Daemon listening on unix socket {socket_path}")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+            logger.info(f"Daemon listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+        return server
+
+
+async def run_daemon(host: str = "127.0.0.1", port: int = 8765, socket_path: Optional[str] = None,
+                     **daemon_kwargs) -> None:
+    """Runs the daemon until SIGINT/SIGTERM (see DialogueDaemon for the options)."""
+    daemon = DialogueDaemon(**daemon_kwargs)
+    server = await daemon.serve(host, port, socket_path)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # e.g. Windows; Ctrl+C then cancels the run instead
+    try:
+        await stop.wait()
+        logger.info("Daemon shutting down; unfinished dialogues keep their checkpoints.")
+    finally:
+        server.close()
+        await server.wait_closed()
+        await daemon.aclose()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,128 @@
+"""Hedged requests: duplicate a slow call and take whichever copy finishes first.
+
+Expert turns (especially with web search) have long latency tails. A ``HedgingPolicy`` keeps the
+recent latencies of each stage. When a call is still running at the configured percentile of
+them, ``run_hedged`` starts an identical second call, returns the first successful result and
+cancels the other. Hedges are capped at ``max_hedge_rate`` of all calls. The cancelled copy is
+still (partially) billed, so its estimated cost is reported separately.
+
+Latencies are measured from the start of the original call. When the duplicate wins, the recorded
+sample is how long the original had run when it was cancelled, a lower bound of its latency. The
+duplicate's own (short) latency would pull the percentile down and make hedging ever more eager.
+"""
+import asyncio
+import collections
+import logging
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .concurrency import percentile
+from .config import HedgingConfig
+
+logger = logging.getLogger(__name__)
+
+
+class HedgeStats(BaseModel):
+    """Counters of a HedgingPolicy."""
+    calls: int = 0
+    hedges: int = 0  # Calls that got a duplicate
+    hedge_wins: int = 0  # Hedges where the duplicate finished first
+    skipped_by_rate_cap: int = 0  # Calls that were slow enough to hedge but over the rate cap
+    extra_cost_upper_bound: float = 0.0  # Upper bound on the USD of the cancelled copies
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedges / self.calls if self.calls else 0.0
+
+
+class HedgingPolicy:
+    """Decides when to hedge and keeps the latency history it is based on.
+
+    One policy is shared by all dialogues of a process, so the percentile reflects every recent call.
+    """
+
+    def __init__(self, config: Optional[HedgingConfig] = None):
+        self.config = config or HedgingConfig()
+        self.stats = HedgeStats()
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def applies_to(self, stage: str) -> bool:
+        return stage in self.config.stages
+
+    def record_latency(self, stage: str, latency_s: float) -> None:
+        self._latencies.setdefault(stage, collections.deque(
+            maxlen=self.config.window)).append(latency_s)
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        """Seconds after which a call of ``stage`` gets hedged (None until enough samples exist)."""
+        latencies = self._latencies.get(stage)
+        if not latencies or len(latencies) < self.config.min_samples:
+            return None
+        return max(percentile(list(latencies), self.config.percentile), self.config.min_delay_s)
+
+    def _allow_hedge(self) -> bool:
+        # Counting this call's hedge, the rate must stay within the cap
+        if (self.stats.hedges + 1) / self.stats.calls > self.config.max_hedge_rate:
+            self.stats.skipped_by_rate_cap += 1
+            return False
+        return True
+
+    def log_stats(self) -> None:
+        stats = self.stats
+        if not stats.calls:
+            return
+        logger.info(
+            f"--- Hedging --- Calls: {stats.calls} --- Hedged: {stats.hedges} ({stats.hedge_rate:.1%}) --- "
+            f"Duplicate won: {stats.hedge_wins} --- Skipped by rate cap: {stats.skipped_by_rate_cap} --- "
+            f"Extra cost: <= ${stats.extra_cost_upper_bound:.4f} ---")
+
+
+async def run_hedged(policy: HedgingPolicy, stage: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+    """Runs ``call``, duplicating it if it outlives the stage's hedge delay.
+
+    Args:
+        policy: The hedging policy (latency history, percentile, rate cap).
+        stage: Call stage, e.g. 'expert'.
+        call: Zero-argument coroutine function; called a second time for the duplicate.
+
+    Returns:
+        A tuple of (result, hedged). ``hedged`` is True if a duplicate was started.
+
+    Raises:
+        The exception of the call if every copy failed.
+    """
+    policy.stats.calls += 1
+    delay = policy.hedge_delay(stage)
+    start = time.perf_counter()
+    primary = asyncio.ensure_future(call())
+    copies = {primary}
+    hedged = False
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(copies, timeout=delay)
+            if not done and policy._allow_hedge():
+                hedged = True
+                policy.stats.hedges += 1
+                logger.info(
+                    f"{stage.capitalize()} call still running after {delay:.2f}s (p{policy.config.percentile * 100:.0f}); starting a hedged duplicate.")
+                copies.add(asyncio.ensure_future(call()))
+
+        error: Optional[BaseException] = None
+        while copies:
+            done, copies = await asyncio.wait(copies, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                # Time since the original started: its latency, or a lower bound of it if it lost
+                policy.record_latency(stage, time.perf_counter() - start)
+                if hedged and task is not primary:
+                    policy.stats.hedge_wins += 1
+                return task.result(), hedged
+        raise error
+    finally:
+        # The losing copy (or every copy, if we were cancelled) is cancelled
+        for task in copies:
+            task.cancel()
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from typing import List, Dict, Any, Optional, Iterable
+
+from .transcript import get_async_openai_client
+from .accounting import CallUsage, usage_from_completion
+from .scheduler import get_scheduler, estimate_tokens, completion_total_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of the earlier conversation (older turns omitted):\n"
+
+FOLD_SYSTEM_PROMPT = ("You maintain a compact running summary of a dialogue between a student and an expert. "
+                      "You are given the current summary (possibly empty) and the next messages of the dialogue. "
+                      "Return an updated summary that keeps every fact, decision, open question and the student's progress "
+                      "towards the learning goal, in as few words as possible. Return only the summary text.")
+
+
+def _estimate_text_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for prompt-size accounting."""
+    return (len(text) + 3) // 4
+
+
+def estimate_input_tokens(input_items: List[Dict[str, Any]]) -> int:
+    """Estimates the prompt tokens of a list of input messages (string contents only)."""
+    return sum(_estimate_text_tokens(str(item.get('content', ''))) for item in input_items)
+
+
+def turn_start_indices(history: List[Dict[str, Any]]) -> List[int]:
+    """Returns the history indices where turns start (each turn starts with an expert response)."""
+    return [i for i, entry in enumerate(history) if entry.get('role') == 'assistant']
+
+
+def build_agent_input(history: List[Dict[str, Any]], self_agents: Iterable[str],
+                      summary: Optional[str] = None, summarized_upto: int = 1) -> List[Dict[str, Any]]:
+    """Builds the model input for one agent from the shared dialogue history.
+
+    Entries spoken by the agent itself (``self_agents``) become ``assistant`` messages and everything
+    else becomes ``user`` messages, so each agent sees the other side as its interlocutor.
+
+    Args:
+        history: The shared dialogue history (``full_history`` in the runner).
+        self_agents: Agent names whose entries count as this agent's own messages.
+        summary: Optional running summary replacing ``history[1:summarized_upto]``.
+        summarized_upto: Index of the first history entry not covered by ``summary``.
+
+    Returns:
+        A list of ``{"role", "content"}`` messages ready to pass to ``Runner.run``.
+    """
+    self_agents = set(self_agents)
+
+    def _message(entry: Dict[str, Any]) -> Dict[str, Any]:
+        role = 'assistant' if entry.get('agent') in self_agents else 'user'
+        return {"role": role, "content": entry.get('content', '')}
+
+    if not history:
+        return []
+    # The first entry is the goal kickoff and is always kept verbatim
+    messages = [_message(history[0])]
+    start = 1
+    if summary:
+        messages.append(
+            {"role": "system", "content": f"{SUMMARY_PREFIX}{summary}"})
+        start = max(summarized_upto, 1)
+    messages.extend(_message(entry)
+                    for entry in history[start:] if entry.get('content'))
+    return messages
+
+
+class HistoryFold:
+    """A running summary of the dialogue's older turns, updated by background fold calls.
+
+    The fold prompt names each entry's speaker and does not depend on whose view it serves, so the
+    expert's and student's views share one fold when their policies (``keep_turns`` and model) match,
+    and each fold is paid for once (see ``ContextCompactor.sharing``).
+    """
+
+    def __init__(self, keep_turns: Optional[int], model: str = "gpt-4.1-mini"):
+        self.keep_turns = keep_turns
+        self.model = model
+        self.summary: Optional[str] = None
+        self.summarized_upto = 1  # History index of the first entry not in the summary
+        self.usage: List[CallUsage] = []  # Usage of fold calls not yet taken by take_usage
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, history: List[Dict[str, Any]]) -> None:
+        """Schedules a background fold of entries that fell out of the keep window, if any."""
+        if not self.keep_turns:
+            return
+        starts = turn_start_indices(history)
+        if len(starts) <= self.keep_turns:
+            return
+        fold_upto = starts[-self.keep_turns]
+        if fold_upto <= self.summarized_upto or (self._task and not self._task.done()):
+            return  # Nothing new to fold, or a fold is already in flight (next update catches up)
+        entries = history[self.summarized_upto:fold_upto]
+        self._task = asyncio.create_task(self._fold(entries, fold_upto))
+
+    def take_usage(self) -> List[CallUsage]:
+        """Returns the usage of the fold calls finished since the last call, and forgets it."""
+        usage, self.usage = self.usage, []
+        return usage
+
+    async def _fold(self, entries: List[Dict[str, Any]], fold_upto: int) -> None:
+        """Folds ``entries`` into the running summary with one small LLM call."""
+        new_messages = "\n\n".join(
+            f"[{entry.get('agent', 'System')} ({entry.get('role')})]: {entry.get('content', '')}" for entry in entries)
+        try:
+            client = get_async_openai_client()
+            call_start = time.perf_counter()
+            messages = [
+                {"role": "system", "content": FOLD_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Current summary:\n{self.summary or '(empty)'}\n\nNew messages:\n{new_messages}"}
+            ]
+            response = await get_scheduler().run(
+                self.model,
+                lambda: client.chat.completions.create(
+                    model=self.model, messages=messages, temperature=0.2),
+                estimated_tokens=estimate_tokens(messages),
+                tokens_used=completion_total_tokens, stage='fold')
+            self.usage.append(usage_from_completion(
+                response, 'fold', self.model, time.perf_counter() - call_start))
+            summary = response.choices[0].message.content
+            if not summary:
+                logger.warning(
+                    "Context fold returned empty content; keeping older turns verbatim.")
+                return
+            self.summary = summary.strip()
+            self.summarized_upto = fold_upto
+            logger.debug(
+                f"Folded {len(entries)} history entries into the running summary.")
+        except Exception as e:
+            # Compaction is an optimization: on failure the entries simply stay verbatim
+            logger.warning(f"Context fold failed, keeping older turns verbatim: {e}")
+
+    async def aclose(self) -> None:
+        """Cancels any in-flight fold (called when the dialogue ends)."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class ContextCompactor:
+    """Builds one agent's view of the shared history, optionally compacting it.
+
+    With ``keep_turns`` set, the last K turns are kept verbatim and older turns are folded into a
+    running summary (a ``HistoryFold``). Folding happens in a background task so it never blocks a
+    turn: ``build_input`` always uses the most recent *finished* summary, and any older entries not
+    yet folded are sent verbatim. With ``keep_turns=None`` the full role-swapped history is sent
+    every turn.
+    """
+
+    def __init__(self, keep_turns: Optional[int], self_agents: Iterable[str], model: str = "gpt-4.1-mini",
+                 fold: Optional[HistoryFold] = None):
+        self.self_agents = set(self_agents)
+        self.fold = fold or HistoryFold(keep_turns, model)
+        self.tokens_saved = 0
+
+    def sharing(self, self_agents: Iterable[str]) -> "ContextCompactor":
+        """Returns another agent's view of the same history that shares this view's fold."""
+        return ContextCompactor(self.keep_turns, self_agents, self.model, fold=self.fold)
+
+    @property
+    def keep_turns(self) -> Optional[int]:
+        return self.fold.keep_turns
+
+    @property
+    def model(self) -> str:
+        return self.fold.model
+
+    @property
+    def summary(self) -> Optional[str]:
+        return self.fold.summary
+
+    @summary.setter
+    def summary(self, value: Optional[str]) -> None:
+        self.fold.summary = value
+
+    @property
+    def summarized_upto(self) -> int:
+        return self.fold.summarized_upto
+
+    @summarized_upto.setter
+    def summarized_upto(self, value: int) -> None:
+        self.fold.summarized_upto = value
+
+    @property
+    def usage(self) -> List[CallUsage]:
+        return self.fold.usage
+
+    @usage.setter
+    def usage(self, value: List[CallUsage]) -> None:
+        self.fold.usage = value
+
+    @property
+    def _task(self) -> Optional[asyncio.Task]:
+        return self.fold._task
+
+    def build_input(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns this agent's input (compacted once a summary exists) and records the tokens saved."""
+        compacted = build_agent_input(
+            history, self.self_agents, self.summary, self.summarized_upto)
+        if self.summary:
+            full = build_agent_input(history, self.self_agents)
+            self.tokens_saved += max(
+                0, estimate_input_tokens(full) - estimate_input_tokens(compacted))
+        return compacted
+
+    def update(self, history: List[Dict[str, Any]]) -> None:
+        """Schedules a background fold of entries that fell out of the keep window, if any."""
+        self.fold.update(history)
+
+    def take_usage(self) -> List[CallUsage]:
+        return self.fold.take_usage()
+
+    async def aclose(self) -> None:
+        """Cancels any in-flight fold (called when the dialogue ends)."""
+        await self.fold.aclose()
@@ -0,0 +1,298 @@
+"""Durable dialogue job queue in a SQLite file, and the worker loop that drains it.
+
+Jobs (``BatchJob``: config paths, max_turns, output_dir or a checkpoint to resume) are added with
+``JobQueue.enqueue``. A worker claims a job by taking a lease on it: the row is marked claimed by
+the worker until ``lease_until``. The worker renews the lease while the dialogue runs and records
+the result when it finishes. If a worker dies, its lease runs out and the job becomes claimable
+again, up to ``max_attempts`` claims. The queue therefore survives restarts and crashes.
+
+Claims are single ``BEGIN IMMEDIATE`` transactions, so any number of worker processes (one asyncio
+loop each, see ``run_worker``) can share one queue file. Each claim holds the database lock for
+about a millisecond, while a dialogue runs for seconds to minutes. Throughput therefore scales with
+the number of workers until the provider's quota becomes the limit. The worker makes its queue
+calls in a thread, so waiting for a contended lock never stalls the dialogues on its event loop.
+
+When a job starts, the path of its dialogue checkpoint is stored on the row. A worker that takes
+over a job whose lease ran out resumes the dialogue from that checkpoint instead of paying for
+every completed call again.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Literal, Optional
+
+from pydantic import BaseModel
+
+from .accounting import DialogueReport
+from .batch import _count_turns
+from .checkpoint import CHECKPOINT_SUFFIX
+from .config import BatchJob, get_config_registry
+from .participants import get_agent_registry
+from .runner import resume_dialogue, run_dialogue
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedJob(BaseModel):
+    """A job row of the queue."""
+    id: int
+    job: BatchJob
+    status: Literal['pending', 'claimed', 'completed', 'failed']
+    attempts: int = 0  # Times the job was claimed
+    worker: Optional[str] = None
+    lease_until: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    checkpoint: Optional[str] = None  # Dialogue checkpoint of the latest attempt
+
+
+class JobQueueStats(BaseModel):
+    """Job counts by status."""
+    pending: int = 0
+    claimed: int = 0
+    completed: int = 0
+    failed: int = 0
+
+    @property
+    def unfinished(self) -> int:
+        return self.pending + self.claimed
+
+
+class JobQueue:
+    """A SQLite-backed queue of dialogue jobs with leased claims.
+
+    The methods block while they wait for the database lock; async code calls them through
+    ``asyncio.to_thread`` (one connection, serialized by a lock, is shared by those threads).
+
+    Args:
+        path: Path of the SQLite database file (created if missing).
+        lease_s: How long a claim lasts without renewal.
+        max_attempts: Claims of one job before a job whose lease keeps running out is marked failed.
+    """
+
+    def __init__(self, path: str, lease_s: float = 300.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly where several statements must be atomic
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_until REAL, "
+            "created REAL NOT NULL, updated REAL NOT NULL, result TEXT, error TEXT, checkpoint TEXT)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if 'checkpoint' not in columns:  # Queue files created before checkpoints were tracked
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN checkpoint TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until)")
+
+    def enqueue(self, jobs: Iterable[BatchJob]) -> List[int]:
+        """Adds jobs and returns their ids."""
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for job in jobs:
+                    cursor = self._conn.execute(
+                        "INSERT INTO jobs (payload, status, created, updated) VALUES (?, 'pending', ?, ?)",
+                        (job.model_dump_json(exclude_none=True), now, now))
+                    ids.append(cursor.lastrowid)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def claim(self, worker: str) -> Optional[QueuedJob]:
+        """Leases the oldest pending job, or one whose lease ran out, to ``worker``.
+
+        Returns:
+            The claimed job, or None if there is nothing to claim right now.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose lease ran out too often are given up instead of crashing worker after worker
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated = ? "
+                    "WHERE status = 'claimed' AND lease_until < ? AND attempts >= ?",
+                    (f"lease expired {self.max_attempts} times", now, now, self.max_attempts))
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'pending' OR (status = 'claimed' AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1", (now,)).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'claimed', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                    "updated = ? WHERE id = ?", (worker, now + self.lease_s, now, row[0]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0])
+
+    def renew(self, job_id: int, worker: str) -> bool:
+        """Extends the lease; False if the job is no longer claimed by ``worker``."""
+        now = time.time()
+        return self._update(
+            "UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND status = 'claimed' AND worker = ?",
+            (now + self.lease_s, now, job_id, worker))
+
+    def set_checkpoint(self, job_id: int, worker: str, checkpoint: str) -> bool:
+        """Records where the running attempt checkpoints its dialogue; False if the claim was lost."""
+        return self._update(
+            "UPDATE jobs SET checkpoint = ?, updated = ? WHERE id = ? AND status = 'claimed' AND worker = ?",
+            (checkpoint, time.time(), job_id, worker))
+
+    def complete(self, job_id: int, worker: str, result: Dict[str, Any]) -> bool:
+        """Records a finished job's result; False if the claim was lost to another worker."""
+        return self._finish(job_id, worker, 'completed', result=json.dumps(result, default=str))
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        return self._finish(job_id, worker, 'failed', error=error)
+
+    def _finish(self, job_id: int, worker: str, status: str, result: Optional[str] = None,
+                error: Optional[str] = None) -> bool:
+        return self._update(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated = ? "
+            "WHERE id = ? AND status = 'claimed' AND worker = ?",
+            (status, result, error, time.time(), job_id, worker))
+
+    def _update(self, sql: str, params: tuple) -> bool:
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount == 1
+
+    def get(self, job_id: int) -> Optional[QueuedJob]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, payload, status, attempts, worker, lease_until, result, error, checkpoint "
+                "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return QueuedJob(id=row[0], job=BatchJob.model_validate_json(row[1]), status=row[2], attempts=row[3],
+                         worker=row[4], lease_until=row[5], result=json.loads(row[6]) if row[6] else None,
+                         error=row[7], checkpoint=row[8])
+
+    def stats(self) -> JobQueueStats:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return JobQueueStats(**counts)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+async def _run_queued_job(queue: JobQueue, queued: QueuedJob, worker_id: str, max_turns: int, output_dir: str,
+                          **dialogue_kwargs) -> Dict[str, Any]:
+    """Runs one claimed job and returns the result recorded in the queue.
+
+    An earlier attempt's checkpoint (its worker died or lost the lease) is resumed; otherwise the
+    dialogue starts and the path its checkpoints will be written to is stored on the row first.
+    """
+    job = queued.job
+    report = DialogueReport()
+    checkpoint = queued.checkpoint or job.resume_from
+    if checkpoint and os.path.exists(checkpoint):
+        if queued.checkpoint:
+            logger.info(f"[{worker_id}] Job {queued.id}: resuming the previous attempt from {checkpoint}")
+        else:
+            await asyncio.to_thread(queue.set_checkpoint, queued.id, worker_id, checkpoint)
+        history = await resume_dialogue(checkpoint, report=report, **dialogue_kwargs)
+    else:
+        registry, configs = get_agent_registry(), get_config_registry()
+        student = registry.student(configs.get(job.student_config, 'student'))
+        expert = registry.expert(configs.get(job.expert_config, 'expert'))
+        job_output_dir = job.output_dir or output_dir
+        checkpoint = os.path.join(job_output_dir, f"job_{queued.id}_{uuid.uuid4().hex[:8]}{CHECKPOINT_SUFFIX}")
+        await asyncio.to_thread(queue.set_checkpoint, queued.id, worker_id, checkpoint)
+        history = await run_dialogue(student, expert, max_turns=job.max_turns or max_turns,
+                                     output_dir=job_output_dir, report=report, checkpoint_path=checkpoint,
+                                     **dialogue_kwargs)
+    return {
+        "turns": _count_turns(history),
+        "goal_achieved": bool(history and history[-1].get('goal_achieved_flag')),
+        "stop_reason": report.stop_reason,
+        "totals": report.to_dict()['totals'],
+    }
+
+
+async def run_worker(queue: JobQueue, concurrency: int = 8, worker_id: Optional[str] = None,
+                     max_turns: int = 5, output_dir: str = "transcripts", poll_interval_s: float = 1.0,
+                     **dialogue_kwargs) -> int:
+    """Claims and runs jobs from ``queue`` on this event loop until no unfinished job is left.
+
+    Args:
+        queue: The job queue (one JobQueue per process; workers in other processes open their own).
+        concurrency: Dialogues this worker runs at the same time.
+        worker_id: Name recorded on claims; defaults to host and process id.
+        max_turns: Default maximum turns for jobs that do not set their own.
+        output_dir: Default output directory for jobs that do not set their own.
+        poll_interval_s: Wait before looking again when nothing is claimable but other workers
+            still hold claims (their leases may run out).
+        **dialogue_kwargs: Extra options forwarded to every ``run_dialogue`` call.
+
+    Returns:
+        The number of jobs this worker finished (completed or failed).
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    finished = 0
+
+    async def _keep_lease(job_id: int, dialogue: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(queue.lease_s / 3)
+            if not await asyncio.to_thread(queue.renew, job_id, worker_id):
+                logger.warning(f"[{worker_id}] Lost the lease on job {job_id}; cancelling it here.")
+                dialogue.cancel()
+                return
+
+    async def _slot() -> None:
+        nonlocal finished
+        while True:
+            queued = await asyncio.to_thread(queue.claim, worker_id)
+            if queued is None:
+                if (await asyncio.to_thread(queue.stats)).unfinished == 0:
+                    return
+                await asyncio.sleep(poll_interval_s)
+                continue
+            logger.info(f"[{worker_id}] Claimed job {queued.id} (attempt {queued.attempts})")
+            dialogue = asyncio.ensure_future(
+                _run_queued_job(queue, queued, worker_id, max_turns, output_dir, **dialogue_kwargs))
+            lease = asyncio.ensure_future(_keep_lease(queued.id, dialogue))
+            try:
+                result = await dialogue
+                await asyncio.to_thread(queue.complete, queued.id, worker_id, result)
+                logger.info(f"[{worker_id}] Job {queued.id} completed ({result['stop_reason']})")
+            except asyncio.CancelledError:
+                if not lease.done():
+                    raise  # This worker is shutting down; the lease runs out and another worker retries
+                continue  # The lease was lost and the job is another worker's now
+            except Exception as e:
+                logger.error(f"[{worker_id}] Job {queued.id} failed: {e}")
+                await asyncio.to_thread(queue.fail, queued.id, worker_id, str(e))
+            finally:
+                lease.cancel()
+                dialogue.cancel()
+            finished += 1
+
+    await asyncio.gather(*(_slot() for _ in range(concurrency)))
+    stats = await asyncio.to_thread(queue.stats)
+    logger.info(
+        f"[{worker_id}] Worker done: {finished} jobs finished here --- Queue: {stats.completed} completed, "
+        f"{stats.failed} failed, {stats.unfinished} unfinished")
+    return finished
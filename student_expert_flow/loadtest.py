@@ -0,0 +1,391 @@
+"""End-to-end load test of the dialogue orchestration against a synthetic local model.
+
+Drives ``run_batch``/``run_dialogue`` with a fake agents ``ModelProvider`` whose latency follows a
+configurable distribution, and reports throughput, event-loop lag, the overhead added outside the
+model call, and peak RSS. No network access or API key is needed.
+
+Example:
+    student-expert-flow-loadtest --dialogues 1,100,1000 --max-turns 3 --latency lognormal --latency-median 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+from agents import Model, ModelProvider, ModelResponse, RunConfig, Usage
+from openai.types.responses import (
+    Response, ResponseCompletedEvent, ResponseOutputMessage, ResponseOutputText, ResponseTextDeltaEvent, ResponseUsage)
+
+from student_expert_flow.batch import run_batch
+from student_expert_flow.config import BatchJob
+from student_expert_flow.models import StudentOutput
+from student_expert_flow.transcript import set_async_openai_client
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyDistribution(BaseModel):
+    """Latency model for synthetic calls (seconds)."""
+    kind: Literal['fixed', 'lognormal', 'pareto'] = 'fixed'
+    median: float = Field(default=0.5, ge=0)
+    sigma: float = Field(default=0.5, ge=0)  # lognormal spread
+    alpha: float = Field(default=1.5, gt=0)  # pareto tail index (smaller = heavier tail)
+    max_latency: Optional[float] = None  # Optional cap on any single sample
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'fixed':
+            value = self.median
+        elif self.kind == 'lognormal':
+            value = self.median * rng.lognormvariate(0.0, self.sigma)
+        else:
+            # Pareto with its median at `median`: x_m * U^(-1/alpha), median = x_m * 2^(1/alpha)
+            scale = self.median / (2 ** (1 / self.alpha))
+            value = scale * rng.paretovariate(self.alpha)
+        if self.max_latency is not None:
+            value = min(value, self.max_latency)
+        return value
+
+
+class ModelTimeStats:
+    """Accumulates the time synthetic calls spent "in the model" (sleeping)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.model_time_s = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.calls += 1
+        self.model_time_s += seconds
+
+
+STREAM_CHUNK_CHARS = 64  # Text per synthetic delta, a few tokens as with a real stream
+
+
+def _output_message(text: str) -> ResponseOutputMessage:
+    return ResponseOutputMessage(
+        id="msg_synthetic", type="message", role="assistant", status="completed",
+        content=[ResponseOutputText(type="output_text", text=text, annotations=[])])
+
+
+def _message_response(text: str, input_chars: int) -> ModelResponse:
+    input_tokens, output_tokens = input_chars // 4, len(text) // 4
+    return ModelResponse(
+        output=[_output_message(text)],
+        usage=Usage(requests=1, input_tokens=input_tokens, output_tokens=output_tokens,
+                    total_tokens=input_tokens + output_tokens),
+        response_id=None)
+
+
+class SyntheticModel(Model):
+    """Fake agents model that sleeps for a sampled latency and returns text of a fixed size.
+
+    Structured-output (student) calls return a StudentOutput JSON that never marks the goal as
+    achieved, so every dialogue runs for its full number of turns.
+    """
+
+    def __init__(self, latency: LatencyDistribution, response_chars: int, rng: random.Random, stats: ModelTimeStats):
+        self.latency = latency
+        self.response_chars = response_chars
+        self.rng = rng
+        self.stats = stats
+
+    def _response_text(self, output_schema) -> str:
+        text = "x" * self.response_chars
+        if output_schema is not None and not output_schema.is_plain_text():
+            text = StudentOutput(is_goal_achieved=False,
+                                 response_content=text).model_dump_json()
+        return text
+
+    @staticmethod
+    def _input_chars(input) -> int:
+        return len(input) if isinstance(input, str) else sum(
+            len(str(item.get('content', ''))) for item in input)
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                           *, previous_response_id):
+        delay = self.latency.sample(self.rng)
+        await asyncio.sleep(delay)
+        self.stats.add(delay)
+        return _message_response(self._response_text(output_schema), self._input_chars(input))
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs,
+                              tracing, *, previous_response_id):
+        """Streams the same response as ``get_response`` as text deltas, then a completed event.
+
+        The sampled latency is split evenly over the deltas, so the first token arrives after one
+        chunk's share and the whole response after the full latency.
+        """
+        delay = self.latency.sample(self.rng)
+        text = self._response_text(output_schema)
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        sequence_number = 0
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            # model_construct: the runner reads only these fields, and the required ones vary by openai version
+            yield ResponseTextDeltaEvent.model_construct(
+                type="response.output_text.delta", item_id="msg_synthetic", output_index=0, content_index=0,
+                delta=chunk, logprobs=[], sequence_number=sequence_number)
+            sequence_number += 1
+        self.stats.add(delay)
+        input_tokens, output_tokens = self._input_chars(input) // 4, len(text) // 4
+        yield ResponseCompletedEvent.model_construct(
+            type="response.completed", sequence_number=sequence_number,
+            response=Response.model_construct(
+                id="resp_synthetic", object="response", created_at=time.time(), model="synthetic",
+                output=[_output_message(text)], parallel_tool_calls=False, tool_choice="auto", tools=[],
+                usage=ResponseUsage.model_construct(input_tokens=input_tokens, output_tokens=output_tokens,
+                                                    total_tokens=input_tokens + output_tokens)))
+
+
+class SyntheticModelProvider(ModelProvider):
+    """Provider returning SyntheticModel for every model name."""
+
+    def __init__(self, latency: LatencyDistribution, response_chars: int = 2000, seed: int = 0,
+                 stats: Optional[ModelTimeStats] = None):
+        self.model = SyntheticModel(
+            latency, response_chars, random.Random(seed), stats or ModelTimeStats())
+
+    def get_model(self, model_name):
+        return self.model
+
+
+class SyntheticChatClient:
+    """AsyncOpenAI stand-in for summary calls with the same latency model."""
+
+    def __init__(self, latency: LatencyDistribution, response_chars: int, rng: random.Random, stats: ModelTimeStats):
+        self.latency = latency
+        self.response_chars = response_chars
+        self.rng = rng
+        self.stats = stats
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        delay = self.latency.sample(self.rng)
+        await asyncio.sleep(delay)
+        self.stats.add(delay)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(
+                content="s" * self.response_chars))],
+            usage=SimpleNamespace(prompt_tokens=0, completion_tokens=self.response_chars // 4,
+                                  prompt_tokens_details=None))
+
+
+class EventLoopLagMonitor:
+    """Measures event-loop lag: how late a periodic ``asyncio.sleep`` wakes up."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class LoadTestResult(BaseModel):
+    """Throughput and overhead figures for one load-test run."""
+    dialogues: int
+    concurrency: int
+    max_turns: int
+    latency: LatencyDistribution
+    response_chars: int
+    completed: int
+    failed: int
+    duration_s: float
+    dialogues_per_second: float
+    turns_per_second: float
+    model_calls: int
+    loop_lag_p99_ms: float
+    loop_lag_max_ms: float
+    sdk_overhead_per_call_ms: float  # Agent call time beyond the model's own latency
+    orchestration_overhead_per_turn_ms: float  # Dialogue time outside blocking model calls
+    rolling_summary: bool = False
+    stream: bool = False
+    summary_tail_latency_ms: float = 0.0  # Mean wait for the summary after a dialogue ended
+    peak_rss_mb: float
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+async def run_load_test(dialogues: int, concurrency: Optional[int] = None, max_turns: int = 3,
+                        latency: Optional[LatencyDistribution] = None, response_chars: int = 2000,
+                        student_config: str = "configs/student_config.yaml",
+                        expert_config: str = "configs/expert_config.yaml",
+                        output_dir: Optional[str] = None, seed: int = 0,
+                        rolling_summary: bool = False, stream: bool = False) -> LoadTestResult:
+    """Runs ``dialogues`` synthetic dialogues through ``run_batch`` and measures the orchestration.
+
+    Args:
+        dialogues: Number of dialogues to run.
+        concurrency: Dialogues in flight at once (defaults to all of them).
+        max_turns: Turns per dialogue (the synthetic student never ends early).
+        latency: Latency distribution of every synthetic model call.
+        response_chars: Size of every synthetic response.
+        student_config: Student config used for every job.
+        expert_config: Expert config used for every job.
+        output_dir: Where transcripts go; a temporary directory (removed afterwards) by default.
+        seed: Seed for latency sampling.
+        rolling_summary: Summarize turn by turn in the background instead of after each dialogue.
+        stream: Run every agent call with ``Runner.run_streamed`` (the synthetic model streams deltas).
+    """
+    latency = latency or LatencyDistribution()
+    concurrency = concurrency or dialogues
+    stats = ModelTimeStats()  # Agent (expert/student) calls
+    summary_stats = ModelTimeStats()  # Summary calls
+    rng = random.Random(seed)
+    provider = SyntheticModelProvider(latency, response_chars, seed, stats)
+    set_async_openai_client(SyntheticChatClient(
+        latency, response_chars // 4, rng, summary_stats))
+    run_config = RunConfig(model_provider=provider, tracing_disabled=True)
+
+    temp_dir = None
+    if output_dir is None:
+        temp_dir = output_dir = tempfile.mkdtemp(prefix="sef_loadtest_")
+    jobs = [BatchJob(student_config=student_config, expert_config=expert_config)
+            for _ in range(dialogues)]
+
+    monitor = EventLoopLagMonitor()
+    monitor.start()
+    try:
+        # Agent constructors print a line each; keep them out of the measurement output
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            report = await run_batch(jobs, concurrency=concurrency, max_turns=max_turns,
+                                     output_dir=output_dir, run_config=run_config,
+                                     rolling_summary=rolling_summary, stream=stream)
+    finally:
+        await monitor.stop()
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    total_turns = sum(r.turns for r in report.results)
+    # model_latency_s is the blocking model time: agent calls plus the end-of-dialogue summary wait
+    runner_time = sum(r.model_latency_s for r in report.results)
+    agent_call_time = runner_time - sum(r.summary_tail_latency_s or 0.0 for r in report.results)
+    dialogue_time = sum(r.duration_s for r in report.results)
+    calls = max(stats.calls, 1)
+    tails = [r.summary_tail_latency_s for r in report.results
+             if r.summary_tail_latency_s is not None]
+    return LoadTestResult(
+        dialogues=dialogues,
+        concurrency=concurrency,
+        max_turns=max_turns,
+        latency=latency,
+        response_chars=response_chars,
+        completed=report.completed,
+        failed=report.failed,
+        duration_s=report.total_duration_s,
+        dialogues_per_second=report.dialogues_per_second,
+        turns_per_second=report.turns_per_second,
+        model_calls=stats.calls + summary_stats.calls,
+        loop_lag_p99_ms=monitor.percentile(0.99) * 1000,
+        loop_lag_max_ms=max(monitor.samples, default=0.0) * 1000,
+        sdk_overhead_per_call_ms=max(
+            0.0, agent_call_time - stats.model_time_s) / calls * 1000,
+        orchestration_overhead_per_turn_ms=max(
+            0.0, dialogue_time - runner_time) / max(total_turns, 1) * 1000,
+        rolling_summary=rolling_summary,
+        stream=stream,
+        summary_tail_latency_ms=sum(tails) / len(tails) * 1000 if tails else 0.0,
+        peak_rss_mb=peak_rss_mb(),
+    )
+
+
+def _format_result(result: LoadTestResult) -> str:
+    return (f"dialogues={result.dialogues:>6} concurrency={result.concurrency:>6} "
+            f"ok={result.completed} failed={result.failed} | "
+            f"{result.dialogues_per_second:9.2f} dialogues/s {result.turns_per_second:9.2f} turns/s | "
+            f"loop lag p99={result.loop_lag_p99_ms:7.2f}ms max={result.loop_lag_max_ms:7.2f}ms | "
+            f"overhead sdk/call={result.sdk_overhead_per_call_ms:6.2f}ms orch/turn={result.orchestration_overhead_per_turn_ms:6.2f}ms | "
+            f"summary tail={result.summary_tail_latency_ms:7.1f}ms | "
+            f"peak RSS={result.peak_rss_mb:8.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test the dialogue orchestration against a synthetic local model.")
+    parser.add_argument("--dialogues", default="1,10,100",
+                        help="Comma-separated dialogue counts to run, e.g. 1,100,10000.")
+    parser.add_argument("--concurrency", type=int,
+                        help="Dialogues in flight at once (defaults to all dialogues of the run).")
+    parser.add_argument("--max-turns", type=int, default=3,
+                        help="Turns per dialogue.")
+    parser.add_argument("--latency", choices=['fixed', 'lognormal', 'pareto'], default='fixed',
+                        help="Latency distribution of synthetic model calls.")
+    parser.add_argument("--latency-median", type=float, default=0.5,
+                        help="Median latency in seconds.")
+    parser.add_argument("--latency-sigma", type=float, default=0.5,
+                        help="Sigma of the lognormal distribution.")
+    parser.add_argument("--pareto-alpha", type=float, default=1.5,
+                        help="Tail index of the Pareto (heavy-tailed) distribution.")
+    parser.add_argument("--latency-max", type=float,
+                        help="Cap on any single sampled latency in seconds.")
+    parser.add_argument("--response-chars", type=int, default=2000,
+                        help="Characters per synthetic response.")
+    parser.add_argument("--student-config", default="configs/student_config.yaml")
+    parser.add_argument("--expert-config", default="configs/expert_config.yaml")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rolling-summary", action="store_true",
+                        help="Use the background rolling summary (compare the summary tail latency with a run without it).")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream every agent call (synthetic text deltas) instead of awaiting whole responses.")
+    parser.add_argument("--json", metavar="PATH",
+                        help="Write all results as JSON to PATH.")
+    args = parser.parse_args()
+
+    # Per-turn INFO logs would dominate the measurement at high concurrency
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    latency = LatencyDistribution(kind=args.latency, median=args.latency_median, sigma=args.latency_sigma,
+                                  alpha=args.pareto_alpha, max_latency=args.latency_max)
+
+    results = []
+    for count in [int(c) for c in args.dialogues.split(',') if c.strip()]:
+        result = asyncio.run(run_load_test(
+            count, concurrency=args.concurrency, max_turns=args.max_turns, latency=latency,
+            response_chars=args.response_chars, student_config=args.student_config,
+            expert_config=args.expert_config, seed=args.seed, rolling_summary=args.rolling_summary,
+            stream=args.stream))
+        print(_format_result(result))
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            f.write("[" + ",\n".join(r.model_dump_json(indent=2)
+                    for r in results) + "]\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,21 @@
 import argparse
 import asyncio
+import datetime
 import logging
+import multiprocessing
 import os
+import sys
+from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 
-# Import necessary components from the project
-from student_expert_flow.participants import StudentAgent, ExpertAgent
-from student_expert_flow.runner import run_dialogue
-from student_expert_flow.config import load_config
+# Import necessary components from the project. Only light modules are imported here: the agents
+# SDK, openai and httpx (and every project module that needs them) are imported by the code paths
+# that make model calls, so --help and --validate-only start fast (see startup.py).
+from student_expert_flow.config import (
+    load_config, load_batch_manifest, load_rate_limits, get_config_registry, ClientSettings,
+    AdaptiveConcurrencyConfig, HedgingConfig, TurnRetryConfig)
+from student_expert_flow.hedging import HedgingPolicy
+from student_expert_flow.cache import ResponseCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -15,21 +23,376 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 
-async def async_main():
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Run a dialogue between a Student and an Expert agent.")
-    parser.add_argument("--student-config", required=True,
-                        help="Path to the Student agent's YAML configuration file.")
-    parser.add_argument("--expert-config", required=True,
-                        help="Path to the Expert agent's YAML configuration file.")
+    parser.add_argument("--student-config",
+                        help="Path to the Student agent's YAML configuration file (required unless --batch is used).")
+    parser.add_argument("--expert-config",
+                        help="Path to the Expert agent's YAML configuration file (required unless --batch is used).")
     parser.add_argument("--max-turns", type=int, default=5,
                         help="Maximum number of dialogue turns.")
     parser.add_argument("--output-dir", default="transcripts",
                         help="Directory to save conversation transcripts and summaries.")
+    parser.add_argument("--max-total-tokens", type=int,
+                        help="Token budget per dialogue; the dialogue ends cleanly once it is reached (overrides the student config).")
+    parser.add_argument("--max-cost", type=float,
+                        help="Estimated USD budget per dialogue (overrides the student config).")
+    parser.add_argument("--batch", metavar="MANIFEST",
+                        help="Path to a batch manifest YAML; runs all of its jobs concurrently in this process.")
+    parser.add_argument("--resume", metavar="CHECKPOINT",
+                        help="Continue an unfinished dialogue from its .checkpoint.json without repeating completed calls.")
+    parser.add_argument("--resume-unfinished", action="store_true",
+                        help="With --batch, resume every unfinished dialogue (checkpoint) in the manifest's output directories instead of starting its jobs.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a daemon: keep the client and agents warm and run dialogue jobs submitted over HTTP (see --port/--socket).")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="With --serve, address to listen on (default: 127.0.0.1). Other than loopback addresses "
+                             "need a token in STUDENT_EXPERT_FLOW_DAEMON_TOKEN, which requests must then send.")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="With --serve, TCP port to listen on (default: 8765).")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="With --serve, listen on this Unix socket instead of a TCP port.")
+    parser.add_argument("--allowed-root", metavar="DIR",
+                        help="With --serve, reject jobs whose config, checkpoint or output paths are outside DIR.")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="SQLite job queue file for --worker and --enqueue (created if missing).")
+    parser.add_argument("--enqueue", metavar="MANIFEST",
+                        help="Add a batch manifest's jobs to --queue (then exit, unless --worker is given).")
+    parser.add_argument("--worker", action="store_true",
+                        help="Claim and run jobs from --queue until none are left; restarted or crashed workers' jobs are reclaimed after their lease runs out.")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="With --worker, number of worker processes, each running --concurrency dialogues (default: 1).")
+    parser.add_argument("--lease", type=float, default=300.0,
+                        help="With --worker, seconds a claim lasts without renewal before another worker may take the job (default: 300).")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="Do not write per-turn checkpoints.")
+    parser.add_argument("--turn-timeout", type=float,
+                        help="Seconds an expert/student call may take, retries included; a call that runs over is cancelled and the dialogue ends, still saved (overrides the student config).")
+    parser.add_argument("--dialogue-deadline", type=float,
+                        help="Seconds a dialogue's turns may take in total; the pending call is then cancelled and the partial dialogue saved (overrides the student config).")
+    parser.add_argument("--concurrency", type=int,
+                        help="Maximum dialogues running at once in batch mode (overrides the manifest) or with --serve (default: 4).")
+    parser.add_argument("--adaptive-concurrency", action="store_true",
+                        help="Batch mode: adapt the number of dialogues and model calls in flight (AIMD) to latency, 429s and timeouts, starting from --concurrency.")
+    parser.add_argument("--target-p95-latency", type=float,
+                        help="With --adaptive-concurrency, p95 call latency in seconds up to which concurrency keeps growing (default: 30).")
+    parser.add_argument("--max-concurrency", type=int,
+                        help="With --adaptive-concurrency, upper bound for dialogues in flight (default: 4x the starting concurrency).")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Hedge slow expert calls: start a duplicate once a call outlives a percentile of recent latency and keep the first result (overrides the manifest).")
+    parser.add_argument("--hedge-percentile", type=float,
+                        help="With --hedge, latency percentile after which a call is duplicated, as a fraction (default: 0.95).")
+    parser.add_argument("--hedge-max-rate", type=float,
+                        help="With --hedge, maximum fraction of calls that may be duplicated (default: 0.1).")
+    parser.add_argument("--cache", metavar="PATH",
+                        help="Path to an SQLite response cache; identical expert/student/summary calls are served from it.")
+    parser.add_argument("--cache-max-entries", type=int,
+                        help="Maximum number of cached responses (least recently used are evicted).")
+    parser.add_argument("--cache-max-mb", type=float,
+                        help="Maximum total size of cached responses in MB.")
+    parser.add_argument("--cache-max-age-hours", type=float,
+                        help="Cached responses older than this are discarded.")
+    record_replay = parser.add_mutually_exclusive_group()
+    record_replay.add_argument("--record", metavar="DIR",
+                               help="Record every model interaction (agents and summaries) into cassette files in DIR.")
+    record_replay.add_argument("--replay", metavar="DIR",
+                               help="Serve model interactions offline from cassettes recorded in DIR (no network access).")
+    parser.add_argument("--replay-latency", default=None,
+                        help="Latency injected per replayed call: seconds (e.g. 0.5) or 'recorded' to reuse the measured latency.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream expert/student responses: print tokens as they arrive (single dialogue) and write a live .live.md transcript.")
+    parser.add_argument("--stream-idle-timeout", type=float,
+                        help="With --stream, cancel a generation that produces no output for this many seconds.")
+    parser.add_argument("--rolling-summary", action="store_true",
+                        help="Update the summary in the background after every turn so it is ready almost as soon as the dialogue ends.")
+    parser.add_argument("--summary-chunk-tokens", type=int,
+                        help="Summarize transcripts longer than this many tokens in chunks of whole turns (overrides the expert config).")
+    parser.add_argument("--summary-concurrency", type=int, default=4,
+                        help="Maximum concurrent chunk summaries for long transcripts.")
+    parser.add_argument("--http-max-connections", type=int,
+                        help="Maximum concurrent HTTP connections of the shared OpenAI client (default: 100).")
+    parser.add_argument("--http-max-keepalive", type=int,
+                        help="Maximum idle connections kept open for reuse (default: 100).")
+    parser.add_argument("--http-keepalive-expiry", type=float,
+                        help="Seconds an idle connection is kept open (default: 60).")
+    parser.add_argument("--http-timeout", type=float,
+                        help="Read/write timeout in seconds for model calls (default: 300).")
+    parser.add_argument("--http-connect-timeout", type=float,
+                        help="Connection timeout in seconds (default: 10).")
+    parser.add_argument("--max-retries", type=int,
+                        help="Retries of the OpenAI client on connection errors and 429/5xx responses (default: 2).")
+    parser.add_argument("--rate-limits", metavar="PATH",
+                        help="YAML with per-model RPM/TPM quotas; calls queue for capacity instead of hitting 429s (overrides the manifest).")
+    parser.add_argument("--turn-retries", type=int,
+                        help="Retries of an expert/student call after transient errors such as timeouts or 5xx responses (default: 2).")
+    parser.add_argument("--max-reasks", type=int,
+                        help="Re-asks of an expert/student call whose output could not be parsed (default: 1).")
+    parser.add_argument("--validate-only", action="store_true",
+                        help="Load and validate the given configs, batch manifest (with every job's configs) and rate limits, then exit (status 1 on errors) without running anything.")
+    parser.add_argument("--import-profile", action="store_true",
+                        help="Print an import-time breakdown of CLI startup and of the modules a dialogue run loads, then exit.")
     # Add a verbose flag later if needed (Task 11)
+    return parser
 
-    args = parser.parse_args()
 
+def _check_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.import_profile:
+        return
+    if args.validate_only:
+        if not (args.student_config or args.expert_config or args.batch or args.enqueue or args.rate_limits):
+            parser.error("--validate-only needs configs to validate (--student-config, --expert-config, --batch, --enqueue or --rate-limits).")
+        return
+    if not (args.batch or args.resume or args.serve or args.worker or args.enqueue) and not (
+            args.student_config and args.expert_config):
+        parser.error(
+            "--student-config and --expert-config are required unless --batch, --resume, --serve, --worker or --enqueue is given.")
+    if args.resume_unfinished and not args.batch:
+        parser.error("--resume-unfinished requires --batch.")
+    if (args.worker or args.enqueue) and not args.queue:
+        parser.error("--worker and --enqueue require --queue.")
+    if args.serve and not args.socket:
+        from student_expert_flow.daemon import TOKEN_ENV_VAR, is_loopback_host
+        if not is_loopback_host(args.host) and not os.environ.get(TOKEN_ENV_VAR):
+            parser.error(f"--host {args.host} is reachable from other machines; set {TOKEN_ENV_VAR} to require a token.")
+
+
+async def async_main(args: Optional[argparse.Namespace] = None):
+    parser = _build_parser()
+    if args is None:
+        args = parser.parse_args()
+    _check_args(parser, args)
+    if args.import_profile:
+        print_import_profile()
+        return
+    if args.validate_only:
+        return validate_configs(args)
+
+    if args.enqueue:
+        try:
+            _enqueue_manifest(args.enqueue, args.queue)
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"Failed to enqueue batch manifest: {e}")
+            return
+        if not args.worker:
+            return
+    if args.worker and args.processes > 1:
+        # Each process sets up its own clients and event loop; this one only waits for them
+        await asyncio.to_thread(_run_worker_processes, args)
+        return
+
+    from student_expert_flow import clients, scheduler
+
+    # CLI pool options override the batch manifest's http section, which overrides the defaults
+    http_overrides = _http_overrides(args)
+    clients.set_client_settings(ClientSettings(**http_overrides))
+    if args.rate_limits:
+        try:
+            scheduler.configure_scheduler(load_rate_limits(args.rate_limits))
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"Failed to load rate limits: {e}")
+            return
+    hedging = _make_hedging_policy(args)
+    cache = _make_cache(args)
+    run_config, cassette = _make_record_replay_config(args)
+    # Options shared by single-dialogue and batch runs (forwarded to run_dialogue)
+    dialogue_kwargs: Dict[str, Any] = {
+        "max_total_tokens": args.max_total_tokens,
+        "max_cost": args.max_cost,
+        "turn_timeout": args.turn_timeout,
+        "dialogue_deadline": args.dialogue_deadline,
+        "cache": cache,
+        "run_config": run_config,
+        "stream": args.stream,
+        "stream_idle_timeout": args.stream_idle_timeout,
+        "rolling_summary": args.rolling_summary,
+        "summary_chunk_tokens": args.summary_chunk_tokens,
+        "summary_concurrency": args.summary_concurrency,
+        "hedging": hedging,
+        "checkpoint": not args.no_checkpoint,
+        "retry": _make_retry_config(args),
+    }
+    try:
+        if args.serve:
+            from student_expert_flow.daemon import TOKEN_ENV_VAR, run_daemon
+            # Jobs bring their own configs; --concurrency, --max-turns and --output-dir are defaults
+            await run_daemon(host=args.host, port=args.port, socket_path=args.socket,
+                             concurrency=args.concurrency or 4, max_turns=args.max_turns,
+                             output_dir=args.output_dir, token=os.environ.get(TOKEN_ENV_VAR) or None,
+                             allowed_root=args.allowed_root, **dialogue_kwargs)
+        elif args.worker:
+            from student_expert_flow.jobqueue import JobQueue, run_worker
+            queue = JobQueue(args.queue, lease_s=args.lease)
+            try:
+                await run_worker(queue, concurrency=args.concurrency or 8, max_turns=args.max_turns,
+                                 output_dir=args.output_dir, **dialogue_kwargs)
+            finally:
+                queue.close()
+        elif args.batch:
+            # Interleaved tokens of concurrent dialogues would be unreadable; batch streaming only
+            # writes each dialogue's live transcript
+            await run_batch_from_manifest(args.batch, concurrency=args.concurrency,
+                                          resume_unfinished=args.resume_unfinished,
+                                          http_overrides=http_overrides,
+                                          use_manifest_rate_limits=not args.rate_limits,
+                                          adaptive_overrides=_adaptive_overrides(args), **dialogue_kwargs)
+        else:
+            if args.stream:
+                dialogue_kwargs["on_token"] = _TokenPrinter()
+            if args.resume:
+                await resume_single_dialogue(args.resume, **dialogue_kwargs)
+            else:
+                await run_single_dialogue(args, **dialogue_kwargs)
+    finally:
+        if cache is not None:
+            cache.log_stats()
+            cache.close()
+        if cassette is not None:
+            cassette.close()
+        scheduler.get_scheduler().log_stats()
+        if hedging is not None:
+            hedging.log_stats()
+        clients.log_pool_stats()
+        await clients.aclose_clients()
+
+
+def _enqueue_manifest(manifest_path: str, queue_path: str) -> None:
+    """Adds a batch manifest's jobs to the job queue, with the manifest's defaults filled in."""
+    from student_expert_flow.jobqueue import JobQueue
+    manifest = load_batch_manifest(manifest_path)
+    jobs = [job if job.resume_from else job.model_copy(update={
+        "max_turns": job.max_turns or manifest.max_turns,
+        "output_dir": job.output_dir or manifest.output_dir}) for job in manifest.jobs]
+    queue = JobQueue(queue_path)
+    try:
+        queue.enqueue(jobs)
+        stats = queue.stats()
+    finally:
+        queue.close()
+    logger.info(f"Enqueued {len(jobs)} jobs in {queue_path} ({stats.unfinished} unfinished in the queue)")
+
+
+def _worker_process(args: argparse.Namespace) -> None:
+    """Entry point of one --worker process (started by _run_worker_processes)."""
+    load_dotenv(override=True)
+    args = argparse.Namespace(**{**vars(args), "processes": 1, "enqueue": None})
+    try:
+        asyncio.run(async_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_worker_processes(args: argparse.Namespace) -> None:
+    """Starts --processes worker processes on the same queue and waits for all of them."""
+    # spawn: a fresh interpreter per worker instead of forking a process that may hold threads
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_worker_process, args=(args,), name=f"worker-{i}")
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {len(processes)} worker processes on {args.queue}")
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            logger.warning(f"{process.name} exited with code {process.exitcode}")
+
+
+def _make_hedging_policy(args) -> Optional[HedgingPolicy]:
+    """Creates the process-wide hedging policy for --hedge (None without it)."""
+    if not args.hedge:
+        return None
+    options = {"percentile": args.hedge_percentile,
+               "max_hedge_rate": args.hedge_max_rate}
+    return HedgingPolicy(HedgingConfig(**{name: value for name, value in options.items() if value is not None}))
+
+
+def _make_retry_config(args) -> Optional[TurnRetryConfig]:
+    """Returns the turn retry policy from --turn-retries/--max-reasks (None without either)."""
+    options = {"max_retries": args.turn_retries, "max_reasks": args.max_reasks}
+    options = {name: value for name, value in options.items() if value is not None}
+    return TurnRetryConfig(**options) if options else None
+
+
+def _adaptive_overrides(args) -> Optional[Dict[str, Any]]:
+    """Returns the AdaptiveConcurrencyConfig fields given on the command line (None without --adaptive-concurrency)."""
+    if not args.adaptive_concurrency:
+        return None
+    options = {"target_p95_s": args.target_p95_latency,
+               "max_dialogues": args.max_concurrency}
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def _http_overrides(args) -> Dict[str, Any]:
+    """Returns the ClientSettings fields given on the command line."""
+    options = {
+        "max_connections": args.http_max_connections,
+        "max_keepalive_connections": args.http_max_keepalive,
+        "keepalive_expiry": args.http_keepalive_expiry,
+        "timeout": args.http_timeout,
+        "connect_timeout": args.http_connect_timeout,
+        "max_retries": args.max_retries,
+    }
+    return {name: value for name, value in options.items() if value is not None}
+
+
+class _TokenPrinter:
+    """Streaming callback that prints tokens to stdout, with a header whenever the speaker changes."""
+
+    def __init__(self):
+        self._speaker = None
+
+    def __call__(self, stage: str, agent_name: str, delta: str) -> None:
+        if agent_name != self._speaker:
+            self._speaker = agent_name
+            sys.stdout.write(f"\n\n[{agent_name}] ")
+        sys.stdout.write(delta)
+        sys.stdout.flush()
+
+
+def _make_record_replay_config(args):
+    """Builds the RunConfig and summary client for --record/--replay.
+
+    Returns:
+        A tuple of (run_config, cassette); both are None when neither flag is given.
+    """
+    if not (args.record or args.replay):
+        return None, None
+    from agents import RunConfig
+    from student_expert_flow.replay import (
+        Cassette, RecordingModelProvider, RecordingChatClient, ReplayModelProvider, ReplayChatClient)
+    from student_expert_flow.transcript import get_async_openai_client, set_async_openai_client
+    if args.record:
+        cassette = Cassette(args.record)
+        set_async_openai_client(RecordingChatClient(
+            get_async_openai_client(), cassette))
+        return RunConfig(model_provider=RecordingModelProvider(cassette)), cassette
+    if args.replay:
+        cassette = Cassette(args.replay).load()
+        latency = args.replay_latency
+        if latency is not None and latency != 'recorded':
+            latency = float(latency)
+        set_async_openai_client(ReplayChatClient(cassette, latency))
+        # Tracing would upload spans over the network, so it is disabled for offline replays
+        return RunConfig(model_provider=ReplayModelProvider(cassette, latency), tracing_disabled=True), cassette
+    return None, None
+
+
+def _make_cache(args) -> Optional[ResponseCache]:
+    """Creates the response cache from CLI arguments (None when --cache is not given)."""
+    if not args.cache:
+        return None
+    logger.info(f"Using response cache at: {args.cache}")
+    return ResponseCache(
+        args.cache,
+        max_entries=args.cache_max_entries,
+        max_bytes=int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else None,
+        max_age_seconds=args.cache_max_age_hours * 3600 if args.cache_max_age_hours else None)
+
+
+async def run_single_dialogue(args, **dialogue_kwargs):
+    """Loads both configs, builds the agents and runs one dialogue."""
+    from student_expert_flow.participants import StudentAgent, ExpertAgent
+    from student_expert_flow.runner import run_dialogue
     try:
         # 1. Load Configs
         logger.info(f"Loading student config from: {args.student_config}")
@@ -65,7 +428,8 @@ async def async_main():
 
         # 3. Run Dialogue
         logger.info(f"Starting dialogue with max turns: {args.max_turns}")
-        await run_dialogue(student, expert, max_turns=args.max_turns, output_dir=args.output_dir)
+        await run_dialogue(student, expert, max_turns=args.max_turns, output_dir=args.output_dir,
+                           **dialogue_kwargs)
         # The run_dialogue function now handles transcript/summary saving.
         # We might need to pass args.output_dir into it later if we centralize output path handling.
 
@@ -79,6 +443,130 @@ async def async_main():
         # Consider returning an error code or raising exception for the caller
 
 
+async def resume_single_dialogue(checkpoint_path: str, **dialogue_kwargs):
+    """Continues one unfinished dialogue from its checkpoint."""
+    from student_expert_flow.runner import resume_dialogue
+    try:
+        logger.info(f"Resuming dialogue from checkpoint: {checkpoint_path}")
+        await resume_dialogue(checkpoint_path, **dialogue_kwargs)
+        logger.info("Dialogue finished.")
+    except (FileNotFoundError, ValueError) as e:
+        logger.error(f"Failed to resume dialogue: {e}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+
+
+async def run_batch_from_manifest(manifest_path: str, concurrency: Optional[int] = None,
+                                  resume_unfinished: bool = False,
+                                  http_overrides: Optional[Dict[str, Any]] = None,
+                                  use_manifest_rate_limits: bool = True,
+                                  adaptive_overrides: Optional[Dict[str, Any]] = None, **dialogue_kwargs):
+    """Loads a batch manifest, runs all of its jobs and writes a JSON report next to the transcripts."""
+    from student_expert_flow import clients, scheduler
+    from student_expert_flow.batch import run_batch, unfinished_jobs
+    try:
+        manifest = load_batch_manifest(manifest_path)
+    except (FileNotFoundError, ValueError) as e:
+        logger.error(f"Failed to load batch manifest: {e}")
+        return
+    if manifest.http is not None:
+        clients.set_client_settings(
+            manifest.http.model_copy(update=http_overrides or {}))
+    if manifest.rate_limits is not None and use_manifest_rate_limits:
+        scheduler.configure_scheduler(manifest.rate_limits)
+
+    # --adaptive-concurrency enables adaptation even without an adaptive section in the manifest
+    adaptive = manifest.adaptive
+    if adaptive_overrides is not None:
+        adaptive = (adaptive or AdaptiveConcurrencyConfig()).model_copy(update=adaptive_overrides)
+
+    manifest_hedging = None
+    if manifest.hedging is not None and dialogue_kwargs.get("hedging") is None:
+        manifest_hedging = dialogue_kwargs["hedging"] = HedgingPolicy(manifest.hedging)
+
+    if manifest.retry is not None and dialogue_kwargs.get("retry") is None:
+        dialogue_kwargs["retry"] = manifest.retry
+
+    jobs = manifest.jobs
+    if resume_unfinished:
+        output_dirs = sorted({manifest.output_dir} | {job.output_dir for job in manifest.jobs if job.output_dir})
+        jobs = unfinished_jobs(output_dirs)
+        logger.info(
+            f"Resuming {len(jobs)} unfinished dialogues from checkpoints in {', '.join(output_dirs)}")
+        if not jobs:
+            return
+
+    os.makedirs(manifest.output_dir, exist_ok=True)
+    report = await run_batch(
+        jobs,
+        concurrency=concurrency or manifest.concurrency,
+        max_turns=manifest.max_turns,
+        output_dir=manifest.output_dir,
+        adaptive=adaptive,
+        **dialogue_kwargs)
+
+    if manifest_hedging is not None:
+        manifest_hedging.log_stats()
+
+    for result in report.results:
+        logger.info(
+            f"[{result.status.upper()}] {result.name}: turns={result.turns}, goal_achieved={result.goal_achieved}, "
+            f"duration={result.duration_s:.2f}s" + (f", error={result.error}" if result.error else ""))
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_path = os.path.join(
+        manifest.output_dir, f"batch_report_{timestamp}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(report.model_dump_json(indent=2))
+    logger.info(f"Batch report saved to {report_path}")
+
+
+def validate_configs(args: argparse.Namespace) -> int:
+    """Loads and validates every config named on the command line without importing the agents SDK.
+
+    Returns:
+        The process exit status: 0 if everything is valid, 1 otherwise.
+    """
+    configs = get_config_registry()
+    checks = [(path, lambda p=path, t=config_type: configs.get(p, t))
+              for path, config_type in ((args.student_config, 'student'), (args.expert_config, 'expert')) if path]
+    if args.rate_limits:
+        checks.append((args.rate_limits, lambda: load_rate_limits(args.rate_limits)))
+    for manifest_path in filter(None, (args.batch, args.enqueue)):
+        checks.append((manifest_path, lambda p=manifest_path: load_batch_manifest(p)))
+
+    errors = 0
+    for path, check in checks:
+        try:
+            result = check()
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"INVALID {path}: {e}")
+            errors += 1
+            continue
+        logger.info(f"OK {path}")
+        # A manifest is only usable if the configs its jobs name are, too (each checked once)
+        for job in getattr(result, 'jobs', []):
+            if job.resume_from:
+                if not os.path.exists(job.resume_from):
+                    logger.error(f"INVALID {path}: checkpoint not found: {job.resume_from}")
+                    errors += 1
+                continue
+            for job_path, config_type in ((job.student_config, 'student'), (job.expert_config, 'expert')):
+                try:
+                    configs.get(job_path, config_type)
+                except (FileNotFoundError, ValueError) as e:
+                    logger.error(f"INVALID {path}: {e}")
+                    errors += 1
+    logger.info(f"Validation {'failed' if errors else 'passed'}: {len(checks)} files checked, {errors} errors")
+    return 1 if errors else 0
+
+
+def print_import_profile() -> None:
+    """Prints how long CLI startup and the modules of a dialogue run take to import (see startup.py)."""
+    from student_expert_flow.startup import RUN_MODULES, format_import_report, profile_imports
+    print(format_import_report(profile_imports(('student_expert_flow.main',) + RUN_MODULES)))
+
+
 def main():
     # Load environment variables from .env file *before* anything else
     # Set override=True to ensure .env values take precedence over existing env vars
@@ -86,7 +574,9 @@ def main():
 
     # Setup asyncio event loop and run main coroutine
     try:
-        asyncio.run(async_main())
+        exit_code = asyncio.run(async_main())
+        if exit_code:
+            sys.exit(exit_code)
     except KeyboardInterrupt:
         logger.info("Execution interrupted by user.")
         # Optionally return a non-zero exit code
@@ -0,0 +1,275 @@
+"""Offline micro-benchmarks of the per-dialogue hot paths, with baselines and a regression check.
+
+Times ``format_transcript`` and ``save_transcript`` on histories of 10 to 100k entries with
+multi-KB contents, ``_sanitize_filename``, ``load_config`` on every YAML in ``configs/`` (and the same directory
+through a warm ``ConfigRegistry``), and
+building ``StudentAgent``/``ExpertAgent``. ``agent_setup[uncached]`` and ``agent_setup[registry]``
+compare a dialogue's agent setup (one student and one expert) built from scratch and taken from a
+warm ``AgentRegistry``.
+
+Example:
+    student-expert-flow-microbench --save-baseline   # record the baseline on this machine
+    student-expert-flow-microbench                   # compare; exits 1 on a regression
+"""
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from student_expert_flow.config import ConfigRegistry, load_config
+from student_expert_flow.participants import (
+    AgentRegistry, StudentAgent, ExpertAgent, _student_output_schema_json)
+from student_expert_flow.transcript import format_transcript, save_transcript, _sanitize_filename
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE_PATH = "benchmarks/microbench_baseline.json"
+DEFAULT_SIZES = [10, 1_000, 10_000, 100_000]
+DEFAULT_THRESHOLD = 0.25  # Fail when a benchmark gets more than 25% slower than its baseline
+
+
+class BenchmarkResult(BaseModel):
+    """Timing of one benchmark: seconds per operation over several repeats."""
+    name: str
+    iterations: int  # Operations per repeat
+    repeats: int
+    best_s: float  # Fastest per-operation time (used for regression checks)
+    median_s: float
+
+
+class Regression(BaseModel):
+    """A benchmark that got slower than its baseline by more than the threshold."""
+    name: str
+    baseline_s: float
+    current_s: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_s / self.baseline_s if self.baseline_s else float('inf')
+
+
+def time_operation(name: str, operation: Callable[[], Any], repeats: int = 5, min_time: float = 0.05) -> BenchmarkResult:
+    """Times ``operation``, calibrating the iterations per repeat so each repeat takes at least ``min_time``."""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or iterations >= 1_000_000:
+            break
+        iterations *= 10 if elapsed < min_time / 10 else 2
+
+    per_op = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        per_op.append((time.perf_counter() - start) / iterations)
+    return BenchmarkResult(name=name, iterations=iterations, repeats=repeats,
+                           best_s=min(per_op), median_s=statistics.median(per_op))
+
+
+def make_history(entries: int, content_bytes: int = 2048) -> List[Dict[str, Any]]:
+    """Builds a synthetic dialogue history: a System kickoff, then alternating expert/student entries."""
+    sentence = "Decorators wrap a function to extend its behaviour without modifying it. "
+    paragraph = sentence * (content_bytes // len(sentence) + 1)
+    # 99-character lines joined by newlines, so every entry is multi-line like real responses
+    content = "\n".join(paragraph[i:i + 99]
+                        for i in range(0, content_bytes, 99))[:content_bytes]
+    history = [{"role": "user", "agent": "System",
+                "content": "Please start the conversation by asking your first question."}]
+    for i in range(1, entries):
+        if i % 2:
+            history.append({"role": "assistant", "agent": "Expert", "content": content,
+                            "used_web_search": False})
+        else:
+            history.append({"role": "user", "agent": "Student", "content": content,
+                            "goal_achieved_flag": False})
+    return history
+
+
+def run_benchmarks(sizes: Optional[List[int]] = None, config_dir: str = "configs", repeats: int = 5,
+                   min_time: float = 0.05, name_filter: Optional[str] = None) -> List[BenchmarkResult]:
+    """Runs every benchmark (optionally only those whose name contains ``name_filter``)."""
+    sizes = sizes or DEFAULT_SIZES
+    goal = "Understand Python decorators: syntax, use cases, and how they wrap functions?"
+    benchmarks: List[tuple] = []
+
+    for size in sizes:
+        history = make_history(size)
+        benchmarks.append((f"format_transcript[{size}]",
+                           lambda h=history: format_transcript(h, goal)))
+
+    temp_dir = tempfile.mkdtemp(prefix="sef_microbench_")
+
+    def _save(history: List[Dict[str, Any]]) -> None:
+        # Remove both files again so repeats do not pile up (and gigabytes of output)
+        path = save_transcript(history, goal, output_dir=temp_dir)
+        os.remove(path)
+        os.remove(os.path.splitext(path)[0] + ".jsonl")
+
+    for size in sizes:
+        history = make_history(size)
+        benchmarks.append((f"save_transcript[{size}]",
+                           lambda h=history: _save(h)))
+
+    benchmarks.append(("sanitize_filename", lambda: _sanitize_filename(goal)))
+
+    config_paths = sorted(glob.glob(os.path.join(config_dir, "*.yaml")))
+    for path in config_paths:
+        # Participant configs are named student_*.yaml / expert_*.yaml (batch manifests are skipped)
+        config_type = os.path.basename(path).split('_', 1)[0]
+        if config_type not in ('student', 'expert'):
+            continue
+        benchmarks.append((f"load_config[{os.path.basename(path)}]",
+                           lambda p=path, t=config_type: load_config(p, t)))
+
+    # What a batch job spends on its two configs once the registry has seen them (a stat each)
+    config_registry = ConfigRegistry()
+    config_registry.load_directory(config_dir)
+    benchmarks.append(("config_registry[directory]", lambda: config_registry.load_directory(config_dir)))
+    benchmarks.append(("config_registry[job]", lambda: (
+        config_registry.get(os.path.join(config_dir, "student_config.yaml"), 'student'),
+        config_registry.get(os.path.join(config_dir, "expert_config.yaml"), 'expert'))))
+
+    student_config = load_config(os.path.join(
+        config_dir, "student_config.yaml"), 'student')
+    expert_config = load_config(os.path.join(
+        config_dir, "expert_config.yaml"), 'expert')
+    benchmarks.append(("StudentAgent()", lambda: StudentAgent(student_config)))
+    benchmarks.append(("ExpertAgent()", lambda: ExpertAgent(expert_config)))
+
+    # Per-dialogue agent setup: what a batch job paid before the registry (rendering the student's
+    # output schema every time), and what it pays now
+    def _setup_uncached() -> None:
+        _student_output_schema_json.cache_clear()
+        StudentAgent(student_config), ExpertAgent(expert_config)
+
+    registry = AgentRegistry()
+    benchmarks.append(("agent_setup[uncached]", _setup_uncached))
+    benchmarks.append(("agent_setup[registry]",
+                       lambda: (registry.student(student_config), registry.expert(expert_config))))
+
+    results = []
+    try:
+        # Agent constructors print a line each; keep them out of the benchmark output
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for name, operation in benchmarks:
+                if name_filter and name_filter not in name:
+                    continue
+                results.append(time_operation(
+                    name, operation, repeats=repeats, min_time=min_time))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+
+def save_baseline(results: List[BenchmarkResult], path: str = DEFAULT_BASELINE_PATH) -> None:
+    """Writes benchmark results (with the machine they ran on) as the baseline."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": {r.name: r.model_dump() for r in results},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    logger.info(f"Saved microbenchmark baseline to {path}")
+
+
+def load_baseline(path: str = DEFAULT_BASELINE_PATH) -> Dict[str, BenchmarkResult]:
+    """Loads a baseline written by ``save_baseline``."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {name: BenchmarkResult(**result) for name, result in data['results'].items()}
+
+
+def compare_results(results: List[BenchmarkResult], baseline: Dict[str, BenchmarkResult],
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Regression]:
+    """Returns the benchmarks whose best time exceeds the baseline's by more than ``threshold``."""
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        if result.best_s > base.best_s * (1 + threshold):
+            regressions.append(Regression(
+                name=result.name, baseline_s=base.best_s, current_s=result.best_s))
+    return regressions
+
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f}{unit}"
+    return f"{seconds / 1e-9:8.2f}ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks for transcript formatting, config loading and agent construction.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH,
+                        help=f"Baseline JSON path (default: {DEFAULT_BASELINE_PATH}).")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Save this run as the new baseline instead of comparing against it.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before failing, as a fraction (default: 0.25 = 25%%).")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated history sizes for the transcript benchmarks.")
+    parser.add_argument("--filter", dest="name_filter",
+                        help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--config-dir", default="configs")
+    args = parser.parse_args()
+
+    # Per-save INFO logs would be timed along with save_transcript
+    logging.basicConfig(level=logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    results = run_benchmarks(sizes=sizes, config_dir=args.config_dir, repeats=args.repeats,
+                             name_filter=args.name_filter)
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        baseline = load_baseline(args.baseline)
+    for result in results:
+        line = f"{result.name:<45} best {_format_seconds(result.best_s)}  median {_format_seconds(result.median_s)}"
+        base = baseline.get(result.name)
+        if base is not None:
+            line += f"  ({result.best_s / base.best_s:5.2f}x baseline)"
+        print(line)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if not baseline:
+        logger.warning(
+            f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    regressions = compare_results(results, baseline, args.threshold)
+    for regression in regressions:
+        logger.error(
+            f"Regression: {regression.name} is {regression.ratio:.2f}x its baseline "
+            f"({_format_seconds(regression.current_s).strip()} vs {_format_seconds(regression.baseline_s).strip()})")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} across {len(results)} benchmarks.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
+import collections
+import functools
+import hashlib
 import json  # Import the json library
+from typing import Any, Callable
+
 # Correct import from the SDK & Add WebSearchTool
 from agents import Agent, WebSearchTool
+from pydantic import BaseModel
 from student_expert_flow.config import ExpertConfig, StudentConfig
 # Import the structured output model
 from student_expert_flow.models import StudentOutput
 
+# The hosted web search tool holds no per-dialogue state, so every expert shares one instance
+_WEB_SEARCH_TOOL = WebSearchTool()
+
+
+@functools.lru_cache(maxsize=None)
+def _student_output_schema_json() -> str:
+    """StudentOutput's JSON schema, indented as it appears in the student's instructions (rendered once)."""
+    return json.dumps(StudentOutput.model_json_schema(), indent=2)
+
 
 class ExpertAgent:
     def __init__(self, config: ExpertConfig):
@@ -22,7 +37,7 @@ class ExpertAgent:
             name=config.name,
             instructions=effective_instructions,
             model=config.model,
-            tools=[WebSearchTool()]  # Add WebSearchTool here
+            tools=[_WEB_SEARCH_TOOL]  # Add WebSearchTool here
             # max_tokens might be implicitly handled by the SDK or set elsewhere?
             # For now, we'll omit it unless explicitly required by Agent signature
             # Or perhaps it's part of a ModelSettings object?
@@ -40,10 +55,8 @@ class StudentAgent:
         """Initializes the Student Agent using configuration and structured output."""
         self.config = config
 
-        # Generate the schema dictionary
-        schema_dict = StudentOutput.model_json_schema()
-        # Convert schema dictionary to indented JSON string
-        schema_json_string = json.dumps(schema_dict, indent=2)
+        # The schema as an indented JSON string (the same for every student, so rendered once)
+        schema_json_string = _student_output_schema_json()
 
         # Update instructions for structured output using the indented string
         structured_output_instructions = (
@@ -77,3 +90,60 @@ class StudentAgent:
     # Removed is_goal_achieved method - logic moved to runner checking the structured output
 
     # Removed placeholder ask method - Runner will invoke self.agent
+
+
+def config_hash(config: BaseModel) -> str:
+    """Content hash of an agent config: equal configs (e.g. loaded from the same YAML) hash alike."""
+    return hashlib.sha256(config.model_dump_json().encode('utf-8')).hexdigest()
+
+
+class AgentRegistry:
+    """Memoizes constructed Student/Expert agents by a hash of their config.
+
+    Building an agent renders its instructions and creates the SDK ``Agent``; a batch over a handful
+    of configs would otherwise repeat that for every dialogue. Sharing an agent between dialogues
+    (also concurrent ones) is safe: ``Runner.run`` never modifies it, and all dialogue state lives
+    in ``run_dialogue``.
+
+    Args:
+        max_entries: Agents kept; the least recently used ones are dropped beyond this.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._agents: "collections.OrderedDict[str, Any]" = collections.OrderedDict()
+
+    def student(self, config: StudentConfig) -> StudentAgent:
+        return self._get('student', config, StudentAgent)
+
+    def expert(self, config: ExpertConfig) -> ExpertAgent:
+        return self._get('expert', config, ExpertAgent)
+
+    def _get(self, kind: str, config: BaseModel, factory: Callable[[Any], Any]) -> Any:
+        key = f"{kind}:{config_hash(config)}"
+        agent = self._agents.get(key)
+        if agent is not None:
+            self.hits += 1
+            self._agents.move_to_end(key)
+            return agent
+        self.misses += 1
+        agent = self._agents[key] = factory(config)
+        if len(self._agents) > self.max_entries:
+            self._agents.popitem(last=False)
+        return agent
+
+    def clear(self) -> None:
+        self._agents.clear()
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+
+# Process-wide registry used by batch runs, the daemon, workers and resumed dialogues
+_registry = AgentRegistry()
+
+
+def get_agent_registry() -> AgentRegistry:
+    return _registry
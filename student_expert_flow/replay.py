@@ -0,0 +1,296 @@
+import asyncio
+import datetime
+import glob
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Union
+
+from pydantic import TypeAdapter
+from openai.types.responses import (
+    Response, ResponseCompletedEvent, ResponseOutputItem, ResponseOutputMessage, ResponseTextDeltaEvent)
+from openai.types.responses.response_usage import ResponseUsage
+from agents import Model, ModelProvider, ModelResponse, Usage
+from agents.models.multi_provider import MultiProvider
+
+from .cache import make_cache_key
+from .transcript import strip_transcript_timestamp
+
+logger = logging.getLogger(__name__)
+
+_OUTPUT_ITEM_ADAPTER = TypeAdapter(ResponseOutputItem)
+
+
+class ReplayMissError(LookupError):
+    """Raised when a replayed run makes a request that is not in the cassettes."""
+
+
+def model_request_key(model: Optional[str], system_instructions: Optional[str], input: Union[str, List[Any]],
+                      tools: List[Any], output_schema: Any) -> str:
+    """Hashes the parts of an agents SDK model request that determine its response."""
+    return make_cache_key(
+        kind='model',
+        model=model,
+        instructions=system_instructions,
+        input=input,
+        tools=[getattr(tool, 'name', str(tool)) for tool in tools],
+        output_schema=output_schema.json_schema() if output_schema is not None and not output_schema.is_plain_text() else None)
+
+
+def chat_request_key(model: str, messages: List[Dict[str, Any]], temperature: Any = None) -> str:
+    """Hashes a Chat Completions request (summary and fold calls), ignoring transcript timestamps."""
+    normalized = [{**m, "content": strip_transcript_timestamp(str(m.get('content', '')))} for m in messages]
+    return make_cache_key(kind='chat', model=model, messages=normalized, temperature=temperature)
+
+
+class Cassette:
+    """A directory of JSONL cassette files holding recorded model interactions.
+
+    Recording appends one JSON record per interaction to a new file for this process. Loading reads
+    every ``*.jsonl`` file in the directory and indexes the records by request key; repeated keys
+    are served in recorded order (the last one is reused once exhausted).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._file = None
+        self._records: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._last: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, record: Dict[str, Any]) -> None:
+        """Appends one interaction record to this process's cassette file."""
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(
+                self.directory, f"cassette_{timestamp}_{os.getpid()}.jsonl")
+            self._file = open(path, 'a', encoding='utf-8')
+            logger.info(f"Recording model interactions to {path}")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def load(self) -> "Cassette":
+        """Indexes every recorded interaction in the directory."""
+        paths = sorted(glob.glob(os.path.join(self.directory, "*.jsonl")))
+        if not paths:
+            raise FileNotFoundError(
+                f"No cassette files (*.jsonl) found in {self.directory}")
+        count = 0
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._records[record['key']].append(record)
+                        count += 1
+        logger.info(
+            f"Loaded {count} recorded interactions from {len(paths)} cassette file(s) in {self.directory}")
+        return self
+
+    def lookup(self, key: str) -> Dict[str, Any]:
+        """Returns the next recorded record for a request key."""
+        queue = self._records.get(key)
+        if queue:
+            self._last[key] = queue.popleft()
+        if key not in self._last:
+            raise ReplayMissError(
+                f"No recorded response for request {key[:12]} in {self.directory}")
+        return self._last[key]
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _serialize_model_response(response: ModelResponse) -> Dict[str, Any]:
+    return {
+        "output": [item.model_dump(mode='json') for item in response.output],
+        "usage": {"input_tokens": response.usage.input_tokens, "output_tokens": response.usage.output_tokens},
+        "response_id": response.response_id,
+    }
+
+
+def _deserialize_model_response(data: Dict[str, Any]) -> ModelResponse:
+    usage = data.get('usage') or {}
+    input_tokens = usage.get('input_tokens', 0)
+    output_tokens = usage.get('output_tokens', 0)
+    return ModelResponse(
+        output=[_OUTPUT_ITEM_ADAPTER.validate_python(item) for item in data['output']],
+        usage=Usage(requests=1, input_tokens=input_tokens, output_tokens=output_tokens,
+                    total_tokens=input_tokens + output_tokens),
+        response_id=data.get('response_id'))
+
+
+class RecordingModel(Model):
+    """Wraps a real model and records every response into a cassette."""
+
+    def __init__(self, inner: Model, model_name: Optional[str], cassette: Cassette):
+        self.inner = inner
+        self.model_name = model_name
+        self.cassette = cassette
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                           *, previous_response_id):
+        start = time.perf_counter()
+        response = await self.inner.get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+            previous_response_id=previous_response_id)
+        self.cassette.record({
+            "kind": "model",
+            "key": model_request_key(self.model_name, system_instructions, input, tools, output_schema),
+            "model": self.model_name,
+            "latency_s": time.perf_counter() - start,
+            "response": _serialize_model_response(response),
+        })
+        return response
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                              *, previous_response_id):
+        start = time.perf_counter()
+        async for event in self.inner.stream_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                previous_response_id=previous_response_id):
+            if isinstance(event, ResponseCompletedEvent):
+                usage = event.response.usage
+                self.cassette.record({
+                    "kind": "model",
+                    "key": model_request_key(self.model_name, system_instructions, input, tools, output_schema),
+                    "model": self.model_name,
+                    "latency_s": time.perf_counter() - start,
+                    "response": {
+                        "output": [item.model_dump(mode='json') for item in event.response.output],
+                        "usage": {"input_tokens": usage.input_tokens if usage else 0,
+                                  "output_tokens": usage.output_tokens if usage else 0},
+                        "response_id": event.response.id,
+                    },
+                })
+            yield event
+
+
+class RecordingModelProvider(ModelProvider):
+    """Model provider that records every model response served by the real (default) provider."""
+
+    def __init__(self, cassette: Cassette, inner: Optional[ModelProvider] = None):
+        self.cassette = cassette
+        self.inner = inner or MultiProvider()
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return RecordingModel(self.inner.get_model(model_name), model_name, self.cassette)
+
+
+class ReplayModel(Model):
+    """Offline model that serves recorded responses deterministically, with optional latency."""
+
+    def __init__(self, model_name: Optional[str], cassette: Cassette, latency: Union[float, str, None] = None):
+        self.model_name = model_name
+        self.cassette = cassette
+        self.latency = latency
+
+    async def _replay(self, system_instructions, input, tools, output_schema) -> Dict[str, Any]:
+        record = self.cassette.lookup(model_request_key(
+            self.model_name, system_instructions, input, tools, output_schema))
+        await _inject_latency(self.latency, record)
+        return record
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                           *, previous_response_id):
+        record = await self._replay(system_instructions, input, tools, output_schema)
+        return _deserialize_model_response(record['response'])
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                              *, previous_response_id) -> AsyncIterator[Any]:
+        record = await self._replay(system_instructions, input, tools, output_schema)
+        response = _deserialize_model_response(record['response'])
+        sequence = 0
+        for output_index, item in enumerate(response.output):
+            if not isinstance(item, ResponseOutputMessage):
+                continue
+            for content_index, part in enumerate(item.content):
+                text = getattr(part, 'text', None)
+                if text:
+                    yield ResponseTextDeltaEvent.model_construct(
+                        type="response.output_text.delta", delta=text, item_id=item.id,
+                        output_index=output_index, content_index=content_index, sequence_number=sequence, logprobs=[])
+                    sequence += 1
+        yield ResponseCompletedEvent.model_construct(
+            type="response.completed", sequence_number=sequence,
+            response=Response.model_construct(
+                id=response.response_id or "replay", output=response.output,
+                usage=ResponseUsage.model_construct(
+                    input_tokens=response.usage.input_tokens, output_tokens=response.usage.output_tokens,
+                    total_tokens=response.usage.total_tokens)))
+
+
+class ReplayModelProvider(ModelProvider):
+    """Model provider for offline runs that serves responses recorded in a cassette directory."""
+
+    def __init__(self, cassette: Cassette, latency: Union[float, str, None] = None):
+        self.cassette = cassette
+        self.latency = latency
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return ReplayModel(model_name, self.cassette, self.latency)
+
+
+async def _inject_latency(latency: Union[float, str, None], record: Dict[str, Any]) -> None:
+    """Sleeps for a fixed latency, or the originally recorded one when latency == 'recorded'."""
+    if latency == 'recorded':
+        await asyncio.sleep(record.get('latency_s', 0.0))
+    elif latency:
+        await asyncio.sleep(float(latency))
+
+
+class _ChatCompletions:
+    def __init__(self, create):
+        self.create = create
+
+
+class RecordingChatClient:
+    """AsyncOpenAI stand-in that forwards Chat Completions calls and records them into a cassette."""
+
+    def __init__(self, inner: Any, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+        self.chat = SimpleNamespace(completions=_ChatCompletions(self._create))
+
+    async def _create(self, **kwargs):
+        start = time.perf_counter()
+        response = await self.inner.chat.completions.create(**kwargs)
+        usage = getattr(response, 'usage', None)
+        self.cassette.record({
+            "kind": "chat",
+            "key": chat_request_key(kwargs.get('model'), kwargs.get('messages', []), kwargs.get('temperature')),
+            "model": kwargs.get('model'),
+            "latency_s": time.perf_counter() - start,
+            "response": {
+                "content": response.choices[0].message.content,
+                "usage": {"prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+                          "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0},
+            },
+        })
+        return response
+
+
+class ReplayChatClient:
+    """AsyncOpenAI stand-in that serves recorded Chat Completions responses offline."""
+
+    def __init__(self, cassette: Cassette, latency: Union[float, str, None] = None):
+        self.cassette = cassette
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=_ChatCompletions(self._create))
+
+    async def _create(self, **kwargs):
+        record = self.cassette.lookup(chat_request_key(
+            kwargs.get('model'), kwargs.get('messages', []), kwargs.get('temperature')))
+        await _inject_latency(self.latency, record)
+        usage = record['response'].get('usage') or {}
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(
+                content=record['response']['content']))],
+            usage=SimpleNamespace(prompt_tokens=usage.get('prompt_tokens', 0),
+                                  completion_tokens=usage.get('completion_tokens', 0),
+                                  prompt_tokens_details=None))
@@ -0,0 +1,106 @@
+"""Retries of failed expert/student calls, so one bad call does not end the whole dialogue.
+
+Every error is classified first:
+
+- transient: connection errors, timeouts (including stream idle timeouts) and 5xx/408/409
+  responses. The call is retried with jittered exponential backoff, up to ``max_retries`` times.
+- parse: the model's output could not be parsed into the agent's output type. The call is re-asked
+  with a note about the failure appended to its input, up to ``max_reasks`` times.
+- permanent: everything else (bad request, authentication, a 429 the scheduler already gave up
+  on, ...). Retrying would fail the same way, so the error is raised straight away.
+
+Each retry is reported as a ``RetryRecord``; the runner stores them in the dialogue report and on
+the history entry of the call they belong to.
+"""
+import asyncio
+import json
+import logging
+import random
+from typing import Awaitable, Callable, Literal, Optional, TypeVar
+
+import openai
+from agents.exceptions import ModelBehaviorError
+from pydantic import ValidationError
+
+from .accounting import RetryRecord
+from .config import TurnRetryConfig
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+ErrorKind = Literal['transient', 'parse', 'permanent']
+
+# 429 is left out: the scheduler has already retried it max_retries times when it gets here
+_TRANSIENT_STATUS = {408, 409}
+
+REASK_MESSAGE = ("Your previous reply could not be used ({error}). "
+                 "Please answer again, following the required output format exactly.")
+
+
+def classify_error(error: BaseException) -> ErrorKind:
+    """Classifies a failed agent call as 'transient', 'parse' or 'permanent'."""
+    if isinstance(error, (ModelBehaviorError, ValidationError, json.JSONDecodeError)):
+        return 'parse'
+    # openai.APITimeoutError is an APIConnectionError
+    if isinstance(error, (openai.APIConnectionError, TimeoutError, ConnectionError)):
+        return 'transient'
+    status = getattr(error, 'status_code', None)
+    if isinstance(status, int) and (status in _TRANSIENT_STATUS or status >= 500):
+        return 'transient'
+    return 'permanent'
+
+
+async def run_with_retries(call: Callable[[Optional[str]], Awaitable[T]], config: TurnRetryConfig,
+                           stage: str, turn: int,
+                           on_retry: Optional[Callable[[RetryRecord], None]] = None) -> T:
+    """Runs ``call``, retrying transient errors and re-asking after unparseable output.
+
+    Args:
+        call: Coroutine function making the call. It receives None on the first attempt and after
+            transient errors, and a re-ask note to append to the model input after a parse failure.
+        config: Retry and re-ask budgets and the backoff.
+        stage: Call stage ('expert' or 'student'), for records and logs.
+        turn: Dialogue turn of the call.
+        on_retry: Optional callback receiving a RetryRecord before each retry.
+
+    Returns:
+        The result of the first successful attempt.
+
+    Raises:
+        The call's exception if it is permanent or its retry budget is used up.
+    """
+    retries = reasks = 0
+    reask_note = None
+    while True:
+        try:
+            return await call(reask_note)
+        except Exception as e:
+            kind = classify_error(e)
+            if kind == 'permanent':
+                logger.error(f"Permanent error on {stage} call (turn {turn}), not retrying: {e}")
+                raise
+            if kind == 'transient' and retries >= config.max_retries:
+                logger.error(f"{stage.capitalize()} call (turn {turn}) still failing after {retries} retries: {e}")
+                raise
+            if kind == 'parse' and reasks >= config.max_reasks:
+                logger.error(f"{stage.capitalize()} output (turn {turn}) still unparseable after {reasks} re-asks: {e}")
+                raise
+            if kind == 'transient':
+                # Full jitter, as in the scheduler's rate-limit backoff
+                delay = random.uniform(0, min(config.max_delay_s, config.base_delay_s * 2 ** retries))
+                retries += 1
+                reask_note = None
+            else:
+                delay = 0.0
+                reasks += 1
+                reask_note = REASK_MESSAGE.format(error=e)
+            record = RetryRecord(stage=stage, turn=turn, attempt=retries + reasks, kind=kind,
+                                 error=f"{type(e).__name__}: {e}", delay_s=delay)
+            logger.warning(
+                f"{kind.capitalize()} error on {stage} call (turn {turn}); "
+                f"{'retry' if kind == 'transient' else 're-ask'} {record.attempt} in {delay:.1f}s: {e}")
+            if on_retry is not None:
+                on_retry(record)
+            if delay:
+                await asyncio.sleep(delay)
@@ -1,25 +1,323 @@
 import asyncio  # Import asyncio if we anticipate using Runner.run
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable
 import logging
 import os  # Import os for path manipulation
+import json
+import time
 
-from student_expert_flow.participants import StudentAgent, ExpertAgent
-from agents import Runner, Agent  # Import Runner and base Agent
+from student_expert_flow.participants import StudentAgent, ExpertAgent, get_agent_registry
+from agents import Runner, Agent, RunConfig  # Import Runner and base Agent
 # Import the specific result type for type hinting
-from agents.result import RunResult
+from agents.result import RunResult, RunResultStreaming
 # Import item and response types needed for checking citations/tool calls
 from agents.items import ToolCallItem
+from openai.types.responses import ResponseTextDeltaEvent
 
 # Import the structured output model
 from student_expert_flow.models import StudentOutput
 # Import transcript saving function
-from .transcript import save_transcript, format_transcript, generate_summary
+from .transcript import save_transcript, generate_summary, LiveTranscript, TranscriptWriter, RollingSummarizer, _sanitize_filename
+from .history import ContextCompactor
+from .accounting import DialogueReport, CallUsage, CancellationRecord, RetryRecord, usage_from_run_result
+from .cache import ResponseCache, make_cache_key
+from . import clients
+from .scheduler import get_scheduler, estimate_tokens, TimeoutScope
+from .hedging import HedgingPolicy, run_hedged
+from .retry import run_with_retries
+from .config import TurnRetryConfig
+from .checkpoint import (DialogueCheckpoint, HistoryViewState, CHECKPOINT_SUFFIX, checkpoint_path_for,
+                         save_checkpoint_async, load_checkpoint, remove_files)
+from pydantic import BaseModel
 
 # Add logger
 logger = logging.getLogger(__name__)
 
+# Streaming callback: receives (stage, agent name, text delta) as each chunk of a response arrives.
+# The student's deltas are the raw JSON of its structured output.
+TokenCallback = Callable[[str, str, str], None]
 
-async def run_dialogue(student: StudentAgent, expert: ExpertAgent, max_turns: int = 5, output_dir: str = "transcripts"):
+
+class StreamIdleTimeout(TimeoutError):
+    """Raised when a streamed generation produces no event within the idle timeout."""
+
+
+class DialogueTimeout(Exception):
+    """Raised when an agent call was cancelled by the turn timeout or the dialogue deadline."""
+
+    def __init__(self, record: CancellationRecord):
+        super().__init__(
+            f"{record.stage.capitalize()} call on turn {record.turn} cancelled after {record.timeout_s:.1f}s ({record.reason})")
+        self.record = record
+
+
+# How long a cancelled call may take to unwind (close its stream, release its slots)
+_CANCEL_GRACE_S = 5.0
+
+
+async def _wait_with_timeout(coro, timeout_s: Optional[float], report_timeout: bool = False) -> Tuple[bool, Any]:
+    """Awaits ``coro`` for at most ``timeout_s`` seconds, cancelling it if it runs over.
+
+    Unlike asyncio.wait_for, a TimeoutError raised by the call itself (e.g. a stream idle timeout)
+    propagates as is and is not mistaken for running over. With ``report_timeout`` the model calls
+    cancelled for running over are reported to adaptive concurrency as timeouts (see TimeoutScope).
+
+    Returns:
+        A tuple of (finished, result); result is None if the call was cancelled.
+    """
+    if timeout_s is None:
+        return True, await coro
+    scope = TimeoutScope()
+    task = scope.create_task(coro)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout_s)
+    except BaseException:
+        task.cancel()
+        raise
+    if done:
+        return True, task.result()
+    if report_timeout:
+        scope.expire()
+    task.cancel()
+    await asyncio.wait({task}, timeout=_CANCEL_GRACE_S)
+    if not task.done():
+        logger.warning(f"Cancelled call still unwinding after {_CANCEL_GRACE_S}s; moving on without it.")
+    return False, None
+
+
+def _make_history_view(config, self_agents: List[str]) -> ContextCompactor:
+    """Creates an agent's view of the shared history, applying its config's history policy."""
+    return ContextCompactor(
+        keep_turns=config.history_keep_turns,
+        self_agents=self_agents,
+        model=config.history_summary_model or config.model)
+
+
+def _make_history_views(expert_config, student_config) -> Tuple[ContextCompactor, ContextCompactor]:
+    """Creates the expert's and the student's views of the shared history.
+
+    The student also "owns" the System kickoff message, which is phrased on its behalf. A fold
+    summarizes the same entries with the same prompt for either view, so when both configs fold
+    the same number of turns with the same model the views share one fold instead of paying twice.
+    """
+    expert_view = _make_history_view(expert_config, [expert_config.name])
+    student_agents = [student_config.name, 'System']
+    if (student_config.history_keep_turns == expert_config.history_keep_turns and
+            (student_config.history_summary_model or student_config.model) == expert_view.model):
+        return expert_view, expert_view.sharing(student_agents)
+    return expert_view, _make_history_view(student_config, student_agents)
+
+
+def _used_web_search(result: RunResult) -> bool:
+    """Checks a run's new items for a hosted web search tool call."""
+    logger.debug(
+        f"--- Checking expert result items for web_search_call ---")
+    for idx, item in enumerate(result.new_items):
+        logger.debug(
+            f"Item {idx}: Type={type(item)}, RawItemType={getattr(item.raw_item, 'type', 'N/A')}")
+        if isinstance(item, ToolCallItem) and hasattr(item.raw_item, 'type') and item.raw_item.type == 'web_search_call':
+            logger.debug(
+                f"  Item {idx} is ToolCallItem with type 'web_search_call'. Setting flag to True.")
+            return True
+    return False
+
+
+def _agent_cache_key(agent: Agent, model: str, agent_input: List[Dict[str, Any]]) -> str:
+    """Hashes everything that determines an agent's response: model, instructions, output type, tools and input."""
+    output_type = agent.output_type
+    output_schema = output_type.model_json_schema() if isinstance(
+        output_type, type) and issubclass(output_type, BaseModel) else None
+    return make_cache_key(
+        kind='agent',
+        model=model,
+        instructions=agent.instructions,
+        output_type=getattr(output_type, '__name__', output_type),
+        output_schema=output_schema,
+        tools=[getattr(tool, 'name', str(tool)) for tool in agent.tools],
+        input=agent_input)
+
+
+def _read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+async def _open_transcript_writer(goal: str, output_dir: str) -> Optional[TranscriptWriter]:
+    """Opens the incremental transcript; on failure the transcript is saved at the end instead."""
+    try:
+        # Creating the files writes and fsyncs the header, so it runs off the event loop
+        return await asyncio.to_thread(TranscriptWriter, goal, output_dir)
+    except OSError as e:
+        logger.error(
+            f"Failed to open incremental transcript in {output_dir}: {e}; it will be saved at the end instead.")
+        return None
+
+
+async def _append_to_transcript(writer: Optional[TranscriptWriter], entry: Dict[str, Any]) -> Optional[TranscriptWriter]:
+    """Appends an entry to the incremental transcript, returning None (save at the end) on write errors."""
+    if writer is None:
+        return None
+    try:
+        await writer.append_async(entry)
+        return writer
+    except OSError as e:
+        logger.error(
+            f"Failed to append to transcript {writer.part_path}: {e}; it will be saved at the end instead.")
+        writer.close()
+        return None
+
+
+def _emit(stage: str, agent_name: str, delta: str, on_token: Optional[TokenCallback], live: Optional[LiveTranscript]) -> None:
+    """Forwards a text delta to the streaming callback and the live transcript."""
+    if on_token is not None:
+        on_token(stage, agent_name, delta)
+    if live is not None:
+        live.write(delta)
+
+
+async def _stream_agent(agent: Agent, agent_input: List[Dict[str, Any]], stage: str, run_config: Optional[RunConfig],
+                        on_token: Optional[TokenCallback], live: Optional[LiveTranscript],
+                        idle_timeout: Optional[float]) -> Tuple[RunResultStreaming, Optional[float], Optional[float]]:
+    """Runs one agent call with Runner.run_streamed, forwarding text deltas as they arrive.
+
+    If no stream event arrives for ``idle_timeout`` seconds the run is cancelled and
+    StreamIdleTimeout is raised, so a stuck generation fails early instead of after the full timeout.
+
+    Returns:
+        A tuple of (result, seconds to the first text delta, seconds to the last text delta).
+    """
+    start = time.perf_counter()
+    first_token_s = last_token_s = None
+    result = Runner.run_streamed(
+        agent, input=agent_input, run_config=run_config)
+    events = result.stream_events().__aiter__()
+    try:
+        while True:
+            try:
+                if idle_timeout is None:
+                    event = await events.__anext__()
+                else:
+                    # stream_events() swallows cancellation and just ends, so asyncio.wait_for would
+                    # look like a normal end of stream; detect the timeout explicitly instead
+                    next_event = asyncio.ensure_future(events.__anext__())
+                    done, _ = await asyncio.wait({next_event}, timeout=idle_timeout)
+                    if not done:
+                        next_event.cancel()
+                        raise StreamIdleTimeout(
+                            f"No streamed output from {agent.name} for {idle_timeout}s; generation cancelled")
+                    event = next_event.result()
+            except StopAsyncIteration:
+                break
+            if event.type == 'raw_response_event' and isinstance(event.data, ResponseTextDeltaEvent):
+                last_token_s = time.perf_counter() - start
+                if first_token_s is None:
+                    first_token_s = last_token_s
+                _emit(stage, agent.name, event.data.delta, on_token, live)
+        # A cancel from outside (turn timeout, lost job lease, shutdown) is swallowed by
+        # stream_events() as well and ends the stream early; it must not pass as a finished call
+        task = asyncio.current_task()
+        cancelling = getattr(task, 'cancelling', None)  # Python 3.11+
+        if (cancelling is not None and cancelling()) or not result.is_complete:
+            raise asyncio.CancelledError()
+    except BaseException:
+        result.cancel()
+        raise
+    return result, first_token_s, last_token_s
+
+
+def _timeout_stop_reason(error: DialogueTimeout) -> str:
+    return 'turn_timeout' if error.record.reason == 'turn_timeout' else 'deadline_exceeded'
+
+
+async def _run_agent(agent: Agent, agent_input: List[Dict[str, Any]], stage: str, model: str,
+                     cache: Optional[ResponseCache] = None, run_config: Optional[RunConfig] = None,
+                     stream: bool = False, on_token: Optional[TokenCallback] = None,
+                     live: Optional[LiveTranscript] = None, idle_timeout: Optional[float] = None,
+                     hedging: Optional[HedgingPolicy] = None) -> Tuple[Any, bool, CallUsage]:
+    """Runs one agent call with Runner.run (or Runner.run_streamed), or serves it from the response cache.
+
+    Returns:
+        A tuple of (final_output, used_web_search, usage).
+    """
+    cache_key = None
+    call_start = time.perf_counter()
+    if cache is not None:
+        cache_key = _agent_cache_key(agent, model, agent_input)
+        cached = await cache.get_async(cache_key)
+        if cached is not None:
+            final_output = cached['final_output']
+            if isinstance(final_output, dict) and isinstance(agent.output_type, type) and issubclass(agent.output_type, BaseModel):
+                final_output = agent.output_type.model_validate(final_output)
+            logger.debug(f"Response cache hit for {stage} call.")
+            if stream:
+                # A cached response arrives all at once
+                _emit(stage, agent.name, final_output.model_dump_json() if isinstance(
+                    final_output, BaseModel) else str(final_output), on_token, live)
+            usage = CallUsage(stage=stage, model=model,
+                              latency_s=time.perf_counter() - call_start, from_cache=True)
+            return final_output, cached['used_web_search'], usage
+
+    first_token_s = last_token_s = None
+
+    async def _call():
+        nonlocal first_token_s, last_token_s
+        if stream:
+            result, first_token_s, last_token_s = await _stream_agent(
+                agent, agent_input, stage, run_config, on_token, live, idle_timeout)
+            return result
+        return await Runner.run(agent, input=agent_input, run_config=run_config)
+
+    def _scheduled():
+        # Queued against the model's RPM/TPM buckets and retried on 429s instead of ending the dialogue
+        return get_scheduler().run(
+            model, _call,
+            estimated_tokens=estimate_tokens(agent_input) +
+            estimate_tokens(str(agent.instructions or '')),
+            tokens_used=lambda r: usage_from_run_result(r, stage, model, 0.0).total_tokens,
+            stage=stage)
+
+    # Streamed calls are not hedged: two copies would write interleaved deltas
+    hedged = False
+    if hedging is not None and hedging.applies_to(stage) and not stream:
+        result, hedged = await run_hedged(hedging, stage, _scheduled)
+    else:
+        result: RunResult = await _scheduled()
+    usage = usage_from_run_result(
+        result, stage, model, time.perf_counter() - call_start)
+    if hedged:
+        usage.hedged = True
+        usage.hedge_cost_upper_bound = usage.cost
+        hedging.stats.extra_cost_upper_bound += usage.hedge_cost_upper_bound
+    if stream:
+        usage.ttft_s = first_token_s
+        if first_token_s is not None and last_token_s > first_token_s:
+            usage.tokens_per_s = usage.output_tokens / \
+                (last_token_s - first_token_s)
+        if first_token_s is None:
+            logger.info(f"{stage.capitalize()} stream: no text deltas received.")
+        else:
+            logger.info(
+                f"{stage.capitalize()} stream: first token after {first_token_s:.2f}s, {usage.tokens_per_s or 0.0:.1f} tokens/s")
+    used_web_search = _used_web_search(result)
+    if cache is not None:
+        final_output = result.final_output
+        await cache.put_async(cache_key, {
+            "final_output": final_output.model_dump() if isinstance(final_output, BaseModel) else str(final_output),
+            "used_web_search": used_web_search,
+            "usage": usage.model_dump(),
+        })
+    return result.final_output, used_web_search, usage
+
+
+async def run_dialogue(student: StudentAgent, expert: ExpertAgent, max_turns: int = 5, output_dir: str = "transcripts",
+                       max_total_tokens: Optional[int] = None, max_cost: Optional[float] = None,
+                       report: Optional[DialogueReport] = None, cache: Optional[ResponseCache] = None,
+                       run_config: Optional[RunConfig] = None, stream: bool = False,
+                       on_token: Optional[TokenCallback] = None, stream_idle_timeout: Optional[float] = None,
+                       rolling_summary: bool = False, summary_chunk_tokens: Optional[int] = None,
+                       summary_concurrency: int = 4, hedging: Optional[HedgingPolicy] = None,
+                       checkpoint: bool = True, resume: Optional[DialogueCheckpoint] = None,
+                       checkpoint_path: Optional[str] = None, retry: Optional[TurnRetryConfig] = None,
+                       turn_timeout: Optional[float] = None, dialogue_deadline: Optional[float] = None):
     """Runs a dialogue loop between a Student and an Expert agent using agents.Runner.
 
     The flow is: System Goal -> Expert -> Student -> Expert -> Student ...
@@ -29,107 +327,286 @@ async def run_dialogue(student: StudentAgent, expert: ExpertAgent, max_turns: in
         expert: The initialized ExpertAgent.
         max_turns: Maximum number of turns for the dialogue.
         output_dir: Directory to save transcript and summary files.
+        max_total_tokens: Optional token budget; the dialogue ends cleanly once it is reached.
+            Defaults to the student config's max_total_tokens.
+        max_cost: Optional USD budget (estimated); defaults to the student config's max_cost.
+        report: Optional DialogueReport to fill with per-call usage, latency and cost. It is also
+            saved next to the transcript as ``.report.json``.
+        cache: Optional ResponseCache consulted before every expert, student and summary call.
+        run_config: Optional agents RunConfig for every Runner.run call (e.g. a recording or replay
+            model provider).
+        stream: Run every expert and student call with Runner.run_streamed. Text deltas go to
+            ``on_token`` and to a ``.live.md`` transcript as they arrive, and each call's
+            time-to-first-token and tokens/sec are recorded in the report.
+        on_token: Optional callback ``(stage, agent_name, delta)`` for streamed text deltas.
+        stream_idle_timeout: Optional seconds without any stream event after which a streamed
+            generation is cancelled (the turn then fails like any other agent error).
+        rolling_summary: Update the summary in the background after every turn instead of
+            summarizing the whole transcript after the dialogue ends (falls back to the post-hoc
+            summary if an update fails). Not served from the response cache.
+        summary_chunk_tokens: Optional chunk size for map-reduce summaries of long transcripts;
+            defaults to the expert config's summary_chunk_tokens.
+        summary_concurrency: Maximum concurrent chunk summaries.
+        hedging: Optional HedgingPolicy (shareable across dialogues). Calls of its stages that
+            outlive a percentile of recent latency get a duplicate; the first result wins. The
+            cancelled copy's cost is recorded as ``hedge_cost_upper_bound``, the winner's cost,
+            since the copy was cut off before finishing (not for streamed calls).
+        checkpoint: Save a checkpoint after every completed expert/student call (next to the
+            transcript, as ``.checkpoint.json``). It is deleted once the dialogue has been saved.
+        resume: Optional checkpoint to continue from. Its history, turn counter, goal status,
+            compaction state and usage are restored and no completed call is repeated. The
+            caller builds the agents from the checkpoint's configs (see ``resume_dialogue``).
+        checkpoint_path: Where to write checkpoints (defaults to the transcript's checkpoint path;
+            when resuming, pass the resumed checkpoint's path to keep updating it).
+        retry: Retry policy for failed expert/student calls (defaults to TurnRetryConfig()).
+            Transient errors are retried with backoff and unparseable output is re-asked within
+            the budget; permanent errors, or a used-up budget, end the dialogue as before. Retries
+            are recorded in the report and on the history entry of the call that recovered.
+        turn_timeout: Optional seconds each expert/student call may take, retries included; defaults
+            to the student config's turn_timeout. A call that runs over is cancelled and the
+            dialogue ends with stop_reason 'turn_timeout'.
+        dialogue_deadline: Optional seconds the turn loop may run (counted from the start of this
+            run, also when resuming); defaults to the student config's dialogue_deadline. The
+            pending call is cancelled and the dialogue ends with stop_reason 'deadline_exceeded'.
+            Either way the partial transcript, summary and report are still saved, and the
+            cancellation is recorded in ``report.cancellations`` with its stage.
     """
+    if report is None:
+        report = DialogueReport()
+    if resume is not None:
+        report.calls = list(resume.calls)  # Budgets and totals include the calls made before the resume
+    if max_total_tokens is None:
+        max_total_tokens = student.config.max_total_tokens
+    if max_cost is None:
+        max_cost = student.config.max_cost
+    if summary_chunk_tokens is None:
+        summary_chunk_tokens = expert.config.summary_chunk_tokens
+    if turn_timeout is None:
+        turn_timeout = student.config.turn_timeout
+    if dialogue_deadline is None:
+        dialogue_deadline = student.config.dialogue_deadline
+    dialogue_start = time.monotonic()
+    # Route agent calls through the shared, pooled client instead of one new client per Runner.run
+    clients.ensure_configured()
 
     logger.info(
         f"--- Starting Dialogue --- Goal: {student.config.goal} --- Max Turns: {max_turns} ---")
 
-    # Initialize conversation input with the student's goal, framed as a user request to the expert.
+    # Start the shared transcript with the student's goal, framed as a user request to the expert.
+    # full_history is the single source of truth: each agent's model input is a role-swapped view
+    # of it (its own entries as assistant, the other side as user), so every utterance is sent once.
     initial_message = {
-        "role": "user", "content": f"My learning goal is: {student.config.goal}. Please provide an initial explanation or ask clarifying questions."}
-    # This list is passed to the Runner, must only contain valid keys (role, content, id)
-    conversation_input: List[Dict[str, Any]] = [initial_message]
-
-    # Keep a separate log, starting with the same initial message but add the agent key for transcript clarity.
-    # Make a copy to avoid modifying the dict shared with conversation_input initially
-    logged_initial_message = initial_message.copy()
-    logged_initial_message['agent'] = 'System'
-    full_history: List[Dict[str, Any]] = [logged_initial_message]
-
+        "role": "user", "agent": "System", "content": f"My learning goal is: {student.config.goal}. Please provide an initial explanation or ask clarifying questions."}
+    full_history: List[Dict[str, Any]] = [initial_message]
     current_turn = 0
     goal_achieved = False  # Initialize goal achievement status
-
-    while current_turn < max_turns:
-        current_turn += 1
-        logger.info(f"--- Turn {current_turn} ---")
-
-        # --- Expert Turn --- #
-        # Ensure conversation_input is not empty before expert turn
-        if not conversation_input:
-            logger.error(
-                "Error: Conversation input became empty before expert turn.")
-            break
-
+    if resume is not None:
+        full_history = [dict(entry) for entry in resume.full_history]
+        current_turn = resume.current_turn
+        goal_achieved = resume.goal_achieved
+        report.retries = [RetryRecord.model_validate(record)
+                          for entry in full_history for record in entry.get('retries', [])]
         logger.info(
-            f"Running Expert ({expert.config.name})... Input: {conversation_input[-1]['content']}")
+            f"Resuming dialogue after turn {current_turn} ({len(full_history)} history entries, "
+            f"{len(report.calls)} calls already made; {resume.next_stage} next).")
+    # Every entry is appended (and fsynced) to the transcript as soon as it exists, so a crash or kill
+    # mid-dialogue still leaves a partial transcript with every completed call.
+    writer = await _open_transcript_writer(student.config.goal, output_dir)
+    for entry in full_history:
+        writer = await _append_to_transcript(writer, entry)
+    if resume is not None and writer is not None:
+        # The new transcript holds everything the crashed run's partial files did
+        remove_files(resume.transcript_part_paths)
+    if checkpoint and checkpoint_path is None:
+        checkpoint_path = checkpoint_path_for(writer.path) if writer is not None else os.path.join(
+            output_dir, f"dialogue_{time.strftime('%Y%m%d_%H%M%S')}_{_sanitize_filename(student.config.goal)}{CHECKPOINT_SUFFIX}")
+
+    # Per-agent history views (with optional rolling compaction from the config's history policy)
+    expert_view, student_view = _make_history_views(expert.config, student.config)
+    history_views = [expert_view, student_view]
+    if resume is not None:
+        for view in history_views:
+            view.usage = []
+        for view, state in zip(history_views, resume.history_views):
+            view.summary, view.summarized_upto = state.summary, state.summarized_upto
+            view.tokens_saved = state.tokens_saved
+            view.usage.extend(state.usage)
+
+    def _history_view_states() -> List[HistoryViewState]:
+        # A fold shared by both views keeps its unreported usage in the first view's state only
+        states, folds = [], set()
+        for view in history_views:
+            states.append(HistoryViewState(summary=view.summary, summarized_upto=view.summarized_upto,
+                                           tokens_saved=view.tokens_saved,
+                                           usage=[] if id(view.fold) in folds else view.usage))
+            folds.add(id(view.fold))
+        return states
+
+    def _charge_folds() -> None:
+        """Adds the usage of finished folds to the report, so budget checks count it."""
+        for view in history_views:
+            for call in view.take_usage():
+                report.add(call)
+
+    async def _save_checkpoint(stop_reason: Optional[str] = None) -> None:
+        """Checkpoints the dialogue after a completed call (a failed save only costs resumability)."""
+        if not checkpoint:
+            return
         try:
-            expert_result: RunResult = await Runner.run(expert.agent, input=conversation_input)
-            # Ensure it's a string
-            expert_response = str(expert_result.final_output)
-            logger.info(f"Expert ({expert.config.name}): {expert_response}")
+            await save_checkpoint_async(DialogueCheckpoint(
+                student_config=student.config, expert_config=expert.config,
+                max_turns=max_turns, output_dir=output_dir,
+                current_turn=current_turn, goal_achieved=goal_achieved, stop_reason=stop_reason,
+                full_history=full_history, calls=report.calls,
+                history_views=_history_view_states(),
+                transcript_part_paths=[writer.part_path, writer.jsonl_path + ".part"] if writer is not None else []),
+                checkpoint_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to save checkpoint {checkpoint_path}: {e}")
+
+    live = LiveTranscript(student.config.goal, output_dir) if stream else None
+    if live is not None:
+        live.start_entry('System', 'user')
+        live.write(initial_message['content'])
+        live.end_entry()
+        logger.info(f"Streaming live transcript to {live.path}")
+    # Background summary folded turn by turn (the post-hoc summary is used otherwise)
+    rolling = RollingSummarizer(
+        model=expert.config.model, report=report) if rolling_summary else None
+    stream_options = dict(stream=stream, on_token=on_token,
+                          live=live, idle_timeout=stream_idle_timeout, hedging=hedging)
+    retry = retry or TurnRetryConfig()
+
+    async def _run_agent_with_retries(agent: Agent, agent_input: List[Dict[str, Any]], stage: str,
+                                      model: str) -> Tuple[Any, bool, CallUsage, List[RetryRecord]]:
+        """Runs one agent call under the retry policy; also returns the retries it took."""
+        retries: List[RetryRecord] = []
+
+        def _on_retry(record: RetryRecord) -> None:
+            record.cost_before, record.tokens_before = report.total_cost, report.total_tokens
+            retries.append(record)
+            report.retries.append(record)
+            if live is not None:
+                live.write(f"\n[{record.kind} error, retrying: {record.error}]\n")
+
+        async def _attempt(reask_note: Optional[str]):
+            attempt_input = agent_input if reask_note is None else agent_input + \
+                [{"role": "user", "content": reask_note}]
+            return await _run_agent(agent, attempt_input, stage, model, cache, run_config, **stream_options)
+
+        # The call may take the turn timeout, or whatever is left of the dialogue deadline if less
+        timeout_s, reason = turn_timeout, 'turn_timeout'
+        if dialogue_deadline is not None:
+            remaining = dialogue_deadline - (time.monotonic() - dialogue_start)
+            if timeout_s is None or remaining < timeout_s:
+                timeout_s, reason = max(remaining, 0.0), 'dialogue_deadline'
+        # Only a turn timeout says the call was slow; the deadline may just have little time left
+        finished, result = await _wait_with_timeout(
+            run_with_retries(_attempt, retry, stage, current_turn, _on_retry), timeout_s,
+            report_timeout=reason == 'turn_timeout')
+        if not finished:
+            record = CancellationRecord(stage=stage, turn=current_turn, reason=reason, timeout_s=timeout_s,
+                                        elapsed_s=time.monotonic() - dialogue_start)
+            report.cancellations.append(record)
+            if live is not None:
+                live.write(f"\n[cancelled: {reason}]\n")
+            raise DialogueTimeout(record)
+        output, used_web_search, usage = result
+        for record in retries:
+            record.recovered = True
+        return output, used_web_search, usage, retries
+
+    # A checkpoint taken after the expert's response resumes with that turn's student call, and one
+    # taken after the loop ended (only saving was left) skips the loop entirely
+    resume_at_student = resume is not None and resume.stop_reason is None and resume.next_stage == 'student'
+    loop_stop_reason = resume.stop_reason if resume is not None else None
+    while current_turn < max_turns and loop_stop_reason is None:
+        if resume_at_student:
+            resume_at_student = False
+        else:
+            current_turn += 1
+            logger.info(f"--- Turn {current_turn} ---")
 
-            # Check for web search tool usage
-            expert_used_web_search_this_turn = False
-            logger.debug(
-                f"--- Checking expert result items for web_search_call ---")
-            for idx, item in enumerate(expert_result.new_items):
+            # --- Expert Turn --- #
+            expert_input = expert_view.build_input(full_history)
+            logger.info(
+                f"Running Expert ({expert.config.name})... Input: {expert_input[-1]['content']}")
+            try:
+                if live is not None:
+                    live.start_entry(expert.config.name, 'assistant',
+                                     heading=f"Turn {current_turn}")
+                expert_output, expert_used_web_search_this_turn, expert_usage, expert_retries = await _run_agent_with_retries(
+                    expert.agent, expert_input, 'expert', expert.config.model)
+                if live is not None:
+                    live.end_entry()
+                report.add(expert_usage)
+                # Ensure it's a string
+                expert_response = str(expert_output)
+                logger.info(f"Expert ({expert.config.name}): {expert_response}")
                 logger.debug(
-                    f"Item {idx}: Type={type(item)}, RawItemType={getattr(item.raw_item, 'type', 'N/A')}")
-                if isinstance(item, ToolCallItem) and hasattr(item.raw_item, 'type') and item.raw_item.type == 'web_search_call':
-                    logger.debug(
-                        f"  Item {idx} is ToolCallItem with type 'web_search_call'. Setting flag to True.")
-                    expert_used_web_search_this_turn = True
-                    break
-            logger.debug(
-                f"--- Finished checking items. Used web search this turn: {expert_used_web_search_this_turn} ---")
-
-            # Add expert response to full history log
-            full_history.append(
-                {"role": "assistant", "agent": expert.config.name, "content": expert_response, "used_web_search": expert_used_web_search_this_turn})
-
-            # Prepare input for the student turn
-            # Get history including the expert's assistant-role response
-            conversation_input = expert_result.to_input_list()
-            # **Architect Fix 2 (Revised):** Append the Expert's text response as a new user message
-            # This avoids mutating the role/content type of the SDK-generated item.
-            if expert_response:  # Avoid adding empty messages
-                conversation_input.append(
-                    {"role": "user", "content": expert_response})
-
-        except Exception as e:
-            logger.error(f"Error during Expert turn {current_turn}: {e}")
-            # Optionally add a user-facing print here? For now, rely on logger.
-            # print(f"Error during Expert turn {current_turn}: {e}")
-            break  # Exit loop on error
+                    f"--- Used web search this turn: {expert_used_web_search_this_turn} ---")
+
+                # Add expert response to full history log
+                full_history.append(
+                    {"role": "assistant", "agent": expert.config.name, "content": expert_response, "used_web_search": expert_used_web_search_this_turn,
+                     "usage": expert_usage.model_dump()})
+                if expert_retries:
+                    full_history[-1]["retries"] = [record.model_dump() for record in expert_retries]
+                writer = await _append_to_transcript(writer, full_history[-1])
+                for view in history_views:
+                    view.update(full_history)
+                await _save_checkpoint()
+
+            except DialogueTimeout as e:
+                logger.warning(f"--- Dialogue End ({e}) --- ")
+                report.stop_reason = _timeout_stop_reason(e)
+                break
+            except Exception as e:
+                logger.error(f"Error during Expert turn {current_turn}: {e}")
+                # Optionally add a user-facing print here? For now, rely on logger.
+                # print(f"Error during Expert turn {current_turn}: {e}")
+                report.stop_reason = 'expert_error'
+                break  # Exit loop on error
+
+            # --- Check Budgets AFTER Expert --- #
+            _charge_folds()
+            budget_message = report.budget_exceeded(max_total_tokens, max_cost)
+            if budget_message:
+                logger.warning(
+                    f"--- Dialogue End (Budget: {budget_message}) on Turn {current_turn} --- ")
+                report.stop_reason = 'budget_exceeded'
+                break
 
-        # --- Check for Max Turns AFTER Expert --- #
-        if current_turn == max_turns:
-            logger.info(
-                f"--- Dialogue End (Max Turns Reached: {max_turns}) --- ")
-            break  # Exit loop before the final student turn
+            # --- Check for Max Turns AFTER Expert --- #
+            if current_turn == max_turns:
+                logger.info(
+                    f"--- Dialogue End (Max Turns Reached: {max_turns}) --- ")
+                report.stop_reason = 'max_turns'
+                break  # Exit loop before the final student turn
 
         # --- Student Turn --- #
-        # Ensure conversation_input is not empty before student turn
-        if not conversation_input:
-            logger.error(
-                "Error: Conversation input became empty before student turn.")
-            break
-
+        student_input = student_view.build_input(full_history)
         logger.info(
-            f"Running Student ({student.config.name})... Input: {conversation_input[-1]['content']}")
+            f"Running Student ({student.config.name})... Input: {student_input[-1]['content']}")
         try:
-            student_result: RunResult = await Runner.run(student.agent, input=conversation_input)
+            if live is not None:
+                live.start_entry(student.config.name, 'user')
+            student_final_output, _, student_usage, student_retries = await _run_agent_with_retries(
+                student.agent, student_input, 'student', student.config.model)
+            if live is not None:
+                live.end_entry()
+            report.add(student_usage)
 
             # Process structured output (or fallback)
-            if not isinstance(student_result.final_output, StudentOutput):
+            if not isinstance(student_final_output, StudentOutput):
                 logger.warning(
-                    f"Student agent did not return expected StudentOutput object. Got: {type(student_result.final_output)}")
-                student_response_content = str(student_result.final_output)
+                    f"Student agent did not return expected StudentOutput object. Got: {type(student_final_output)}")
+                student_response_content = str(student_final_output)
                 goal_achieved = False  # Assume goal not achieved if format is wrong
                 logger.info(
                     f"Student ({student.config.name}) [Fallback]: {student_response_content}")
             else:
-                student_output: StudentOutput = student_result.final_output
+                student_output: StudentOutput = student_final_output
                 student_response_content = student_output.response_content
                 goal_achieved = student_output.is_goal_achieved
                 logger.info(
@@ -137,31 +614,61 @@ async def run_dialogue(student: StudentAgent, expert: ExpertAgent, max_turns: in
 
             # Add student response to full history log
             full_history.append(
-                {"role": "user", "agent": student.config.name, "content": student_response_content, "goal_achieved_flag": goal_achieved})
-
-            # Prepare input for the next expert turn
-            # Get the history list including the student's assistant-role structured output
-            conversation_input = student_result.to_input_list()
-            # **Architect Fix:** Explicitly add the student's text response as a user message
-            # This ensures the Expert agent sees the student's last message as user input.
-            if student_response_content:  # Avoid adding empty messages
-                conversation_input.append(
-                    {"role": "user", "content": student_response_content})
-
+                {"role": "user", "agent": student.config.name, "content": student_response_content, "goal_achieved_flag": goal_achieved,
+                 "usage": student_usage.model_dump()})
+            if student_retries:
+                full_history[-1]["retries"] = [record.model_dump() for record in student_retries]
+            writer = await _append_to_transcript(writer, full_history[-1])
+            if rolling is not None:
+                rolling.update(full_history)  # The turn is complete: fold it in the background
+            for view in history_views:
+                view.update(full_history)
+            await _save_checkpoint()
+
+        except DialogueTimeout as e:
+            logger.warning(f"--- Dialogue End ({e}) --- ")
+            report.stop_reason = _timeout_stop_reason(e)
+            break
         except Exception as e:
             logger.error(f"Error during Student turn {current_turn}: {e}")
             # Optionally add a user-facing print here? For now, rely on logger.
             # print(f"Error during Student turn {current_turn}: {e}")
+            report.stop_reason = 'student_error'
             break  # Exit loop on error
 
         # Check for goal achievement AFTER student turn
         if goal_achieved:
             logger.info(
                 f"--- Dialogue End (Goal Achieved according to Student on Turn {current_turn}) --- ")
+            report.stop_reason = 'goal_achieved'
+            break
+
+        # --- Check Budgets AFTER Student --- #
+        _charge_folds()
+        budget_message = report.budget_exceeded(max_total_tokens, max_cost)
+        if budget_message:
+            logger.warning(
+                f"--- Dialogue End (Budget: {budget_message}) on Turn {current_turn} --- ")
+            report.stop_reason = 'budget_exceeded'
             break
 
     else:  # Loop finished without break (max_turns reached)
-        logger.info(f"--- Dialogue End (Max Turns Reached: {max_turns}) --- ")
+        if loop_stop_reason is not None:
+            report.stop_reason = loop_stop_reason  # Resumed after the loop had already ended
+        else:
+            logger.info(f"--- Dialogue End (Max Turns Reached: {max_turns}) --- ")
+            report.stop_reason = 'max_turns'
+    await _save_checkpoint(report.stop_reason)
+
+    # Stop any in-flight background folds and report what compaction saved
+    for view in history_views:
+        await view.aclose()
+    _charge_folds()
+    if any(view.keep_turns for view in history_views):
+        report.tokens_saved_by_compaction = sum(
+            view.tokens_saved for view in history_views)
+        logger.info(
+            f"Context compaction saved ~{report.tokens_saved_by_compaction} prompt tokens in this dialogue.")
 
     # Log the full history at DEBUG level instead of printing
     logger.debug("--- Full Conversation History Log ---")
@@ -177,22 +684,37 @@ async def run_dialogue(student: StudentAgent, expert: ExpertAgent, max_turns: in
     transcript_path = None  # Initialize path
     formatted_transcript = ""
     try:
-        # Format first, as it's needed for both saving and summarizing
-        formatted_transcript = format_transcript(
-            full_history, student.config.goal)
-        transcript_path = save_transcript(
-            history=full_history,
-            goal=student.config.goal,
-            formatted_transcript=formatted_transcript,
-            output_dir=output_dir
-        )
-        logger.info(f"Transcript saved to Markdown: {transcript_path}")
+        if writer is not None:
+            transcript_path = await writer.finalize_async()
+        else:
+            transcript_path = save_transcript(
+                history=full_history,
+                goal=student.config.goal,
+                output_dir=output_dir
+            )
+            logger.info(f"Transcript saved to Markdown: {transcript_path}")
+        # The summary reads the transcript back from disk. It needs the whole text (a post-hoc
+        # summary sends all of it, in chunks for long ones), so like full_history it is held in
+        # memory in full; the incremental writer only bounds what a crash can lose.
+        formatted_transcript = await asyncio.to_thread(_read_text, transcript_path)
 
         # --- Generate and Save Summary --- #
         if transcript_path and formatted_transcript:
             try:
-                # Use expert's model for summary
-                summary = await generate_summary(formatted_transcript, model=expert.config.model)
+                summary_start = time.perf_counter()
+                summary = await rolling.finish(full_history) if rolling is not None else None
+                if summary is not None:
+                    report.summary_mode = 'rolling'
+                    report.summary_latency_saved_s = rolling.estimated_latency_saved_s
+                    logger.info(
+                        f"Rolling summary ready {time.perf_counter() - summary_start:.2f}s after the dialogue ended "
+                        f"(~{report.summary_latency_saved_s:.2f}s saved vs. a post-hoc summary).")
+                else:
+                    report.summary_mode = 'posthoc'
+                    # Use expert's model for summary
+                    summary = await generate_summary(formatted_transcript, model=expert.config.model, report=report, cache=cache,
+                                                     chunk_tokens=summary_chunk_tokens, max_concurrency=summary_concurrency)
+                report.summary_tail_latency_s = time.perf_counter() - summary_start
                 summary_filename = os.path.splitext(transcript_path)[
                     0] + ".summary.txt"
                 with open(summary_filename, 'w', encoding='utf-8') as f:
@@ -210,9 +732,58 @@ async def run_dialogue(student: StudentAgent, expert: ExpertAgent, max_turns: in
         logger.error(f"Failed to save transcript: {e}")
     # --- End Save Transcript ---
 
+    if rolling is not None:
+        await rolling.aclose()  # No-op unless the summary step was skipped
+
+    # The saved transcript supersedes the live one; keep the live file if saving failed
+    if live is not None:
+        if transcript_path:
+            live.discard()
+        else:
+            live.close()
+
+    # --- Usage Report --- #
+    logger.info(
+        f"Dialogue usage: {len(report.calls)} calls, {report.input_tokens} input / {report.output_tokens} output / "
+        f"{report.cached_tokens} cached tokens, ~${report.total_cost:.4f}, model time {report.model_latency_s:.2f}s "
+        f"(stop reason: {report.stop_reason})")
+    if transcript_path:
+        report_filename = os.path.splitext(transcript_path)[0] + ".report.json"
+        try:
+            with open(report_filename, 'w', encoding='utf-8') as f:
+                json.dump(report.to_dict(), f, indent=2)
+            logger.info(f"Usage report saved to {report_filename}")
+        except IOError as e:
+            logger.error(f"Failed to save usage report: {e}")
+        # The dialogue is complete; without a transcript the checkpoint is kept for a resume
+        if checkpoint:
+            remove_files([checkpoint_path])
+
     # Return the detailed history we logged
     return full_history
 
+
+async def resume_dialogue(checkpoint_path: str, report: Optional[DialogueReport] = None, **dialogue_kwargs):
+    """Continues an unfinished dialogue from its checkpoint without repeating completed calls.
+
+    The agents are rebuilt from the configs stored in the checkpoint, and the dialogue keeps its
+    original max_turns and output directory.
+
+    Args:
+        checkpoint_path: Path of a ``.checkpoint.json`` written by ``run_dialogue``.
+        report: Optional DialogueReport to fill (it starts with the calls made before the resume).
+        **dialogue_kwargs: Further ``run_dialogue`` options (cache, budgets, streaming, ...).
+
+    Returns:
+        The full dialogue history.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    registry = get_agent_registry()
+    student = registry.student(checkpoint.student_config)
+    expert = registry.expert(checkpoint.expert_config)
+    return await run_dialogue(student, expert, max_turns=checkpoint.max_turns, output_dir=checkpoint.output_dir,
+                              report=report, resume=checkpoint, checkpoint_path=checkpoint_path, **dialogue_kwargs)
+
 # Example of how this might be called later (e.g., from a main script/CLI)
 # async def main():
 #     # 1. Load Configs
@@ -0,0 +1,356 @@
+"""Rate-limit-aware scheduler that every model call passes through.
+
+Each model gets a requests-per-minute and a tokens-per-minute token bucket sized from a
+``RateLimitConfig``. A call waits (queues) until both buckets can cover it instead of being sent
+into a 429. If the provider still answers 429, the model's buckets are paused for the
+``retry-after`` the provider asked for (or a jittered exponential backoff without one) and the call
+is retried, so a burst of rate limits delays dialogues rather than ending them.
+"""
+import asyncio
+import contextvars
+import email.utils
+import json
+import logging
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import openai
+from pydantic import BaseModel
+
+from .concurrency import AIMDLimiter
+from .config import ModelRateLimit, RateLimitConfig
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+_CHARS_PER_TOKEN = 4  # Rough estimate used before the real usage is known
+# Durations in OpenAI's x-ratelimit-reset-* headers, e.g. "1s", "250ms", "6m0s"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_SCALE = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class SchedulerStats(BaseModel):
+    """Counters of the scheduler since it was created."""
+    calls: int = 0
+    queued_calls: int = 0  # Calls that had to wait for bucket capacity
+    queued_s: float = 0.0  # Total time calls waited for capacity or a rate-limit pause
+    max_queued_s: float = 0.0
+    rate_limited: int = 0  # 429 responses received
+    retries: int = 0
+    gave_up: int = 0  # Calls that were still rate limited after max_retries
+    timed_out: int = 0  # Calls cancelled by a timeout (see TimeoutScope)
+
+
+class TimeoutScope:
+    """Marks the calls that a timeout may cancel, so the scheduler can tell why they were cancelled.
+
+    A call cut off by a turn timeout only sees a CancelledError, the same as a call whose caller went
+    away (e.g. the losing copy of a hedged request). The code that owns the timeout starts the work in
+    a task created by ``create_task``, which inherits the scope through its context, and calls
+    ``expire`` before cancelling it. The scheduler then reports the cancelled calls as timeouts to
+    the adaptive concurrency limiters.
+    """
+
+    def __init__(self):
+        self.expired = False
+
+    def create_task(self, coro: Awaitable[T]) -> "asyncio.Future[T]":
+        token = _timeout_scope.set(self)
+        try:
+            return asyncio.ensure_future(coro)
+        finally:
+            _timeout_scope.reset(token)
+
+    def expire(self) -> None:
+        self.expired = True
+
+
+_timeout_scope: contextvars.ContextVar[Optional[TimeoutScope]] = contextvars.ContextVar(
+    'timeout_scope', default=None)
+
+
+class TokenBucket:
+    """A continuously refilling token bucket; ``acquire`` waits until enough tokens are available.
+
+    Waiters are served in FIFO order (asyncio.Lock is fair), so a large request is not starved by a
+    stream of small ones. Amounts larger than the capacity are clamped to it.
+    """
+
+    def __init__(self, capacity: float, refill_per_s: float):
+        self.capacity = capacity
+        self.refill_per_s = refill_per_s
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens +
+                           (now - self._updated) * self.refill_per_s)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.refill_per_s)
+
+    def adjust(self, amount: float) -> None:
+        """Returns (positive) or takes (negative) tokens, e.g. once the real usage is known.
+
+        Taking may leave the bucket in debt, which later acquires wait out.
+        """
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class _ModelLimiter:
+    """The RPM/TPM buckets of one model, plus a pause shared by all of its queued calls."""
+
+    def __init__(self, limit: Optional[ModelRateLimit], headroom: float):
+        self.requests = self.tokens = None
+        if limit is not None and limit.rpm:
+            rpm = max(limit.rpm * headroom, 1.0)
+            self.requests = TokenBucket(rpm, rpm / 60)
+        if limit is not None and limit.tpm:
+            tpm = max(limit.tpm * headroom, 1.0)
+            self.tokens = TokenBucket(tpm, tpm / 60)
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        while True:
+            remaining = self.paused_until - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(estimated_tokens)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Corrects the TPM bucket from the estimate to the tokens the call really used."""
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+
+def estimate_tokens(messages: Any) -> int:
+    """Roughly estimates the input tokens of a message list (or any JSON-serializable input)."""
+    text = messages if isinstance(messages, str) else json.dumps(
+        messages, ensure_ascii=False, default=str)
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for a 429 from the provider (openai.RateLimitError or any error carrying status 429)."""
+    return getattr(error, 'status_code', None) == 429
+
+
+def _feedback_error(error: BaseException) -> Optional[str]:
+    """Classifies a failed call for adaptive concurrency (None for errors that say nothing about load)."""
+    if is_rate_limit_error(error):
+        return 'rate_limited'
+    if isinstance(error, (TimeoutError, openai.APITimeoutError)):
+        return 'timeout'
+    return None
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_SCALE[unit] for number, unit in parts)
+
+
+def retry_after_s(error: BaseException) -> Optional[float]:
+    """Extracts the wait the provider asked for from a rate-limit error's headers, if any."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP-date form
+            try:
+                return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    resets = [_parse_duration(headers.get(name) or '')
+              for name in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens')]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+class RateLimitScheduler:
+    """Queues model calls against per-model RPM/TPM buckets and retries rate-limited calls.
+
+    Args:
+        config: Quotas and retry policy; the default has no quotas (calls are never queued) but
+            still retries 429s.
+    """
+
+    def __init__(self, config: Optional[RateLimitConfig] = None):
+        self.config = config or RateLimitConfig()
+        self.stats = SchedulerStats()
+        self._limiters: Dict[str, _ModelLimiter] = {}
+        # Optional adaptive limit on calls in flight, and other limiters fed by the same call
+        # outcomes (e.g. a batch's dialogue limit); see concurrency.py
+        self.call_limiter: Optional[AIMDLimiter] = None
+        self.feedback_limiters: List[AIMDLimiter] = []
+
+    def _feedback(self, latency_s: Optional[float], error: Optional[str]) -> None:
+        for limiter in ([self.call_limiter] if self.call_limiter else []) + self.feedback_limiters:
+            limiter.record(latency_s, error)
+
+    def _quota_name(self, model: str) -> str:
+        """The configured entry covering ``model`` (longest prefix), or the model itself."""
+        matches = [name for name in self.config.models if model.startswith(name)]
+        return max(matches, key=len) if matches else model
+
+    def _limiter(self, model: str) -> _ModelLimiter:
+        # Snapshots matching the same entry share its buckets, as they share the provider quota
+        name = self._quota_name(model)
+        limiter = self._limiters.get(name)
+        if limiter is None:
+            limiter = _ModelLimiter(self.config.models.get(name), self.config.headroom)
+            self._limiters[name] = limiter
+        return limiter
+
+    def _backoff_s(self, error: BaseException, attempt: int) -> float:
+        ceiling = min(self.config.max_delay_s,
+                      self.config.base_delay_s * 2 ** attempt)
+        retry_after = retry_after_s(error)
+        if retry_after is None:
+            # Full jitter: spreads retries of calls that were rejected together
+            return random.uniform(0, ceiling)
+        # Honour the provider's wait, plus a little jitter so queued calls do not all fire at once
+        return min(retry_after, self.config.max_delay_s) + random.uniform(0, self.config.base_delay_s)
+
+    async def run(self, model: str, call: Callable[[], Awaitable[T]], estimated_tokens: int = 0,
+                  tokens_used: Optional[Callable[[T], Optional[int]]] = None, stage: str = 'call') -> T:
+        """Runs ``call`` once the model's buckets allow it, retrying it on rate-limit errors.
+
+        Args:
+            model: Model name the call is billed to (selects the buckets).
+            call: Zero-argument coroutine function making the request; called again on each retry.
+            estimated_tokens: Tokens taken from the TPM bucket before the call.
+            tokens_used: Optional function returning the real total tokens from the result, used to
+                correct the TPM bucket.
+            stage: Label for log messages.
+
+        Returns:
+            The call's result.
+
+        Raises:
+            The call's exception if it is not a rate-limit error, or if it is still rate limited
+            after ``max_retries`` retries.
+        """
+        limiter = self._limiter(model)
+        self.stats.calls += 1
+        attempt = 0
+        while True:
+            wait_start = time.perf_counter()
+            await limiter.acquire(estimated_tokens)
+            call_limiter = self.call_limiter
+            if call_limiter is not None:
+                await call_limiter.acquire()
+            call_start = time.perf_counter()
+            waited = call_start - wait_start
+            if waited > 0.001:
+                self.stats.queued_calls += 1
+                self.stats.queued_s += waited
+                self.stats.max_queued_s = max(self.stats.max_queued_s, waited)
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                # Cancelled by a timeout: the call was too slow, which is load feedback like a 429
+                scope = _timeout_scope.get()
+                if scope is not None and scope.expired:
+                    self.stats.timed_out += 1
+                    self._feedback(None, 'timeout')
+                raise
+            except Exception as e:
+                self._feedback(None, _feedback_error(e))
+                if not is_rate_limit_error(e):
+                    raise
+                self.stats.rate_limited += 1
+                if attempt >= self.config.max_retries:
+                    self.stats.gave_up += 1
+                    raise
+                delay = self._backoff_s(e, attempt)
+                attempt += 1
+                self.stats.retries += 1
+                logger.warning(
+                    f"Rate limited on {stage} call ({model}); retry {attempt}/{self.config.max_retries} in {delay:.1f}s")
+                # Every queued call for this model waits out the pause, not just this one
+                limiter.pause(delay)
+                continue
+            finally:
+                if call_limiter is not None:
+                    call_limiter.release()
+            self._feedback(time.perf_counter() - call_start, None)
+            if tokens_used is not None:
+                try:
+                    limiter.settle(estimated_tokens, tokens_used(result))
+                except Exception as e:
+                    logger.debug(f"Could not read token usage for rate limiting: {e}")
+            return result
+
+    def log_stats(self) -> None:
+        stats = self.stats
+        if not stats.calls:
+            return
+        logger.info(
+            f"--- Scheduler --- Calls: {stats.calls} --- Queued: {stats.queued_calls} "
+            f"({stats.queued_s:.1f}s total, max {stats.max_queued_s:.1f}s) --- "
+            f"Rate limited: {stats.rate_limited} (retries {stats.retries}, gave up {stats.gave_up}) --- "
+            f"Timed out: {stats.timed_out} ---")
+
+
+# Process-wide scheduler: provider quotas are shared by every dialogue in the process
+_scheduler = RateLimitScheduler()
+
+
+def get_scheduler() -> RateLimitScheduler:
+    return _scheduler
+
+
+def set_scheduler(scheduler: RateLimitScheduler) -> None:
+    """Replaces the process-wide scheduler (e.g. one configured with quotas)."""
+    global _scheduler
+    _scheduler = scheduler
+
+
+def configure_scheduler(config: Optional[RateLimitConfig]) -> RateLimitScheduler:
+    """Installs a new process-wide scheduler for ``config`` and returns it."""
+    set_scheduler(RateLimitScheduler(config))
+    return _scheduler
+
+
+def completion_total_tokens(response: Any) -> Optional[int]:
+    """Total tokens of a Chat Completions response (for ``RateLimitScheduler.run``'s tokens_used)."""
+    total = getattr(getattr(response, 'usage', None), 'total_tokens', None)
+    return total if isinstance(total, int) else None
@@ -0,0 +1,82 @@
+"""CLI startup budget and an import-time report.
+
+``student_expert_flow.main`` imports only the standard library, ``dotenv`` and the config models at
+module level. The agents SDK, ``openai`` and ``httpx`` take over a second to import and are loaded
+inside the code paths that make model calls. ``--help`` and ``--validate-only`` therefore never pay
+for them. tests/test_startup.py checks both parts of the budget:
+
+* ``HEAVY_MODULES`` are not imported by ``import student_expert_flow.main`` (checked against its
+  ``-X importtime`` report) or a ``--validate-only`` run.
+* Importing ``student_expert_flow.main`` in a fresh interpreter takes less than ``STARTUP_BUDGET_S``.
+  Being wall-clock time, this is a benchmark that only runs with ``STUDENT_EXPERT_FLOW_BENCHMARKS=1``.
+
+``profile_imports`` runs ``python -X importtime`` in a subprocess and parses its report. The CLI's
+``--import-profile`` option prints it grouped by top-level package.
+"""
+import collections
+import re
+import subprocess
+import sys
+from typing import Dict, List, Sequence
+
+from pydantic import BaseModel
+
+HEAVY_MODULES = ('agents', 'openai', 'httpx')
+STARTUP_BUDGET_S = 0.6  # Importing student_expert_flow.main, interpreter startup excluded
+
+# The modules a dialogue run loads on top of the CLI itself
+RUN_MODULES = ('student_expert_flow.runner', 'student_expert_flow.batch', 'student_expert_flow.daemon',
+               'student_expert_flow.jobqueue', 'student_expert_flow.replay')
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+class ImportTiming(BaseModel):
+    """One line of ``-X importtime`` output."""
+    module: str
+    self_us: int
+    cumulative_us: int  # Including the modules it imported first
+    depth: int  # Nesting level; 0 for modules imported directly by the profiled statement
+
+
+def parse_importtime(stderr: str) -> List[ImportTiming]:
+    """Parses ``-X importtime`` output (other stderr lines are ignored)."""
+    timings = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            timings.append(ImportTiming(module=module, self_us=int(self_us), cumulative_us=int(cumulative_us),
+                                        depth=(len(indent) - 1) // 2))
+    return timings
+
+
+def profile_imports(modules: Sequence[str]) -> List[ImportTiming]:
+    """Imports ``modules`` in order in a fresh interpreter and returns its import timings."""
+    statement = "; ".join(f"import {module}" for module in modules)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                               capture_output=True, text=True, check=True)
+    return parse_importtime(completed.stderr)
+
+
+def format_import_report(timings: List[ImportTiming], top: int = 15) -> str:
+    """Renders timings as total time per top-level package plus the slowest individual imports."""
+    by_package: Dict[str, int] = collections.Counter()
+    for timing in timings:
+        by_package[timing.module.split('.', 1)[0]] += timing.self_us
+    total_us = sum(by_package.values()) or 1
+    cumulative = {timing.module: timing.cumulative_us for timing in timings}
+
+    lines = [f"Import time: {total_us / 1e6:.3f}s in {len(timings)} modules"]
+    if 'student_expert_flow.main' in cumulative:
+        lines.append(f"CLI startup (student_expert_flow.main): {cumulative['student_expert_flow.main'] / 1e6:.3f}s "
+                     f"(budget {STARTUP_BUDGET_S:.2f}s)")
+    lines.append("")
+    lines.append(f"{'package':<32}{'self':>10}{'share':>8}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"{package:<32}{self_us / 1e3:>8.1f}ms{self_us / total_us:>8.1%}")
+    lines.append("")
+    lines.append(f"{'slowest imports (cumulative)':<56}{'time':>10}")
+    for timing in sorted(timings, key=lambda t: -t.cumulative_us)[:top]:
+        lines.append(f"{'  ' * timing.depth + timing.module:<56}{timing.cumulative_us / 1e3:>8.1f}ms")
+    return "\n".join(lines)
@@ -1,24 +1,69 @@
+import asyncio
 import os
 import datetime
+import json
 import re
-from typing import List, Dict, Any
+import time
+from typing import IO, List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from openai import OpenAI, OpenAIError, AsyncOpenAI
 import logging
 
+from . import clients
+from .accounting import DialogueReport, CallUsage, usage_from_completion
+from .cache import ResponseCache, make_cache_key
+from .scheduler import get_scheduler, estimate_tokens, completion_total_tokens
+
 logger = logging.getLogger(__name__)
 
+# The transcript header carries a wall-clock timestamp; it is excluded from summary cache keys so
+# identical dialogues re-run later still hit the cache.
+_TIMESTAMP_SECTION = re.compile(r"^## Timestamp\n> .*$", re.MULTILINE)
+
+SUMMARY_SYSTEM_PROMPT = ("You are an expert summarizer. Please provide a concise summary of the following conversation transcript. "
+                         "Highlight the main topic or goal, key points discussed, and whether the student's learning goal was achieved."
+                         "Structure it in a way that is easy to read and understand."
+                         "We want to know the main points of the conversation without reading the entire transcript.")
+
+ROLLING_SUMMARY_SYSTEM_PROMPT = (SUMMARY_SYSTEM_PROMPT + " You are writing this summary incrementally while the conversation is still "
+                                 "running: you are given the current summary (possibly empty) and the newest part of the conversation. "
+                                 "Return the complete updated summary.")
+
+CHUNK_SUMMARY_SYSTEM_PROMPT = ("You are an expert summarizer. You are given one part of a longer conversation transcript between a student "
+                               "and an expert (the header states the student's learning goal). Summarize the key points discussed in this "
+                               "part and the student's progress towards the goal. Be concise; your summary will be merged with the "
+                               "summaries of the other parts.")
+
+MERGE_SUMMARY_SYSTEM_PROMPT = (SUMMARY_SYSTEM_PROMPT + " You are given summaries of consecutive parts of the transcript, in order, "
+                               "instead of the transcript itself. Merge them into one summary.")
+
+# Chunk sizes are given in tokens and applied as characters (~4 characters per token, as in
+# history._estimate_text_tokens); turns start at "## Turn N" headings in the formatted transcript.
+_CHARS_PER_TOKEN = 4
+_TURN_HEADING = re.compile(r"^## Turn \d+", re.MULTILINE)
+
 # Initialize AsyncOpenAI client lazily to avoid issues with .env loading
 async_openai_client = None
 
 
 def get_async_openai_client():
-    """Get or create the AsyncOpenAI client instance."""
+    """Get the client for summary/fold calls (by default the shared client from clients.py)."""
     global async_openai_client
     if async_openai_client is None:
-        async_openai_client = AsyncOpenAI()
+        async_openai_client = clients.get_openai_client()
     return async_openai_client
 
 
+def set_async_openai_client(client) -> None:
+    """Replaces the client used for summary/fold calls (e.g. a recording or replay stand-in)."""
+    global async_openai_client
+    async_openai_client = client
+
+
+def strip_transcript_timestamp(text: str) -> str:
+    """Removes the wall-clock timestamp section so identical transcripts compare (and hash) equal."""
+    return _TIMESTAMP_SECTION.sub("", text)
+
+
 def _sanitize_filename(text: str, max_len: int = 50) -> str:
     """Removes invalid characters and shortens text for use in a filename."""
     # Remove invalid file system characters (including dots)
@@ -33,163 +78,578 @@ def _sanitize_filename(text: str, max_len: int = 50) -> str:
     return sanitized
 
 
-def format_transcript(history: List[Dict[str, Any]], goal: str) -> str:
-    """Formats the conversation history into a readable Markdown string."""
-    lines = [f"# Conversation Transcript"]
-    lines.append(f"\n## Goal\n> {goal}")
-    lines.append(f"\n## Timestamp\n> {datetime.datetime.now().isoformat()}")
-    lines.append("\n---\n")
-
-    turn_number = 0
-    i = 0
-    while i < len(history):
-        entry = history[i]
+def _format_entry(entry: Dict[str, Any], default_agent: str, with_search: bool = True) -> List[str]:
+    """Formats one history entry as Markdown lines: the speaker prefix, blockquoted content and metadata."""
+    role = entry.get('role', 'unknown_role')
+    agent = entry.get('agent', default_agent)
+    # Strip leading/trailing whitespace
+    content = entry.get('content', '').strip()
+    used_search = entry.get('used_web_search') if with_search else None
+    goal_achieved = entry.get('goal_achieved_flag')
+
+    prefix = f"**[{agent} ({role})]**"
+    metadata_line = ""
+    if used_search is not None:
+        metadata_line += f"*Used Web Search: {used_search}*  "
+    if goal_achieved is not None:
+        metadata_line += f"*Goal Achieved: {goal_achieved}*  "
+    if entry.get('retries'):
+        metadata_line += f"*Retries: {len(entry['retries'])}*"
+    metadata_line = metadata_line.strip()
+
+    # Format content with blockquotes, handle multi-line content
+    formatted_content = "\n".join(
+        [f"> {line}" for line in content.split('\n')])
+    lines = [f"{prefix}\n{formatted_content}"]
+    if metadata_line:
+        lines.append(f">\n> _{metadata_line}_")
+    return lines
+
+
+class TranscriptFormatter:
+    """Formats a dialogue history as Markdown one entry at a time.
+
+    ``header``, then ``add`` for each entry and ``finish`` return the transcript's lines; joined with
+    newlines they form the complete transcript. A turn is the expert's (assistant) entry plus the
+    student's (user) reply, so a turn is closed when the next entry arrives or at ``finish``.
+    """
+
+    def __init__(self):
+        self.turn_number = 0
+        self._turn_open = False
+
+    def header(self, goal: str, timestamp: Optional[str] = None) -> List[str]:
+        timestamp = timestamp or datetime.datetime.now().isoformat()
+        return [f"# Conversation Transcript", f"\n## Goal\n> {goal}", f"\n## Timestamp\n> {timestamp}", "\n---\n"]
+
+    def add(self, entry: Dict[str, Any]) -> List[str]:
+        lines = []
         role = entry.get('role', 'unknown_role')
-        agent = entry.get('agent', 'System')
-        # Strip leading/trailing whitespace
-        content = entry.get('content', '').strip()
-        used_search = entry.get('used_web_search')
-        goal_achieved = entry.get('goal_achieved_flag')
-
-        prefix = f"**[{agent} ({role})]**"
-        metadata_line = ""
-        if used_search is not None:
-            metadata_line += f"*Used Web Search: {used_search}*  "
-        if goal_achieved is not None:
-            metadata_line += f"*Goal Achieved: {goal_achieved}*"
-        metadata_line = metadata_line.strip()
-
-        # Format content with blockquotes, handle multi-line content
-        formatted_content = "\n".join(
-            [f"> {line}" for line in content.split('\n')])
+        if self._turn_open:
+            self._turn_open = False
+            # The student's response completes the expert's turn
+            if role == 'user':
+                student_lines = _format_entry(
+                    entry, 'Student', with_search=False)  # Assume name might vary
+                student_lines[0] = "\n" + student_lines[0]
+                return student_lines + ["\n---\n"]  # Separator after each turn
+            lines.append("\n---\n")
 
+        entry_lines = _format_entry(entry, 'System')
+        agent = entry.get('agent', 'System')
         # Handle the initial system message
         if agent == 'System' and role == 'user':
-            lines.append(f"{prefix}\n{formatted_content}")
-            if metadata_line:
-                lines.append(f">\n> _{metadata_line}_")
+            lines.extend(entry_lines)
             lines.append("\n---\n")  # Separator after system message
-            i += 1
-            continue
-
         # Start a new turn when we see the expert (assistant role)
         # Note: Assuming expert is always 'assistant' and student is 'user' in the log for turn structure
-        if role == 'assistant':
-            turn_number += 1
-            lines.append(f"## Turn {turn_number}")
-            lines.append(f"\n{prefix}\n{formatted_content}")
-            if metadata_line:
-                lines.append(f">\n> _{metadata_line}_")
-            i += 1
-            # Check if the next message is the student's response in this turn
-            if i < len(history) and history[i].get('role') == 'user':
-                student_entry = history[i]
-                student_role = student_entry.get('role', 'unknown_role')
-                student_agent = student_entry.get(
-                    'agent', 'Student')  # Assume name might vary
-                student_content = student_entry.get('content', '').strip()
-                student_goal_achieved = student_entry.get('goal_achieved_flag')
-                student_prefix = f"**[{student_agent} ({student_role})]**"
-                student_metadata_line = ""
-                if student_goal_achieved is not None:
-                    student_metadata_line += f"*Goal Achieved: {student_goal_achieved}*"
-                student_metadata_line = student_metadata_line.strip()
-
-                student_formatted_content = "\n".join(
-                    [f"> {line}" for line in student_content.split('\n')])
-
-                lines.append(
-                    f"\n{student_prefix}\n{student_formatted_content}")
-                if student_metadata_line:
-                    lines.append(f">\n> _{student_metadata_line}_")
-                i += 1
-            lines.append("\n---\n")  # Separator after each turn
+        elif role == 'assistant':
+            self.turn_number += 1
+            self._turn_open = True
+            lines.append(f"## Turn {self.turn_number}")
+            entry_lines[0] = "\n" + entry_lines[0]
+            lines.extend(entry_lines)
         else:
             # Handle cases where conversation might not follow strict Expert->Student pattern
             # Or if it starts unexpectedly with the student (print it anyway).
             # Increment turn number for log clarity
-            lines.append(f"## Turn {turn_number+1} (Unexpected Start)")
-            lines.append(f"\n{prefix}\n{formatted_content}")
-            if metadata_line:
-                lines.append(f">\n> _{metadata_line}_")
+            lines.append(f"## Turn {self.turn_number+1} (Unexpected Start)")
+            entry_lines[0] = "\n" + entry_lines[0]
+            lines.extend(entry_lines)
+            lines.append("\n---\n")
+        return lines
+
+    def finish(self) -> List[str]:
+        lines = []
+        if self._turn_open:
+            self._turn_open = False
             lines.append("\n---\n")
-            i += 1
+        lines.append("--- End Transcript ---")
+        return lines
+
+
+# --- Structured transcript records --- #
+#
+# A transcript's JSONL file is its source of truth and the Markdown is rendered from it. Each line
+# is one JSON record:
+#   {"type": "header", "version": 1, "goal": ..., "timestamp": ...}
+#   {"type": "entry", "turn": 1, "role": ..., "agent": ..., "content": ..., ...}  (one per history entry)
+#   {"type": "end"}
+# Entry records carry the history entry's own keys at the top level: used_web_search (expert),
+# goal_achieved_flag (student), usage (tokens, latency_s and cost of the call) and retries. Records
+# written while the dialogue runs also have the wall-clock "timestamp" of the entry.
+
+TRANSCRIPT_RECORD_VERSION = 1
+_RECORD_ONLY_KEYS = ('type', 'turn', 'timestamp')
+
 
-    lines.append("--- End Transcript ---")
-    return "\n".join(lines)
+def _entry_record(entry: Dict[str, Any], turn: int, timestamp: Optional[str] = None) -> Dict[str, Any]:
+    record = {"type": "entry", "turn": turn}
+    if timestamp is not None:
+        record["timestamp"] = timestamp
+    record.update(entry)
+    return record
 
 
-def save_transcript(history: List[Dict[str, Any]], goal: str, formatted_transcript: str, output_dir: str = "transcripts") -> str:
-    """Saves the formatted conversation history to a Markdown file.
+def entry_from_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the history entry stored in an ``entry`` record."""
+    return {key: value for key, value in record.items() if key not in _RECORD_ONLY_KEYS}
+
+
+def history_to_records(history: List[Dict[str, Any]], goal: str,
+                       timestamp: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yields the transcript records of a finished dialogue history (header, entries, end)."""
+    yield {"type": "header", "version": TRANSCRIPT_RECORD_VERSION, "goal": goal,
+           "timestamp": timestamp or datetime.datetime.now().isoformat()}
+    turn = 0
+    for entry in history:
+        if entry.get('role') == 'assistant':
+            turn += 1  # A turn starts with each expert response, as in the Markdown
+        yield _entry_record(entry, turn)
+    yield {"type": "end"}
+
+
+def render_transcript(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Renders transcript records as Markdown lines (joined with newlines they form the transcript).
+
+    Records are consumed one at a time, so a transcript of any length renders in constant memory. A
+    partial transcript (no ``end`` record, e.g. from a crashed run) renders without the end marker.
+    """
+    formatter = TranscriptFormatter()
+    for record in records:
+        record_type = record.get('type')
+        if record_type == 'header':
+            yield from formatter.header(record.get('goal', ''), record.get('timestamp'))
+        elif record_type == 'entry':
+            # The formatter only reads entry keys, so the record is passed as is instead of copied
+            yield from formatter.add(record)
+        elif record_type == 'end':
+            yield from formatter.finish()
+
+
+def iter_transcript_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Streams the records of a ``.jsonl`` transcript (finished or ``.part``) one line at a time.
+
+    A truncated last line, as left by a crash mid-write, ends the iteration with a warning; an
+    invalid record anywhere else raises ValueError.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                if not f.readline():
+                    logger.warning(f"Ignoring truncated last record of {path} (line {line_number})")
+                    return
+                raise ValueError(f"Invalid transcript record in {path} at line {line_number}: {e}")
+
+
+def transcript_markdown_from_jsonl(path: str) -> str:
+    """Renders a ``.jsonl`` transcript as Markdown."""
+    return "\n".join(render_transcript(iter_transcript_records(path)))
+
+
+def format_transcript(history: List[Dict[str, Any]], goal: str) -> str:
+    """Formats the conversation history into a readable Markdown string."""
+    return "\n".join(render_transcript(history_to_records(history, goal)))
+
+
+def _create_transcript_files(output_dir: str, goal: str, now: datetime.datetime,
+                            part_suffix: str = "") -> Tuple[str, IO[str], IO[str]]:
+    """Creates a transcript's Markdown and JSONL files under the first free name.
+
+    Concurrent dialogues (batch mode) with the same goal can finish within the same second, so both
+    files are created exclusively and a numeric suffix is added when either name is taken. With a
+    ``part_suffix`` the files are temporary ones, and names whose final files exist are skipped too.
+
+    Returns:
+        The path without extension and the open Markdown and JSONL files.
+    """
+    stem = f"transcript_{now.strftime('%Y%m%d_%H%M%S')}_{_sanitize_filename(goal)}"
+    suffix = 0
+    while True:
+        base = os.path.join(output_dir, f"{stem}_{suffix}" if suffix else stem)
+        suffix += 1
+        if part_suffix and (os.path.exists(base + ".md") or os.path.exists(base + ".jsonl")):
+            continue
+        try:
+            md = open(base + ".md" + part_suffix, 'x', encoding='utf-8')
+        except FileExistsError:
+            continue
+        try:
+            jsonl = open(base + ".jsonl" + part_suffix, 'x', encoding='utf-8')
+        except FileExistsError:
+            md.close()
+            os.remove(md.name)
+            continue
+        return base, md, jsonl
+
+
+def save_transcript(history: List[Dict[str, Any]], goal: str, output_dir: str = "transcripts") -> str:
+    """Saves the conversation history as a JSONL transcript and a Markdown file next to it.
+
+    The Markdown is rendered from the same records as the JSONL, so the two always match (including
+    the header timestamp, which is also the one in the file names).
 
     Args:
-        history: The conversation history list (used for metadata/unused here but kept for potential future use).
+        history: The conversation history list, written as records to ``<transcript>.jsonl``.
         goal: The student's learning goal (used for filename).
-        formatted_transcript: The pre-formatted transcript string (assumed Markdown) to save.
         output_dir: The directory to save the transcript in . Defaults to 'transcripts'.
 
     Returns:
-        The path to the saved transcript file.
+        The path to the saved Markdown transcript file.
     """
     # Ensure the output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
-    # Generate filename
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    sanitized_goal = _sanitize_filename(goal)
-    # Changed extension to .md
-    filename = f"transcript_{timestamp}_{sanitized_goal}.md"
-    filepath = os.path.join(output_dir, filename)
-
-    # Write to file
+    now = datetime.datetime.now()
+    filepath = None
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(formatted_transcript)
+        base, f, jsonl = _create_transcript_files(output_dir, goal, now)
+        filepath = base + ".md"
+        with f, jsonl:
+            records = list(history_to_records(history, goal, timestamp=now.isoformat()))
+            jsonl.writelines(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+            f.write("\n".join(render_transcript(records)))
         # Optional: Log or print confirmation
         logger.info(f"Transcript saved to Markdown: {filepath}")
         return filepath
     except IOError as e:
-        logger.error(f"Error saving transcript to {filepath}: {e}")
+        logger.error(f"Error saving transcript to {filepath or output_dir}: {e}")
         # Consider raising the exception or returning None depending on desired error handling
         raise  # Re-raise the exception for now
 
 
-async def generate_summary(formatted_transcript: str, model: str = "gpt-4.1-mini") -> str:
+def _fsync_directory(directory: str) -> None:
+    """Makes a rename in ``directory`` durable (not supported on every platform, e.g. Windows)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class TranscriptWriter:
+    """Writes a dialogue's transcript to disk entry by entry, as JSONL records and as Markdown.
+
+    Both files are written under a ``.part`` suffix and fsynced after every ``append``, so a crash
+    or kill loses at most the entry being written and leaves a readable partial transcript
+    (Markdown without the end marker, plus the JSONL log). ``finalize`` completes the Markdown and
+    atomically renames both files to their final names (``transcript_<ts>_<goal>.md`` / ``.jsonl``).
+
+    Every record (see ``history_to_records``) is written to the JSONL file and then rendered into
+    the Markdown with ``render_transcript``, so the Markdown always matches the JSONL.
+
+    ``append_async`` and ``finalize_async`` serialize on the event loop and write and fsync in a
+    worker thread, so the per-entry fsyncs do not stall other dialogues on the same loop.
+
+    Args:
+        goal: The student's learning goal (used in the header and the filename).
+        output_dir: Directory to write the transcript in.
+        fsync: Whether to fsync after every entry (disable only for throwaway runs).
+    """
+
+    def __init__(self, goal: str, output_dir: str = "transcripts", fsync: bool = True):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.fsync = fsync
+        self.finalized = False
+        self._formatter = TranscriptFormatter()
+
+        now = datetime.datetime.now()
+        base, self._md, self._jsonl = _create_transcript_files(output_dir, goal, now, part_suffix=".part")
+        self.path = base + ".md"
+        self.jsonl_path = base + ".jsonl"
+        self._first_line = True
+        self._turn = 0
+
+        self._write(*self._render({"type": "header", "version": TRANSCRIPT_RECORD_VERSION, "goal": goal,
+                                   "timestamp": now.isoformat()}))
+
+    @property
+    def part_path(self) -> str:
+        """Path of the Markdown file while the dialogue is still running."""
+        return self.path + ".part"
+
+    def _render(self, record: Dict[str, Any]) -> Tuple[str, str]:
+        """Returns a record's JSONL line and its Markdown (the same incremental rendering as render_transcript)."""
+        record_type = record['type']
+        if record_type == 'header':
+            lines = self._formatter.header(record['goal'], record['timestamp'])
+        elif record_type == 'entry':
+            lines = self._formatter.add(record)
+        else:
+            lines = self._formatter.finish()
+        # Equivalent to "\n".join over the whole transcript, written incrementally
+        parts = []
+        for line in lines:
+            parts.append(line if self._first_line else "\n" + line)
+            self._first_line = False
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n", "".join(parts)
+
+    def _write(self, jsonl_text: str, markdown: str) -> None:
+        self._jsonl.write(jsonl_text)
+        self._md.write(markdown)
+        for f in (self._md, self._jsonl):
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def _entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        if entry.get('role') == 'assistant':
+            self._turn += 1
+        return _entry_record(entry, self._turn, datetime.datetime.now().isoformat())
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """Appends one history entry to both files and makes it durable."""
+        self._write(*self._render(self._entry(entry)))
+
+    async def append_async(self, entry: Dict[str, Any]) -> None:
+        """Like ``append``, with the write and fsync in a worker thread."""
+        await asyncio.to_thread(self._write, *self._render(self._entry(entry)))
+
+    def _finish(self, jsonl_text: str, markdown: str) -> None:
+        self._write(jsonl_text, markdown)
+        self.close()
+        os.replace(self.jsonl_path + ".part", self.jsonl_path)
+        os.replace(self.part_path, self.path)
+        if self.fsync:
+            _fsync_directory(self.output_dir)
+
+    def finalize(self) -> str:
+        """Completes the transcript and atomically moves both files to their final names.
+
+        Returns:
+            The path of the final Markdown transcript.
+        """
+        if self.finalized:
+            return self.path
+        self._finish(*self._render({"type": "end"}))
+        self.finalized = True
+        logger.info(f"Transcript saved to Markdown: {self.path}")
+        return self.path
+
+    async def finalize_async(self) -> str:
+        """Like ``finalize``, with the file operations in a worker thread."""
+        if self.finalized:
+            return self.path
+        await asyncio.to_thread(self._finish, *self._render({"type": "end"}))
+        self.finalized = True
+        logger.info(f"Transcript saved to Markdown: {self.path}")
+        return self.path
+
+    def close(self) -> None:
+        """Closes the files without finalizing (the .part files are left as a partial transcript)."""
+        for f in (self._md, self._jsonl):
+            if not f.closed:
+                f.close()
+
+
+class LiveTranscript:
+    """Markdown file that shows a dialogue while it runs, written token by token in streaming mode.
+
+    Each entry is opened with ``start_entry``, filled with ``write`` as text deltas arrive and closed
+    with ``end_entry``; every write is flushed so ``tail -f`` shows progress immediately. The file
+    is removed once the final transcript has been saved (``discard``) and left behind otherwise.
+    """
+
+    def __init__(self, goal: str, output_dir: str = "transcripts"):
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        stem = f"transcript_{timestamp}_{_sanitize_filename(goal)}"
+        # Same exclusive-create scheme as save_transcript: concurrent dialogues may share a goal
+        suffix = 0
+        while True:
+            self.path = os.path.join(
+                output_dir, f"{stem}_{suffix}.live.md" if suffix else f"{stem}.live.md")
+            try:
+                self._file = open(self.path, 'x', encoding='utf-8')
+                break
+            except FileExistsError:
+                suffix += 1
+        self._file.write(f"# Live Conversation Transcript\n\n## Goal\n> {goal}\n\n---\n")
+        self._file.flush()
+
+    def start_entry(self, agent: str, role: str, heading: Optional[str] = None) -> None:
+        if heading:
+            self._file.write(f"\n## {heading}\n")
+        self._file.write(f"\n**[{agent} ({role})]**\n> ")
+        self._file.flush()
+
+    def write(self, delta: str) -> None:
+        self._file.write(delta.replace("\n", "\n> "))
+        self._file.flush()
+
+    def end_entry(self) -> None:
+        self._file.write("\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self) -> None:
+        """Closes and removes the live file (the final transcript supersedes it)."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            logger.warning(f"Could not remove live transcript {self.path}: {e}")
+
+
+def split_transcript_on_turns(formatted_transcript: str, chunk_tokens: int) -> List[str]:
+    """Splits a formatted transcript into chunks of whole turns of at most ~``chunk_tokens`` each.
+
+    The header (title, goal, timestamp and opening message) is repeated at the top of every chunk so
+    each partial summary knows the learning goal. A single turn larger than the budget becomes a
+    chunk of its own; turns are never split.
+    """
+    starts = [m.start() for m in _TURN_HEADING.finditer(formatted_transcript)]
+    if not starts:
+        return [formatted_transcript]
+    header = formatted_transcript[:starts[0]]
+    turns = [formatted_transcript[start:end]
+             for start, end in zip(starts, starts[1:] + [len(formatted_transcript)])]
+
+    budget_chars = chunk_tokens * _CHARS_PER_TOKEN
+    chunks, current, current_chars = [], [], len(header)
+    for turn in turns:
+        if current and current_chars + len(turn) > budget_chars:
+            chunks.append(header + "".join(current))
+            current, current_chars = [], len(header)
+        current.append(turn)
+        current_chars += len(turn)
+    chunks.append(header + "".join(current))
+    return chunks
+
+
+async def _summarize_text(system_prompt: str, content: str, model: str, report: Optional[DialogueReport]) -> Optional[str]:
+    """Makes one summary call and records its usage; returns the stripped text (None if empty)."""
+    # Use the lazy-initialized client instance
+    client = get_async_openai_client()
+    call_start = time.perf_counter()
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content}
+    ]
+    response = await get_scheduler().run(
+        model,
+        lambda: client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.7,  # Lower temperature for more focused summary
+        ),
+        estimated_tokens=estimate_tokens(messages),
+        tokens_used=completion_total_tokens, stage='summary')
+    if report is not None:
+        report.add(usage_from_completion(
+            response, 'summary', model, time.perf_counter() - call_start))
+    summary = response.choices[0].message.content
+    return summary.strip() if summary else None
+
+
+async def _map_reduce_summary(formatted_transcript: str, model: str, chunk_tokens: int, max_concurrency: int,
+                              report: Optional[DialogueReport]) -> Optional[str]:
+    """Summarizes the transcript's chunks concurrently, then merges the partial summaries.
+
+    If the partial summaries are themselves larger than one chunk they are merged in groups first.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _bounded(system_prompt: str, content: str) -> str:
+        async with semaphore:
+            summary = await _summarize_text(system_prompt, content, model, report)
+        if not summary:
+            raise ValueError("a partial summary came back empty")
+        return summary
+
+    chunks = split_transcript_on_turns(formatted_transcript, chunk_tokens)
+    logger.info(
+        f"Summarizing long transcript in {len(chunks)} chunks (up to {max_concurrency} at a time).")
+    partials = await asyncio.gather(*(_bounded(CHUNK_SUMMARY_SYSTEM_PROMPT, chunk) for chunk in chunks))
+
+    budget_chars = chunk_tokens * _CHARS_PER_TOKEN
+    while len(partials) > 1 and sum(len(p) for p in partials) > budget_chars:
+        groups, current = [], []
+        for partial in partials:
+            if current and sum(len(p) for p in current) + len(partial) > budget_chars:
+                groups.append(current)
+                current = []
+            current.append(partial)
+        groups.append(current)
+        if len(groups) == len(partials):
+            break  # Every partial fills a chunk on its own; merge them all in the final call
+        partials = await asyncio.gather(*(_bounded(MERGE_SUMMARY_SYSTEM_PROMPT, _join_partials(group))
+                                          for group in groups))
+    return await _summarize_text(MERGE_SUMMARY_SYSTEM_PROMPT, _join_partials(partials), model, report)
+
+
+def _join_partials(partials: List[str]) -> str:
+    return "\n\n".join(f"### Part {i}\n{partial}" for i, partial in enumerate(partials, 1))
+
+
+async def generate_summary(formatted_transcript: str, model: str = "gpt-4.1-mini", report: Optional[DialogueReport] = None,
+                           cache: Optional[ResponseCache] = None, chunk_tokens: Optional[int] = None,
+                           max_concurrency: int = 4) -> str:
     """Generates a concise summary of the conversation using an LLM call.
 
+    Transcripts longer than ``chunk_tokens`` are summarized map-reduce style: split on turn
+    boundaries, the chunks summarized concurrently (at most ``max_concurrency`` calls at a time) and
+    the partial summaries merged. Shorter transcripts use a single call.
+
     Args:
         formatted_transcript: The formatted transcript string.
         model: The OpenAI model to use for summarization.
+        report: Optional DialogueReport to record the call's token usage and latency in.
+        cache: Optional ResponseCache; successful summaries are cached by model, prompt and transcript.
+        chunk_tokens: Optional approximate chunk size in tokens; None always uses a single call.
+        max_concurrency: Maximum concurrent chunk summaries.
 
     Returns:
         The generated summary text, or an error message if generation failed.
     """
     logger.info(f"Generating summary using model: {model}")
+    map_reduce = chunk_tokens is not None and len(
+        formatted_transcript) > chunk_tokens * _CHARS_PER_TOKEN
     try:
-        # Use the lazy-initialized client instance
-        client = get_async_openai_client()
-
-        system_prompt = ("You are an expert summarizer. Please provide a concise summary of the following conversation transcript. "
-                         "Highlight the main topic or goal, key points discussed, and whether the student's learning goal was achieved."
-                         "Structure it in a way that is easy to read and understand."
-                         "We want to know the main points of the conversation without reading the entire transcript.")
+        system_prompt = SUMMARY_SYSTEM_PROMPT
 
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": formatted_transcript}
-            ],
-            temperature=0.7,  # Lower temperature for more focused summary
-        )
+        call_start = time.perf_counter()
+        cache_key = None
+        if cache is not None:
+            # Map-reduce summaries depend on the chunking, so they are cached under their own keys
+            chunking = {"chunk_tokens": chunk_tokens} if map_reduce else {}
+            cache_key = make_cache_key(
+                kind='summary', model=model, system_prompt=system_prompt, temperature=0.7,
+                transcript=strip_transcript_timestamp(formatted_transcript), **chunking)
+            cached = await cache.get_async(cache_key)
+            if cached is not None:
+                logger.info("Summary served from the response cache.")
+                if report is not None:
+                    report.add(CallUsage(stage='summary', model=model,
+                                         latency_s=time.perf_counter() - call_start, from_cache=True))
+                return cached['summary']
 
-        summary = response.choices[0].message.content
+        if map_reduce:
+            summary = await _map_reduce_summary(
+                formatted_transcript, model, chunk_tokens, max_concurrency, report)
+        else:
+            summary = await _summarize_text(system_prompt, formatted_transcript, model, report)
         if not summary:
             logger.warning("Summary generation returned empty content.")
             return "[Summary generation failed: Empty content returned]"
 
         logger.info("Summary generated successfully.")
-        return summary.strip()
+        if cache is not None:
+            await cache.put_async(cache_key, {"summary": summary})
+        return summary
 
     except OpenAIError as e:
         logger.error(f"OpenAI API error during summary generation: {e}")
@@ -197,3 +657,105 @@ async def generate_summary(formatted_transcript: str, model: str = "gpt-4.1-mini
     except Exception as e:
         logger.error(f"Unexpected error during summary generation: {e}")
         return f"[Summary generation failed due to unexpected error: {e}]"
+
+
+class RollingSummarizer:
+    """Keeps a dialogue summary up to date in the background while later turns are still running.
+
+    ``update`` is called after each completed turn and folds only the entries added since the last
+    fold into the running summary (entries that arrive while a fold is in flight are folded right
+    after it). At the end of the dialogue ``finish`` folds whatever is left, usually just the last
+    expert response, so the final summary needs one small call or none at all.
+
+    If a fold fails the summarizer gives up and ``finish`` returns None, so the caller falls back to
+    the post-hoc ``generate_summary``.
+
+    Args:
+        model: The OpenAI model to use for the folds.
+        report: Optional DialogueReport to record every fold call (stage 'summary') in.
+    """
+
+    def __init__(self, model: str = "gpt-4.1-mini", report: Optional[DialogueReport] = None):
+        self.model = model
+        self.report = report
+        self.summary: Optional[str] = None
+        self.summarized_upto = 0  # History index of the first entry not in the summary
+        self.failed = False
+        self.fold_latencies: List[float] = []
+        self.tail_latency_s: Optional[float] = None  # Wait for the summary after the dialogue ended
+        self._history: Optional[List[Dict[str, Any]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, history: List[Dict[str, Any]]) -> None:
+        """Schedules a background fold of the entries added since the last one."""
+        self._history = history
+        if self.failed or (self._task and not self._task.done()):
+            return  # The running task picks up the new entries when its current fold finishes
+        if len(history) > self.summarized_upto:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self.failed and self.summarized_upto < len(self._history):
+            fold_upto = len(self._history)
+            await self._fold(self._history[self.summarized_upto:fold_upto], fold_upto)
+
+    async def _fold(self, entries: List[Dict[str, Any]], fold_upto: int) -> None:
+        """Folds ``entries`` into the running summary with one small LLM call."""
+        new_messages = "\n\n".join(
+            f"[{entry.get('agent', 'System')} ({entry.get('role')})]: {entry.get('content', '')}" for entry in entries)
+        try:
+            client = get_async_openai_client()
+            call_start = time.perf_counter()
+            messages = [
+                {"role": "system", "content": ROLLING_SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Current summary:\n{self.summary or '(empty)'}\n\nNewest part of the conversation:\n{new_messages}"}
+            ]
+            response = await get_scheduler().run(
+                self.model,
+                lambda: client.chat.completions.create(
+                    model=self.model, messages=messages, temperature=0.7),
+                estimated_tokens=estimate_tokens(messages),
+                tokens_used=completion_total_tokens, stage='summary')
+            latency = time.perf_counter() - call_start
+            self.fold_latencies.append(latency)
+            if self.report is not None:
+                self.report.add(usage_from_completion(
+                    response, 'summary', self.model, latency))
+            summary = response.choices[0].message.content
+            if not summary:
+                raise ValueError("empty content returned")
+            self.summary = summary.strip()
+            self.summarized_upto = fold_upto
+        except Exception as e:
+            logger.warning(
+                f"Rolling summary update failed, falling back to a post-hoc summary: {e}")
+            self.failed = True
+
+    async def finish(self, history: List[Dict[str, Any]]) -> Optional[str]:
+        """Folds the remaining entries and returns the final summary (None if rolling failed)."""
+        start = time.perf_counter()
+        self.update(history)
+        if self._task is not None:
+            await self._task
+        self.tail_latency_s = time.perf_counter() - start
+        return None if self.failed else self.summary
+
+    @property
+    def estimated_latency_saved_s(self) -> float:
+        """Estimated end-of-dialogue latency saved versus one post-hoc summary call.
+
+        Each fold writes a complete summary from a shorter input than the full transcript, so a
+        post-hoc call is assumed to take at least as long as the slowest fold.
+        """
+        if not self.fold_latencies or self.tail_latency_s is None:
+            return 0.0
+        return max(0.0, max(self.fold_latencies) - self.tail_latency_s)
+
+    async def aclose(self) -> None:
+        """Cancels any in-flight fold."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
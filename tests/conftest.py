@@ -0,0 +1,69 @@
+import asyncio
+from typing import Optional, Tuple
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from student_expert_flow.models import StudentOutput
+
+
+@pytest.fixture
+def mock_summary_client(mocker):
+    """Patches the summary client so tests make no network calls.
+
+    Every completion returns "Summary."; tests that need other text or usage set them on
+    ``chat.completions.create.return_value``.
+    """
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=MagicMock(
+        choices=[MagicMock(message=MagicMock(content="Summary."))]))
+    mocker.patch('student_expert_flow.transcript.async_openai_client', client)
+    return client
+
+
+@pytest.fixture
+def make_fake_run():
+    """Returns a factory of fake ``Runner.run`` side effects for dialogue tests.
+
+    A fake answers student calls with a StudentOutput and expert calls with text. ``{n}`` in a reply
+    is replaced by the number of calls of that agent so far. The agent names and inputs of its calls
+    are recorded in ``fake_run.calls`` and ``fake_run.inputs``.
+
+    Factory args:
+        goal_after: Student call (1-based) that reports the goal as achieved; None for never.
+        student_reply: The student's response content.
+        expert_reply: The expert's response.
+        delay: Seconds every call takes.
+        usage: Optional (input_tokens, output_tokens) billed for every call.
+        die_on_call: Call (1-based, across both agents) that raises ``die_with`` instead of answering.
+        die_with: Exception type raised on ``die_on_call``, e.g. a crash or a cancellation.
+    """
+    def factory(goal_after: Optional[int] = 1, student_reply: str = "Got it.",
+                expert_reply: str = "Here is an explanation.", delay: float = 0.0,
+                usage: Optional[Tuple[int, int]] = None, die_on_call: Optional[int] = None,
+                die_with: type = asyncio.CancelledError):
+        async def fake_run(agent, input, **kwargs):
+            fake_run.calls.append(agent.name)
+            fake_run.inputs.append(list(input))
+            if len(fake_run.calls) == die_on_call:
+                raise die_with()
+            if delay:
+                await asyncio.sleep(delay)
+            n = fake_run.calls.count(agent.name)
+            if agent.output_type is StudentOutput:
+                final_output = StudentOutput(is_goal_achieved=goal_after is not None and n >= goal_after,
+                                             response_content=student_reply.format(n=n))
+            else:
+                final_output = expert_reply.format(n=n)
+            raw_responses = []
+            if usage is not None:
+                raw_responses = [MagicMock(usage=MagicMock(
+                    input_tokens=usage[0], output_tokens=usage[1], input_tokens_details=MagicMock(cached_tokens=0)))]
+            result = MagicMock(final_output=final_output, new_items=[], raw_responses=raw_responses)
+            result.to_input_list.return_value = list(input)
+            return result
+
+        fake_run.calls = []
+        fake_run.inputs = []
+        return fake_run
+    return factory
@@ -0,0 +1,49 @@
+import pytest
+from types import SimpleNamespace
+
+from student_expert_flow.accounting import (
+    estimate_cost, usage_from_run_result, usage_from_completion, DialogueReport, make_call_usage)
+
+
+def test_estimate_cost_prefix_and_cached_rate():
+    """Tests pricing lookup by longest prefix and cached-token billing."""
+    # gpt-4.1-mini: $0.40 in, $0.10 cached, $1.60 out per 1M tokens
+    assert estimate_cost("gpt-4.1-mini-2025-04-14", 1_000_000,
+                         0) == pytest.approx(0.40)
+    assert estimate_cost("gpt-4.1-mini", 1_000_000, 1_000_000,
+                         cached_tokens=500_000) == pytest.approx(0.20 + 0.05 + 1.60)
+    assert estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_usage_from_run_result_sums_raw_responses():
+    """Tests that usage is summed across all raw responses of a run."""
+    result = SimpleNamespace(raw_responses=[
+        SimpleNamespace(usage=SimpleNamespace(input_tokens=100, output_tokens=20,
+                                              input_tokens_details=SimpleNamespace(cached_tokens=40))),
+        SimpleNamespace(usage=SimpleNamespace(
+            input_tokens=150, output_tokens=30)),
+    ])
+    usage = usage_from_run_result(result, 'expert', 'gpt-4.1-mini', 1.5)
+    assert (usage.input_tokens, usage.output_tokens,
+            usage.cached_tokens) == (250, 50, 40)
+    assert usage.latency_s == 1.5 and usage.cost > 0
+
+
+def test_usage_from_completion():
+    """Tests extracting usage from a Chat Completions response."""
+    response = SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=300, completion_tokens=60, prompt_tokens_details=SimpleNamespace(cached_tokens=0)))
+    usage = usage_from_completion(response, 'summary', 'gpt-4.1', 0.3)
+    assert usage.stage == 'summary' and usage.total_tokens == 360
+
+
+def test_dialogue_report_budgets():
+    """Tests token and cost budget checks on the report totals."""
+    report = DialogueReport()
+    report.add(make_call_usage('expert', 'gpt-4.1', 1000, 500, 0, 1.0))
+    assert report.total_tokens == 1500
+    assert report.budget_exceeded() is None
+    assert report.budget_exceeded(max_total_tokens=2000) is None
+    assert "token budget" in report.budget_exceeded(max_total_tokens=1500)
+    assert "cost budget" in report.budget_exceeded(max_cost=0.001)
+    assert report.to_dict()['totals']['total_tokens'] == 1500
@@ -1,5 +1,5 @@
 import pytest
-from student_expert_flow.participants import ExpertAgent, StudentAgent
+from student_expert_flow.participants import AgentRegistry, ExpertAgent, StudentAgent
 from student_expert_flow.config import load_config, ExpertConfig, StudentConfig
 from agents import Agent  # Import the base Agent from SDK for type checking
 
@@ -78,3 +78,20 @@ def test_student_agent_initialization():
 # The goal achievement logic is now tested via the runner tests (mocked & integration)
 
 # You can add more tests here for different configurations or edge cases if needed.
+
+
+def test_agent_registry_reuses_agents_for_equal_configs():
+    """Equal configs (e.g. the same file loaded twice) share one agent; a changed config gets its own."""
+    registry = AgentRegistry(max_entries=2)
+    student = registry.student(load_config(STUDENT_CONFIG_PATH, 'student'))
+    assert registry.student(load_config(STUDENT_CONFIG_PATH, 'student')) is student
+    assert registry.hits == 1 and registry.misses == 1
+
+    changed = load_config(STUDENT_CONFIG_PATH, 'student').model_copy(update={"goal": "Learn Rust lifetimes"})
+    other = registry.student(changed)
+    assert other is not student and "Learn Rust lifetimes" in other.agent.instructions
+
+    expert = registry.expert(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    assert len(registry) == 2  # The least recently used agent (the first student) was dropped
+    assert registry.expert(load_config(EXPERT_CONFIG_PATH, 'expert')) is expert
+    assert registry.student(load_config(STUDENT_CONFIG_PATH, 'student')) is not student
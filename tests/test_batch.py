@@ -0,0 +1,88 @@
+import pytest
+
+from student_expert_flow.batch import run_batch
+from student_expert_flow.config import AdaptiveConcurrencyConfig, BatchJob, load_batch_manifest
+from student_expert_flow.scheduler import get_scheduler
+
+# Config paths
+EXPERT_CONFIG_PATH = "configs/expert_config.yaml"
+STUDENT_CONFIG_PATH = "configs/student_config.yaml"
+MANIFEST_PATH = "configs/batch_manifest_example.yaml"
+
+
+def track_in_flight(fake_run, in_flight: dict):
+    """Wraps a fake Runner.run so that ``in_flight`` tracks its current and peak concurrency."""
+    async def tracked_run(agent, input, **kwargs):
+        in_flight['now'] += 1
+        in_flight['peak'] = max(in_flight['peak'], in_flight['now'])
+        try:
+            return await fake_run(agent, input, **kwargs)
+        finally:
+            in_flight['now'] -= 1
+    return tracked_run
+
+
+def test_load_batch_manifest():
+    """Tests loading the example batch manifest."""
+    manifest = load_batch_manifest(MANIFEST_PATH)
+    assert manifest.concurrency >= 1
+    assert len(manifest.jobs) == 3
+    assert manifest.jobs[1].max_turns == 2
+
+
+@pytest.mark.asyncio
+async def test_run_batch_bounded_concurrency(mocker, mock_summary_client, make_fake_run, tmp_path):
+    """Tests that all jobs complete and the semaphore bounds in-flight dialogues."""
+    in_flight = {'now': 0, 'peak': 0}
+    mocker.patch('agents.Runner.run', side_effect=track_in_flight(make_fake_run(delay=0.01), in_flight))
+
+    jobs = [BatchJob(student_config=STUDENT_CONFIG_PATH, expert_config=EXPERT_CONFIG_PATH)
+            for _ in range(6)]
+    report = await run_batch(jobs, concurrency=2, max_turns=3, output_dir=str(tmp_path))
+
+    assert report.completed == 6 and report.failed == 0
+    assert in_flight['peak'] <= 2
+    assert [r.index for r in report.results] == list(range(6))
+    assert all(r.goal_achieved and r.turns == 1 for r in report.results)
+    assert report.dialogues_per_second > 0
+    # One transcript per job, even though all jobs share a goal and finish together
+    assert len(list(tmp_path.glob("transcript_*.md"))) == 6
+
+
+@pytest.mark.asyncio
+async def test_run_batch_failed_job_does_not_stop_others(mocker, mock_summary_client, make_fake_run, tmp_path):
+    """Tests that a job with a missing config is reported as failed without affecting the rest."""
+    mocker.patch('agents.Runner.run', side_effect=make_fake_run(delay=0.01))
+
+    jobs = [
+        BatchJob(student_config="configs/does_not_exist.yaml",
+                 expert_config=EXPERT_CONFIG_PATH, name="broken"),
+        BatchJob(student_config=STUDENT_CONFIG_PATH,
+                 expert_config=EXPERT_CONFIG_PATH, name="ok"),
+    ]
+    report = await run_batch(jobs, concurrency=4, output_dir=str(tmp_path))
+
+    assert report.completed == 1 and report.failed == 1
+    assert report.results[0].status == 'failed' and "not found" in report.results[0].error
+    assert report.results[1].status == 'completed'
+
+
+@pytest.mark.asyncio
+async def test_run_batch_adaptive_concurrency_grows_and_reports_history(mocker, mock_summary_client, make_fake_run,
+                                                                        tmp_path):
+    """With fast calls the dialogue limit grows beyond its start, and the history is reported."""
+    mocker.patch('agents.Runner.run', side_effect=make_fake_run(delay=0.01))
+
+    jobs = [BatchJob(student_config=STUDENT_CONFIG_PATH, expert_config=EXPERT_CONFIG_PATH)
+            for _ in range(20)]
+    report = await run_batch(jobs, concurrency=1, max_turns=3, output_dir=str(tmp_path),
+                             adaptive=AdaptiveConcurrencyConfig(target_p95_s=5.0, window=2, max_dialogues=4))
+
+    assert report.completed == 20
+    dialogues = report.concurrency_metrics['dialogues']
+    assert dialogues.history[0].limit == 1
+    assert 1 < dialogues.limit <= 4
+    assert all(change.reason == 'increase' for change in dialogues.history[1:])
+    assert 'calls' in report.concurrency_metrics
+    # The batch's limiters are detached from the shared scheduler afterwards
+    assert get_scheduler().call_limiter is None and not get_scheduler().feedback_limiters
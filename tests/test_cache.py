@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+import time
+
+from student_expert_flow.cache import ResponseCache, make_cache_key
+from student_expert_flow.participants import StudentAgent, ExpertAgent
+from student_expert_flow.config import load_config
+from student_expert_flow.runner import run_dialogue
+from student_expert_flow.accounting import DialogueReport
+
+# Config paths
+EXPERT_CONFIG_PATH = "configs/expert_config.yaml"
+STUDENT_CONFIG_PATH = "configs/student_config.yaml"
+
+
+def test_make_cache_key_is_content_addressed():
+    """Tests that keys depend on content, not on dict ordering."""
+    key_a = make_cache_key(model="m", input=[{"role": "user", "content": "hi"}])
+    key_b = make_cache_key(input=[{"content": "hi", "role": "user"}], model="m")
+    key_c = make_cache_key(model="m", input=[{"role": "user", "content": "bye"}])
+    assert key_a == key_b and key_a != key_c
+
+
+def test_response_cache_hits_misses_and_persistence(tmp_path):
+    """Tests basic get/put, hit/miss counters and that entries survive reopening."""
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    assert cache.get("k") is None
+    cache.put("k", {"final_output": "v"})
+    assert cache.get("k") == {"final_output": "v"}
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.writes) == (1, 1, 1)
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get("k") == {"final_output": "v"}
+    assert reopened.refresh_stats().entries == 1
+    reopened.close()
+
+
+def test_response_cache_eviction(tmp_path):
+    """Tests LRU eviction by entry count and size, and age-based expiry."""
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_entries=2)
+    cache.put("a", {"v": 1})
+    time.sleep(0.01)
+    cache.put("b", {"v": 2})
+    time.sleep(0.01)
+    cache.get("a")  # "a" is now more recently used than "b"
+    time.sleep(0.01)
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats.evictions == 1
+
+    sized = ResponseCache(str(tmp_path / "s.sqlite"), max_bytes=30)
+    sized.put("x", {"v": "x" * 10})
+    time.sleep(0.01)
+    sized.put("y", {"v": "y" * 10})
+    assert sized.get("x") is None and sized.get("y") is not None
+
+    aged = ResponseCache(str(tmp_path / "a.sqlite"), max_age_seconds=0.05)
+    aged.put("old", {"v": 1})
+    time.sleep(0.1)
+    assert aged.get("old") is None
+
+
+def test_response_cache_evicts_periodically_not_on_every_put(tmp_path, mocker):
+    """Tests that puts within the limits only evict every ``evict_every`` puts."""
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_entries=100, max_age_seconds=3600, evict_every=3)
+    evict = mocker.spy(cache, '_evict')
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert evict.call_count == 0
+    cache.put("c", {"v": 3})
+    assert evict.call_count == 1
+    cache.put("d", {"v": 4})
+    assert evict.call_count == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_response_cache_async_methods_run_off_the_event_loop(tmp_path, mocker):
+    """Tests that get_async/put_async hand the SQLite work to asyncio.to_thread."""
+    cache = ResponseCache(str(tmp_path / "c.sqlite"))
+    to_thread = mocker.spy(asyncio, 'to_thread')
+    assert await cache.get_async("k") is None
+    await cache.put_async("k", {"v": 1})
+    assert await cache.get_async("k") == {"v": 1}
+    assert [call.args[0] for call in to_thread.call_args_list] == [cache.get, cache.put, cache.get]
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_run_dialogue_warm_rerun_served_from_cache(mocker, mock_summary_client, make_fake_run, tmp_path):
+    """Tests that re-running the same dialogue makes no model or summary calls."""
+    expert = ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    student = StudentAgent(load_config(STUDENT_CONFIG_PATH, 'student'))
+
+    mock_run = mocker.patch('agents.Runner.run', side_effect=make_fake_run(
+        goal_after=2, student_reply="Question {n}", expert_reply="Answer {n}"))
+
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cold_history = await run_dialogue(student, expert, max_turns=5, output_dir=str(tmp_path / "cold"), cache=cache)
+    cold_calls = mock_run.call_count
+    assert cold_calls == 4  # E1, S1, E2, S2 (goal achieved)
+    mock_summary_client.chat.completions.create.assert_awaited_once()
+
+    warm_report = DialogueReport()
+    warm_history = await run_dialogue(student, expert, max_turns=5, output_dir=str(tmp_path / "warm"),
+                                      cache=cache, report=warm_report)
+    assert mock_run.call_count == cold_calls  # No new Runner.run calls
+    mock_summary_client.chat.completions.create.assert_awaited_once()  # No new summary call
+    assert [e['content'] for e in warm_history] == [e['content']
+                                                    for e in cold_history]
+    assert warm_history[-1]['goal_achieved_flag'] is True
+    assert all(call.from_cache for call in warm_report.calls)
+    summary_files = list((tmp_path / "warm").glob("*.summary.txt"))
+    assert summary_files and summary_files[0].read_text() == "Summary."
+    cache.close()
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from student_expert_flow.accounting import DialogueReport
+from student_expert_flow.batch import run_batch, unfinished_jobs
+from student_expert_flow.checkpoint import find_checkpoints, load_checkpoint
+from student_expert_flow.config import load_config
+from student_expert_flow.participants import StudentAgent, ExpertAgent
+from student_expert_flow.runner import run_dialogue, resume_dialogue
+
+EXPERT_CONFIG_PATH = "configs/expert_config.yaml"
+STUDENT_CONFIG_PATH = "configs/student_config.yaml"
+
+
+# Numbered replies; a fake run 'dying' on a call raises CancelledError, which escapes run_dialogue
+# like a killed process
+NUMBERED_REPLIES = {"student_reply": "Question {n}", "expert_reply": "Answer {n}"}
+
+
+def make_agents():
+    return (StudentAgent(load_config(STUDENT_CONFIG_PATH, 'student')),
+            ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert')))
+
+
+@pytest.mark.asyncio
+async def test_killed_dialogue_resumes_without_repeating_calls(mocker, mock_summary_client, make_fake_run, tmp_path):
+    student, expert = make_agents()
+    mocker.patch('agents.Runner.run', side_effect=make_fake_run(goal_after=2, die_on_call=3, **NUMBERED_REPLIES))
+    with pytest.raises(asyncio.CancelledError):
+        await run_dialogue(student, expert, max_turns=5, output_dir=str(tmp_path))
+
+    [checkpoint_path] = find_checkpoints([str(tmp_path)])
+    checkpoint = load_checkpoint(checkpoint_path)
+    assert checkpoint.current_turn == 1 and checkpoint.next_stage == 'expert'
+    assert [e['agent'] for e in checkpoint.full_history] == ['System', expert.config.name, student.config.name]
+    assert len(checkpoint.calls) == 2
+
+    # Resume in a "new process": only the remaining calls are made
+    fake_run = make_fake_run(**NUMBERED_REPLIES)
+    mocker.patch('agents.Runner.run', side_effect=fake_run)
+    report = DialogueReport()
+    history = await resume_dialogue(checkpoint_path, report=report)
+
+    assert fake_run.calls == [expert.config.name, student.config.name]
+    assert [e['content'] for e in history] == [
+        history[0]['content'], "Answer 1", "Question 1", "Answer 1", "Question 1"]
+    assert report.stop_reason == 'goal_achieved'
+    # Calls from before the crash stay in the report: 2 + 2 agent calls and the summary
+    assert len(report.calls) == 5
+    assert find_checkpoints([str(tmp_path)]) == []
+    # The resumed transcript supersedes the crashed run's partial files
+    assert not list(tmp_path.glob("*.part"))
+    assert len(list(tmp_path.glob("transcript_*.md"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_resumes_all_unfinished_dialogues(mocker, mock_summary_client, make_fake_run, tmp_path):
+    # Two dialogues killed right after their first expert response
+    for _ in range(2):
+        student, expert = make_agents()
+        mocker.patch('agents.Runner.run', side_effect=make_fake_run(die_on_call=2, **NUMBERED_REPLIES))
+        with pytest.raises(asyncio.CancelledError):
+            await run_dialogue(student, expert, max_turns=3, output_dir=str(tmp_path))
+
+    jobs = unfinished_jobs([str(tmp_path)])
+    assert len(jobs) == 2
+    assert all(load_checkpoint(job.resume_from).next_stage == 'student' for job in jobs)
+
+    fake_run = make_fake_run(**NUMBERED_REPLIES)
+    mocker.patch('agents.Runner.run', side_effect=fake_run)
+    report = await run_batch(jobs, concurrency=2)
+
+    assert report.completed == 2
+    # Each dialogue continued with its pending student call, which achieved the goal
+    assert fake_run.calls == [student.config.name] * 2
+    assert all(r.goal_achieved and r.turns == 1 for r in report.results)
+    assert unfinished_jobs([str(tmp_path)]) == []
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from agents.models import _openai_shared
+
+from student_expert_flow import clients
+from student_expert_flow.config import ClientSettings
+from student_expert_flow.transcript import get_async_openai_client
+
+
+@pytest_asyncio.fixture
+async def shared_client_env(monkeypatch):
+    """Dummy credentials for the shared client, and a clean slate before and after each test."""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    await clients.aclose_clients()
+    clients.set_client_settings(None)
+    yield monkeypatch
+    await clients.aclose_clients()
+    clients.set_client_settings(None)
+
+
+async def _serve_models(reader, writer):
+    """Minimal keep-alive HTTP/1.1 server answering every request with an empty model list."""
+    body = json.dumps({"object": "list", "data": []}).encode()
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode().split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            if length:
+                await reader.readexactly(length)
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_used_by_agents_and_summaries(shared_client_env, mocker):
+    """One configured client backs both the agents SDK and the summary calls, with the given limits."""
+    mocker.patch('student_expert_flow.transcript.async_openai_client', None)
+    client = clients.configure_clients(ClientSettings(
+        max_connections=7, max_keepalive_connections=3, timeout=42, max_retries=0))
+
+    assert _openai_shared.get_default_openai_client() is client
+    assert get_async_openai_client() is client
+    assert client.max_retries == 0
+    assert client.timeout.read == 42
+    pool = client._client._transport._pool
+    assert pool._max_connections == 7 and pool._max_keepalive_connections == 3
+
+    await clients.aclose_clients()
+    assert _openai_shared.get_default_openai_client() is None
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_show_connection_reuse(shared_client_env):
+    """Sequential calls through the shared client reuse one keep-alive connection."""
+    server = await asyncio.start_server(_serve_models, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    shared_client_env.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    try:
+        client = clients.get_openai_client()
+        for _ in range(5):
+            await client.models.list()
+        stats = clients.get_pool_stats()
+    finally:
+        await clients.aclose_clients()
+        server.close()
+        await server.wait_closed()
+
+    assert stats.requests == 5
+    assert stats.connections_opened == 1
+    assert stats.reuse_rate == pytest.approx(0.8)
+    assert stats.open_connections == 1 and stats.idle_connections == 1
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from student_expert_flow.concurrency import AIMDLimiter
+from student_expert_flow.runner import _wait_with_timeout
+from student_expert_flow.scheduler import RateLimitScheduler
+
+
+def test_aimd_increases_on_target_and_cuts_on_errors():
+    """The limit grows one step per round of on-target calls and halves on a 429 or latency spike."""
+    limiter = AIMDLimiter('calls', initial=4, max_limit=6, target_p95_s=1.0, window=5)
+    for _ in range(5 + 4):  # Fill the window, then one round at limit 4
+        limiter.record(0.1)
+    assert limiter.limit == 5
+
+    limiter.record(None, 'rate_limited')
+    assert limiter.limit == 2
+    # 429s from calls that were already in flight do not cut the limit again in the same round
+    limiter.record(None, 'rate_limited')
+    assert limiter.limit == 2
+
+    for _ in range(4):
+        limiter.record(5.0)  # p95 of the window now exceeds the 1s target
+    assert limiter.limit == 1
+    assert [change.reason for change in limiter.history] == [
+        'start', 'increase', 'rate_limited', 'latency']
+    metrics = limiter.metrics()
+    assert metrics.limit == 1 and metrics.history[-1].p95_s == 5.0
+
+
+@pytest.mark.asyncio
+async def test_aimd_limiter_bounds_in_flight_and_wakes_waiters_on_increase():
+    limiter = AIMDLimiter('dialogues', initial=1, max_limit=2, target_p95_s=1.0, window=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done() and limiter.in_flight == 1
+
+    limiter.record(0.1)  # Window of one on-target call at limit 1 -> limit 2
+    await asyncio.wait_for(waiter, timeout=1)
+    assert limiter.limit == 2 and limiter.in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_turn_timeout_cancel_cuts_the_call_limit():
+    """A call cancelled by the turn timeout counts as a timeout; a call whose caller went away does not."""
+    scheduler = RateLimitScheduler()
+    scheduler.call_limiter = AIMDLimiter('calls', initial=8)
+
+    async def stuck():
+        await asyncio.sleep(10)
+
+    finished, _ = await _wait_with_timeout(scheduler.run('gpt-4.1', stuck), 0.01)
+    assert not finished and scheduler.call_limiter.limit == 8
+
+    finished, _ = await _wait_with_timeout(scheduler.run('gpt-4.1', stuck), 0.01, report_timeout=True)
+    assert not finished and scheduler.call_limiter.limit == 4
+    assert scheduler.call_limiter.history[-1].reason == 'timeout'
+    assert scheduler.stats.timed_out == 1 and scheduler.call_limiter.in_flight == 0
@@ -1,5 +1,8 @@
+import os
+import shutil
+
 import pytest
-from student_expert_flow.config import load_config, ExpertConfig, StudentConfig
+from student_expert_flow.config import load_config, ConfigRegistry, ExpertConfig, StudentConfig
 
 # Define paths to sample config files
 EXPERT_CONFIG_PATH = "configs/expert_config.yaml"
@@ -35,4 +38,36 @@ def test_load_configs():
         pytest.fail(
             f"Config loading test failed with an unexpected error: {e}")
 
-# Removed the if __name__ == "__main__" block as pytest handles execution
+
+def test_config_registry_reparses_only_changed_files(tmp_path):
+    """A directory loads in one pass; later lookups reuse the configs until a file's contents change."""
+    shutil.copy(STUDENT_CONFIG_PATH, tmp_path / "student_a.yaml")
+    shutil.copy(EXPERT_CONFIG_PATH, tmp_path / "expert_a.yaml")
+    (tmp_path / "expert_broken.yaml").write_text("instructions: [unclosed")
+    (tmp_path / "batch_manifest.yaml").write_text("jobs: []")
+
+    registry = ConfigRegistry()
+    configs = registry.load_directory(str(tmp_path))
+    student_path = str(tmp_path / "student_a.yaml")
+    assert sorted(os.path.basename(path) for path in configs) == ["expert_a.yaml", "student_a.yaml"]
+    assert isinstance(configs[student_path], StudentConfig)
+    assert registry.parses == 2
+
+    # Thousands of jobs naming the same file cost a stat each
+    student = registry.get(student_path, 'student')
+    assert student is configs[student_path] and registry.parses == 2
+
+    # A touched but unchanged file is hashed, not parsed
+    stat = os.stat(student_path)
+    os.utime(student_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert registry.get(student_path, 'student') is student and registry.parses == 2
+
+    with open(student_path, 'r') as f:
+        text = f.read()
+    with open(student_path, 'w') as f:
+        f.write(text.replace("CuriousLearner", "Renamed"))
+    assert registry.get(student_path, 'student').name == "Renamed" and registry.parses == 3
+
+    with pytest.raises(ValueError, match="Error parsing YAML"):
+        registry.get(str(tmp_path / "expert_broken.yaml"), 'expert')
+
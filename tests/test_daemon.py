@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import stat
+from unittest.mock import MagicMock
+
+import pytest
+
+from student_expert_flow import participants
+from student_expert_flow.checkpoint import DialogueCheckpoint, save_checkpoint
+from student_expert_flow.config import load_config
+from student_expert_flow.daemon import DialogueDaemon
+
+EXPERT_CONFIG_PATH = "configs/expert_config.yaml"
+STUDENT_CONFIG_PATH = "configs/student_config.yaml"
+
+
+async def request(path, method="GET", body=None, unix_path=None, port=None, token=None):
+    """Sends one HTTP request to the daemon and returns (status, parsed JSON body)."""
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    auth = f"Authorization: Bearer {token}\r\n" if token else ""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n{auth}Content-Length: {len(data)}\r\n\r\n".encode()
+                 + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+@pytest.mark.asyncio
+async def test_daemon_runs_queued_jobs_with_warm_agents(mocker, mock_summary_client, make_fake_run, tmp_path):
+    """Jobs submitted over HTTP are queued, run concurrently and reuse agents built for earlier jobs."""
+    mocker.patch('agents.Runner.run', side_effect=make_fake_run(delay=0.01))
+    mocker.patch.object(participants, '_registry', participants.AgentRegistry())
+    expert_init = mocker.spy(participants.ExpertAgent, '__init__')
+
+    service = DialogueDaemon(concurrency=2, max_turns=2, output_dir=str(tmp_path))
+    server = await service.serve(port=0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        job = {"student_config": STUDENT_CONFIG_PATH, "expert_config": EXPERT_CONFIG_PATH}
+        submitted = [await request("/jobs", "POST", job, port=port) for _ in range(3)]
+        assert [status for status, _ in submitted] == [202] * 3
+        job_ids = [body["id"] for _, body in submitted]
+
+        for _ in range(200):
+            statuses = [(await request(f"/jobs/{job_id}", port=port))[1]["status"] for job_id in job_ids]
+            if all(status == 'completed' for status in statuses):
+                break
+            await asyncio.sleep(0.02)
+        assert statuses == ['completed'] * 3
+
+        status, result = await request(f"/jobs/{job_ids[0]}/result", port=port)
+        assert status == 200
+        assert result["history"][-1]["goal_achieved_flag"] is True
+        assert result["report"]["stop_reason"] == 'goal_achieved'
+        # The expert was built once and kept warm for the other jobs
+        assert expert_init.call_count == 1
+        status, health = await request("/health", port=port)
+        assert health["completed"] == 3 and health["warm_agents"] == 2
+
+        assert (await request("/jobs/unknown", port=port))[0] == 404
+        assert (await request("/jobs", "POST", {"max_turns": 2}, port=port))[0] == 400
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_daemon_unix_socket_reports_unfinished_job(mocker, make_fake_run, tmp_path):
+    release = asyncio.Event()
+    fake_run = make_fake_run()
+
+    async def slow_run(agent, input, **kwargs):
+        await release.wait()
+        return await fake_run(agent, input, **kwargs)
+
+    mocker.patch('agents.Runner.run', side_effect=slow_run)
+    socket_path = str(tmp_path / "daemon.sock")
+    service = DialogueDaemon(concurrency=1, output_dir=str(tmp_path))
+    server = await service.serve(socket_path=socket_path)
+    try:
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+        job = {"student_config": STUDENT_CONFIG_PATH, "expert_config": EXPERT_CONFIG_PATH}
+        _, first = await request("/jobs", "POST", job, unix_path=socket_path)
+        _, second = await request("/jobs", "POST", job, unix_path=socket_path)
+        await asyncio.sleep(0.05)
+        # One worker: the first job is running, the second waits in the queue
+        assert (await request(f"/jobs/{first['id']}", unix_path=socket_path))[1]["status"] == 'running'
+        assert (await request(f"/jobs/{second['id']}", unix_path=socket_path))[1]["status"] == 'queued'
+        assert (await request(f"/jobs/{first['id']}/result", unix_path=socket_path))[0] == 409
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_daemon_requires_token_and_confines_job_paths(mocker, mock_summary_client, make_fake_run, tmp_path):
+    """Public addresses need a token; requests must present it and job paths must stay inside the allowed root."""
+    mocker.patch('agents.Runner.run', side_effect=make_fake_run(delay=0.01))
+    with pytest.raises(ValueError, match="without a token"):
+        await DialogueDaemon().serve(host="0.0.0.0", port=0)
+
+    service = DialogueDaemon(concurrency=1, output_dir=str(tmp_path), token="s3cret", allowed_root=".")
+    server = await service.serve(port=0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        job = {"student_config": STUDENT_CONFIG_PATH, "expert_config": EXPERT_CONFIG_PATH, "max_turns": 2}
+        assert (await request("/health", port=port))[0] == 200
+        assert (await request("/jobs", "POST", job, port=port))[0] == 401
+        assert (await request("/jobs", "POST", job, port=port, token="wrong"))[0] == 401
+        assert (await request("/jobs", port=port))[0] == 401
+
+        outside = {**job, "output_dir": str(tmp_path)}
+        status, body = await request("/jobs", "POST", outside, port=port, token="s3cret")
+        assert status == 403 and "output_dir" in body["error"]
+        escaping = {**job, "student_config": "configs/../../etc/passwd"}
+        assert (await request("/jobs", "POST", escaping, port=port, token="s3cret"))[0] == 403
+        assert (await request("/jobs", "POST", job, port=port, token="s3cret"))[0] == 202
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_daemon_times_out_incomplete_requests(tmp_path):
+    """A client that stops mid-request gets a 408 instead of holding the connection."""
+    service = DialogueDaemon(concurrency=1, output_dir=str(tmp_path), request_timeout_s=0.1)
+    server = await service.serve(port=0)
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+        writer.write(b"POST /jobs HTTP/1.1\r\nContent-Length: 10\r\n\r\n{")
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        assert raw.split()[1] == b"408"
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_daemon_confines_output_dir_of_resumed_checkpoints(tmp_path):
+    """A checkpoint inside the allowed root cannot make its dialogue write outside it."""
+    root = tmp_path / "root"
+    root.mkdir()
+
+    def checkpoint(name, output_dir):
+        path = str(root / name)
+        save_checkpoint(DialogueCheckpoint(
+            student_config=load_config(STUDENT_CONFIG_PATH, 'student'),
+            expert_config=load_config(EXPERT_CONFIG_PATH, 'expert'),
+            max_turns=2, output_dir=output_dir, current_turn=1, full_history=[]), path)
+        return path
+
+    service = DialogueDaemon(concurrency=1, output_dir=str(root), allowed_root=str(root))
+    service.submit = MagicMock(return_value=MagicMock(model_dump=lambda: {}))
+    server = await service.serve(port=0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        outside = {"resume_from": checkpoint("out.checkpoint.json", str(tmp_path / "elsewhere"))}
+        status, body = await request("/jobs", "POST", outside, port=port)
+        assert status == 403 and "checkpoint" in body["error"]
+        inside = {"resume_from": checkpoint("in.checkpoint.json", str(root / "transcripts"))}
+        assert (await request("/jobs", "POST", inside, port=port))[0] == 202
+        service.submit.assert_called_once()
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.aclose()
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from student_expert_flow.accounting import DialogueReport
+from student_expert_flow.config import HedgingConfig, load_config
+from student_expert_flow.hedging import HedgingPolicy, run_hedged
+from student_expert_flow.models import StudentOutput
+from student_expert_flow.participants import StudentAgent, ExpertAgent
+from student_expert_flow.runner import run_dialogue
+
+
+def make_policy(**overrides) -> HedgingPolicy:
+    """A policy that hedges after 20ms, with three recent samples of 10ms."""
+    config = dict(min_samples=3, min_delay_s=0.02, max_hedge_rate=1.0)
+    config.update(overrides)
+    policy = HedgingPolicy(HedgingConfig(**config))
+    for _ in range(3):
+        policy.record_latency('expert', 0.01)
+    return policy
+
+
+def make_calls(delays):
+    """A call function whose n-th invocation sleeps delays[n]; records cancellations."""
+    state = {'started': 0, 'cancelled': 0}
+
+    async def call():
+        index = state['started']
+        state['started'] += 1
+        try:
+            await asyncio.sleep(delays[index])
+        except asyncio.CancelledError:
+            state['cancelled'] += 1
+            raise
+        return f"copy-{index}"
+    return call, state
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_loser_cancelled():
+    policy = make_policy()
+    call, state = make_calls([5.0, 0.01])
+
+    result, hedged = await asyncio.wait_for(run_hedged(policy, 'expert', call), timeout=1)
+
+    assert (result, hedged) == ("copy-1", True)
+    await asyncio.sleep(0)
+    assert state == {'started': 2, 'cancelled': 1}
+    assert policy.stats.hedges == 1 and policy.stats.hedge_wins == 1
+    # The sample is the cancelled original's elapsed time (hedge delay plus the duplicate), not 10ms
+    assert policy._latencies['expert'][-1] >= 0.02 + 0.01
+
+
+@pytest.mark.asyncio
+async def test_hedging_waits_for_samples_and_respects_rate_cap():
+    # Not enough latency history yet: the call just runs
+    policy = HedgingPolicy(HedgingConfig(min_samples=10))
+    call, state = make_calls([0.05])
+    assert await run_hedged(policy, 'expert', call) == ("copy-0", False)
+
+    # A slow call over the cap is not duplicated
+    policy = make_policy(max_hedge_rate=0.5)
+    call, state = make_calls([0.05])
+    assert await run_hedged(policy, 'expert', call) == ("copy-0", False)
+    assert state['started'] == 1 and policy.stats.skipped_by_rate_cap == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_expert_turn_reports_extra_cost_upper_bound(mocker, mock_summary_client, make_fake_run, tmp_path):
+    expert = ExpertAgent(load_config("configs/expert_config.yaml", 'expert'))
+    student = StudentAgent(load_config("configs/student_config.yaml", 'student'))
+
+    # Every call is billed 1000 input / 100 output tokens
+    fake_run = make_fake_run(student_reply="Thanks!", expert_reply="Decorators wrap functions.", usage=(1000, 100))
+    expert_calls = {'n': 0}
+
+    async def stalling_run(agent, input, **kwargs):
+        if agent.output_type is not StudentOutput:
+            expert_calls['n'] += 1
+            # The first expert call stalls; its duplicate answers quickly
+            await asyncio.sleep(5.0 if expert_calls['n'] == 1 else 0.01)
+        return await fake_run(agent, input, **kwargs)
+    mocker.patch('agents.Runner.run', side_effect=stalling_run)
+
+    report = DialogueReport()
+    await asyncio.wait_for(run_dialogue(student, expert, max_turns=2, output_dir=str(tmp_path),
+                                        report=report, hedging=make_policy()), timeout=2)
+
+    expert_usage = [c for c in report.calls if c.stage == 'expert'][0]
+    assert expert_usage.hedged and expert_usage.hedge_cost_upper_bound == pytest.approx(expert_usage.cost)
+    assert report.hedge_cost_upper_bound > 0
+    assert report.total_cost == pytest.approx(sum(c.cost for c in report.calls) + report.hedge_cost_upper_bound)
+    assert report.to_dict()['totals']['hedged_calls'] == 1
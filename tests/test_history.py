@@ -0,0 +1,103 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from student_expert_flow.history import build_agent_input, ContextCompactor, SUMMARY_PREFIX
+from student_expert_flow.scheduler import get_scheduler
+from student_expert_flow.accounting import DialogueReport
+from student_expert_flow.config import load_config
+from student_expert_flow.participants import StudentAgent, ExpertAgent
+from student_expert_flow.runner import run_dialogue
+
+# Shared history: System kickoff, then three Expert -> Student turns
+MOCK_HISTORY = [
+    {"role": "user", "agent": "System", "content": "My learning goal is: X."},
+    {"role": "assistant", "agent": "ExpertB", "content": "Answer 1 " * 50},
+    {"role": "user", "agent": "StudentA", "content": "Question 1"},
+    {"role": "assistant", "agent": "ExpertB", "content": "Answer 2 " * 50},
+    {"role": "user", "agent": "StudentA", "content": "Question 2"},
+    {"role": "assistant", "agent": "ExpertB", "content": "Answer 3"},
+    {"role": "user", "agent": "StudentA", "content": "Question 3"},
+]
+
+
+def test_build_agent_input_role_swap():
+    """Tests that each agent sees its own entries as assistant and the other side as user."""
+    expert_view = build_agent_input(MOCK_HISTORY, ["ExpertB"])
+    student_view = build_agent_input(MOCK_HISTORY, ["StudentA", "System"])
+
+    assert len(expert_view) == len(student_view) == len(MOCK_HISTORY)
+    assert [m['role'] for m in expert_view] == [
+        'user', 'assistant', 'user', 'assistant', 'user', 'assistant', 'user']
+    assert [m['role'] for m in student_view] == [
+        'assistant', 'user', 'assistant', 'user', 'assistant', 'user', 'assistant']
+
+
+def test_build_agent_input_with_summary():
+    """Tests that summarized entries are replaced by one summary message after the kickoff."""
+    view = build_agent_input(MOCK_HISTORY, ["ExpertB"],
+                             summary="Earlier stuff.", summarized_upto=5)
+    assert view[0]['content'] == MOCK_HISTORY[0]['content']
+    assert view[1] == {"role": "system",
+                       "content": f"{SUMMARY_PREFIX}Earlier stuff."}
+    assert [m['content'] for m in view[2:]] == ["Answer 3", "Question 3"]
+
+
+@pytest.mark.asyncio
+async def test_context_compactor_folds_in_background(mocker, mock_summary_client):
+    """Tests that old turns are folded off the critical path and the savings are recorded."""
+    client = mock_summary_client
+    scheduled = mocker.spy(get_scheduler(), 'run')
+    compactor = ContextCompactor(keep_turns=1, self_agents=["ExpertB"])
+
+    # Before any fold the input is the full verbatim view
+    assert compactor.build_input(MOCK_HISTORY) == build_agent_input(
+        MOCK_HISTORY, ["ExpertB"])
+
+    compactor.update(MOCK_HISTORY)
+    await compactor._task
+    client.chat.completions.create.assert_awaited_once()
+    assert compactor.summarized_upto == 5
+    # The fold is charged to the TPM bucket by the size of its messages (two ~450-character answers)
+    assert scheduled.call_args.kwargs['estimated_tokens'] > 200
+
+    compacted = compactor.build_input(MOCK_HISTORY)
+    assert compacted[1]['content'].endswith("Summary.")
+    assert len(compacted) == 4
+    assert compactor.tokens_saved > 0
+    await compactor.aclose()
+
+
+@pytest.mark.asyncio
+async def test_context_compactor_fold_failure_keeps_verbatim(mocker, mock_summary_client):
+    """Tests that a failed fold leaves the history uncompacted."""
+    mock_summary_client.chat.completions.create.side_effect = RuntimeError("boom")
+    compactor = ContextCompactor(keep_turns=1, self_agents=["ExpertB"])
+
+    compactor.update(MOCK_HISTORY)
+    await compactor._task
+    assert compactor.summary is None
+    assert compactor.build_input(MOCK_HISTORY) == build_agent_input(
+        MOCK_HISTORY, ["ExpertB"])
+    assert compactor.tokens_saved == 0
+
+
+@pytest.mark.asyncio
+async def test_dialogue_folds_once_for_both_views_and_charges_folds_to_the_budget(mocker, mock_summary_client,
+                                                                                   make_fake_run, tmp_path):
+    """Views with the same history policy share their folds, and fold usage counts towards the token budget."""
+    policy = {"history_keep_turns": 1, "history_summary_model": "gpt-4.1-mini"}
+    expert = ExpertAgent(load_config("configs/expert_config.yaml", 'expert').model_copy(update=policy))
+    student = StudentAgent(load_config("configs/student_config.yaml", 'student').model_copy(update=policy))
+
+    mocker.patch('agents.Runner.run', side_effect=make_fake_run(goal_after=None, student_reply="Go on.", delay=0.01))
+    mock_summary_client.chat.completions.create.return_value.usage = MagicMock(
+        prompt_tokens=2000, completion_tokens=100, prompt_tokens_details=MagicMock(cached_tokens=0))
+    report = DialogueReport()
+    await run_dialogue(student, expert, max_turns=10, output_dir=str(tmp_path), max_total_tokens=1500,
+                       report=report)
+
+    # The first fold (after the second expert answer) alone exceeds the budget
+    assert report.stop_reason == 'budget_exceeded'
+    assert [c.stage for c in report.calls].count('fold') == 1
+    assert len([c for c in report.calls if c.stage in ('expert', 'student')]) <= 4
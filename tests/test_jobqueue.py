@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from student_expert_flow.config import BatchJob
+from student_expert_flow.jobqueue import JobQueue, run_worker
+
+EXPERT_CONFIG_PATH = "configs/expert_config.yaml"
+STUDENT_CONFIG_PATH = "configs/student_config.yaml"
+
+
+def make_job(**kwargs):
+    return BatchJob(student_config=STUDENT_CONFIG_PATH, expert_config=EXPERT_CONFIG_PATH, **kwargs)
+
+
+def test_claims_are_exclusive_and_stale_leases_are_recovered(tmp_path):
+    path = str(tmp_path / "queue.db")
+    first, second = JobQueue(path, lease_s=0.05, max_attempts=2), JobQueue(path, lease_s=0.05, max_attempts=2)
+    first.enqueue([make_job(name="a"), make_job(name="b")])
+
+    a, b = first.claim("w1"), second.claim("w2")
+    assert {a.job.name, b.job.name} == {"a", "b"}
+    assert second.claim("w2") is None
+
+    # w1 dies: its lease runs out and w2 takes the job over; w1 can no longer record a result
+    time.sleep(0.06)
+    assert second.renew(b.id, "w2")
+    reclaimed = second.claim("w2")
+    assert reclaimed.id == a.id and reclaimed.attempts == 2
+    assert not first.complete(a.id, "w1", {"stop_reason": "max_turns"})
+    assert second.complete(a.id, "w2", {"stop_reason": "max_turns"})
+    assert first.get(a.id).result == {"stop_reason": "max_turns"}
+
+    # A job whose lease keeps running out is given up after max_attempts claims
+    time.sleep(0.06)
+    assert first.claim("w1").id == b.id
+    time.sleep(0.06)
+    assert first.claim("w1") is None
+    assert first.get(b.id).status == 'failed'
+    assert first.stats().unfinished == 0
+    first.close()
+    second.close()
+
+
+@pytest.mark.asyncio
+async def test_workers_sharing_a_queue_run_every_job_once(mocker, mock_summary_client, make_fake_run, tmp_path):
+    mock_run = mocker.patch('agents.Runner.run', side_effect=make_fake_run(delay=0.01))
+    path = str(tmp_path / "queue.db")
+    setup = JobQueue(path)
+    ids = setup.enqueue([make_job(max_turns=2, output_dir=str(tmp_path / "out")) for _ in range(6)])
+    setup.enqueue([BatchJob(student_config="configs/missing.yaml", expert_config=EXPERT_CONFIG_PATH)])
+
+    # Two workers with their own connections, as separate processes would have
+    queues = [JobQueue(path), JobQueue(path)]
+    finished = await asyncio.gather(*(run_worker(queue, concurrency=2, worker_id=f"w{i}", poll_interval_s=0.01)
+                                      for i, queue in enumerate(queues)))
+
+    assert sum(finished) == 7
+    assert mock_run.call_count == 6 * 2  # One expert and one student call per job, none repeated
+    stats = setup.stats()
+    assert stats.completed == 6 and stats.failed == 1
+    result = setup.get(ids[0]).result
+    assert result["goal_achieved"] is True and result["stop_reason"] == 'goal_achieved'
+    assert {setup.get(job_id).worker for job_id in ids} <= {"w0", "w1"}
+    for queue in queues + [setup]:
+        queue.close()
+
+
+class WorkerDied(BaseException):
+    """Ends a dialogue without any cleanup, as a killed worker process would."""
+
+
+@pytest.mark.asyncio
+async def test_reclaimed_job_resumes_from_its_checkpoint(mocker, mock_summary_client, make_fake_run, tmp_path):
+    fake_run = make_fake_run(goal_after=None, die_on_call=4, die_with=WorkerDied)
+    mocker.patch('agents.Runner.run', side_effect=fake_run)
+    out_dir = tmp_path / "out"
+    path = str(tmp_path / "queue.db")
+    queue = JobQueue(path, lease_s=0.05)
+    job_id = queue.enqueue([make_job(max_turns=3, output_dir=str(out_dir))])[0]
+
+    # w0 claims the job and dies during the fourth call; its checkpoint covers the first three
+    with pytest.raises(WorkerDied):
+        await run_worker(queue, concurrency=1, worker_id="w0", poll_interval_s=0.01)
+    checkpoint = queue.get(job_id).checkpoint
+    assert checkpoint and os.path.exists(checkpoint)
+
+    await asyncio.sleep(0.06)
+    assert await run_worker(queue, concurrency=1, worker_id="w1", poll_interval_s=0.01) == 1
+
+    queued = queue.get(job_id)
+    assert queued.status == 'completed' and queued.worker == "w1" and queued.attempts == 2
+    assert queued.result["turns"] == 3 and queued.result["stop_reason"] == 'max_turns'
+    assert len(fake_run.calls) == 5 + 1  # A 3-turn dialogue makes 5 calls; only the one w0 died in is repeated
+    assert not os.path.exists(checkpoint)
+    assert not list(out_dir.glob("*.part"))  # w0's partial transcript was removed by the resume
+    assert len(list(out_dir.glob("*.md"))) == 1
+    queue.close()
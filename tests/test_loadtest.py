@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from student_expert_flow.loadtest import LatencyDistribution, run_load_test
+
+
+def test_latency_distributions_have_the_configured_median():
+    """Each latency distribution is centered on its configured median."""
+    rng = random.Random(1)
+    for kind in ('fixed', 'lognormal', 'pareto'):
+        dist = LatencyDistribution(kind=kind, median=0.2)
+        samples = sorted(dist.sample(rng) for _ in range(2001))
+        assert samples[1000] == pytest.approx(0.2, rel=0.15), kind
+
+    capped = LatencyDistribution(kind='pareto', median=0.2, alpha=0.5, max_latency=1.0)
+    assert max(capped.sample(rng) for _ in range(1000)) <= 1.0
+
+
+@pytest.mark.asyncio
+async def test_load_test_runs_concurrent_dialogues_offline(mocker, tmp_path):
+    """A small load test completes every dialogue and reports its throughput and overhead figures."""
+    # run_load_test installs a synthetic summary client; patching restores the real one afterwards
+    mocker.patch('student_expert_flow.transcript.async_openai_client', None)
+
+    result = await run_load_test(
+        dialogues=20, max_turns=2, latency=LatencyDistribution(kind='fixed', median=0.01),
+        response_chars=200, output_dir=str(tmp_path))
+
+    assert result.completed == 20 and result.failed == 0
+    # expert, student, expert (max turns reached), then one summary call per dialogue
+    assert result.model_calls == 20 * 4
+    # All dialogues run concurrently, so the batch takes about one dialogue's worth of model time
+    assert result.duration_s < 20 * 4 * 0.01
+    assert result.dialogues_per_second > 0
+    assert result.sdk_overhead_per_call_ms >= 0
+    assert result.orchestration_overhead_per_turn_ms >= 0
+    assert result.peak_rss_mb > 0
+    assert len(list(tmp_path.glob("*.md"))) == 20
+
+
+@pytest.mark.asyncio
+async def test_load_test_streams_synthetic_deltas(mocker, tmp_path):
+    """With stream=True every agent call goes through the synthetic model's delta stream."""
+    mocker.patch('student_expert_flow.transcript.async_openai_client', None)
+    emit = mocker.patch('student_expert_flow.runner._emit')
+
+    result = await run_load_test(
+        dialogues=3, max_turns=2, latency=LatencyDistribution(kind='fixed', median=0.01),
+        response_chars=200, output_dir=str(tmp_path), stream=True)
+
+    assert result.completed == 3 and result.failed == 0 and result.stream
+    assert result.model_calls == 3 * 4
+    assert emit.call_count == 3 * 3 * 4  # Three calls per dialogue, 200 characters in four deltas each
+    transcript = next(tmp_path.glob("*.md")).read_text(encoding='utf-8')
+    assert "x" * 200 in transcript
@@ -0,0 +1,43 @@
+from student_expert_flow.microbench import (
+    BenchmarkResult, compare_results, load_baseline, make_history, run_benchmarks, save_baseline)
+from student_expert_flow.transcript import format_transcript
+
+
+def _result(name: str, best_s: float) -> BenchmarkResult:
+    return BenchmarkResult(name=name, iterations=1, repeats=1, best_s=best_s, median_s=best_s)
+
+
+def test_make_history_builds_turns_with_multi_kb_contents():
+    """Synthetic histories alternate expert/student entries and format as regular transcripts."""
+    history = make_history(11, content_bytes=4096)
+    assert len(history) == 11
+    assert history[0]['agent'] == 'System'
+    assert [e['role'] for e in history[1:5]] == ['assistant', 'user', 'assistant', 'user']
+    assert len(history[1]['content']) == 4096
+    assert "## Turn 5" in format_transcript(history, "goal")
+
+
+def test_run_benchmarks_covers_every_hot_path(tmp_path):
+    """A quick run times transcript formatting/saving, filenames, every config and agent construction."""
+    results = run_benchmarks(sizes=[10], repeats=1, min_time=0.001)
+    names = {r.name for r in results}
+    assert {"format_transcript[10]", "save_transcript[10]", "sanitize_filename",
+            "load_config[student_config.yaml]", "load_config[expert_config.yaml]",
+            "StudentAgent()", "ExpertAgent()", "agent_setup[uncached]", "agent_setup[registry]",
+            "config_registry[directory]", "config_registry[job]"} <= names
+    assert not any("batch_manifest" in name for name in names)
+    assert all(r.best_s > 0 and r.best_s <= r.median_s for r in results)
+
+    # Baselines round-trip through JSON
+    path = tmp_path / "baseline.json"
+    save_baseline(results, str(path))
+    assert load_baseline(str(path)) == {r.name: r for r in results}
+
+
+def test_compare_results_flags_only_slowdowns_beyond_threshold():
+    """Only benchmarks slower than baseline * (1 + threshold) count as regressions."""
+    baseline = {"fast": _result("fast", 1.0), "slow": _result("slow", 1.0)}
+    results = [_result("fast", 1.2), _result("slow", 1.5), _result("new", 9.0)]
+    regressions = compare_results(results, baseline, threshold=0.25)
+    assert [r.name for r in regressions] == ["slow"]
+    assert regressions[0].ratio == 1.5
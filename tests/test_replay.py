@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import MagicMock
+
+from agents import Model, ModelProvider, ModelResponse, RunConfig, Usage
+from openai.types.responses import ResponseOutputMessage, ResponseOutputText
+
+from student_expert_flow.participants import StudentAgent, ExpertAgent
+from student_expert_flow.config import load_config
+from student_expert_flow.runner import run_dialogue
+from student_expert_flow.models import StudentOutput
+from student_expert_flow.replay import (
+    Cassette, RecordingModelProvider, RecordingChatClient, ReplayModelProvider, ReplayChatClient, ReplayMissError)
+
+# Config paths
+EXPERT_CONFIG_PATH = "configs/expert_config.yaml"
+STUDENT_CONFIG_PATH = "configs/student_config.yaml"
+
+
+def make_text_response(text: str) -> ModelResponse:
+    """Builds a single-message model response."""
+    message = ResponseOutputMessage(
+        id="msg_1", type="message", role="assistant", status="completed",
+        content=[ResponseOutputText(type="output_text", text=text, annotations=[])])
+    return ModelResponse(output=[message], usage=Usage(requests=1, input_tokens=50, output_tokens=10, total_tokens=60),
+                         response_id="resp_1")
+
+
+class ScriptedModel(Model):
+    """Stand-in for a real model: answers as the expert (text) or the student (JSON)."""
+
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                           *, previous_response_id):
+        self.calls.append(input)
+        if output_schema is not None and not output_schema.is_plain_text():
+            return make_text_response(StudentOutput(
+                is_goal_achieved=len(input) > 3, response_content=f"Question after {len(input)} messages").model_dump_json())
+        return make_text_response(f"Answer to {len(input)} messages")
+
+    def stream_response(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+class ScriptedProvider(ModelProvider):
+    def __init__(self):
+        self.calls = []
+
+    def get_model(self, model_name):
+        return ScriptedModel(self.calls)
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_offline(mocker, mock_summary_client, tmp_path):
+    """Tests that a recorded dialogue replays identically without touching the real model or client."""
+    expert = ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    student = StudentAgent(load_config(STUDENT_CONFIG_PATH, 'student'))
+    cassette_dir = str(tmp_path / "cassettes")
+
+    # --- Record --- #
+    provider = ScriptedProvider()
+    record_cassette = Cassette(cassette_dir)
+    completion = mock_summary_client.chat.completions.create.return_value
+    completion.choices[0].message.content = "Recorded summary."
+    completion.usage = MagicMock(prompt_tokens=100, completion_tokens=20)
+    mocker.patch('student_expert_flow.transcript.async_openai_client',
+                 RecordingChatClient(mock_summary_client, record_cassette))
+    recorded_history = await run_dialogue(
+        student, expert, max_turns=5, output_dir=str(tmp_path / "record"),
+        run_config=RunConfig(model_provider=RecordingModelProvider(
+            record_cassette, inner=provider), tracing_disabled=True))
+    record_cassette.close()
+    assert len(provider.calls) == 4
+    assert recorded_history[-1]['goal_achieved_flag'] is True
+
+    # --- Replay --- #
+    replay_cassette = Cassette(cassette_dir).load()
+    mocker.patch('student_expert_flow.transcript.async_openai_client',
+                 ReplayChatClient(replay_cassette))
+    replayed_history = await run_dialogue(
+        student, expert, max_turns=5, output_dir=str(tmp_path / "replay"),
+        run_config=RunConfig(model_provider=ReplayModelProvider(replay_cassette, latency=0.001),
+                             tracing_disabled=True))
+
+    assert len(provider.calls) == 4  # The scripted model was not called again
+    mock_summary_client.chat.completions.create.assert_awaited_once()
+    assert [e['content'] for e in replayed_history] == [e['content']
+                                                        for e in recorded_history]
+    assert replayed_history[1]['usage']['input_tokens'] == 50
+    summary_files = list((tmp_path / "replay").glob("*.summary.txt"))
+    assert summary_files[0].read_text() == "Recorded summary."
+
+
+def test_cassette_lookup_miss(tmp_path):
+    """Tests that an unrecorded request raises a clear error."""
+    cassette = Cassette(str(tmp_path))
+    cassette.record({"kind": "chat", "key": "abc", "response": {"content": "x"}})
+    cassette.close()
+    loaded = Cassette(str(tmp_path)).load()
+    assert loaded.lookup("abc")['response']['content'] == "x"
+    assert loaded.lookup("abc")['response']['content'] == "x"  # Last record is reused
+    with pytest.raises(ReplayMissError):
+        loaded.lookup("missing")
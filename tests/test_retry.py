@@ -0,0 +1,84 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import openai
+import pytest
+from agents.exceptions import ModelBehaviorError
+
+from student_expert_flow.accounting import DialogueReport
+from student_expert_flow.config import TurnRetryConfig, load_config
+from student_expert_flow.models import StudentOutput
+from student_expert_flow.participants import StudentAgent, ExpertAgent
+from student_expert_flow.retry import classify_error
+from student_expert_flow.runner import StreamIdleTimeout, run_dialogue
+
+FAST_RETRY = TurnRetryConfig(base_delay_s=0.001)
+
+
+def make_status_error(status_code):
+    return openai.APIStatusError("error", response=MagicMock(status_code=status_code, headers={}), body=None)
+
+
+def make_agents():
+    return (StudentAgent(load_config("configs/student_config.yaml", 'student')),
+            ExpertAgent(load_config("configs/expert_config.yaml", 'expert')))
+
+
+def test_errors_are_classified():
+    assert classify_error(openai.APIConnectionError(request=MagicMock())) == 'transient'
+    assert classify_error(openai.APITimeoutError(request=MagicMock())) == 'transient'
+    assert classify_error(StreamIdleTimeout("stuck")) == 'transient'
+    assert classify_error(make_status_error(503)) == 'transient'
+    assert classify_error(ModelBehaviorError("Invalid JSON")) == 'parse'
+    assert classify_error(make_status_error(400)) == 'permanent'
+    assert classify_error(make_status_error(429)) == 'permanent'  # The scheduler's retries were used up
+    assert classify_error(ValueError("bug")) == 'permanent'
+
+
+@pytest.mark.asyncio
+async def test_dialogue_recovers_from_transient_and_parse_errors(mocker, mock_summary_client, tmp_path):
+    """A connection error is retried and unparseable student output is re-asked; the dialogue completes."""
+    student, expert = make_agents()
+    mock_run = mocker.patch('agents.Runner.run', new_callable=AsyncMock, side_effect=[
+        MagicMock(final_output="Decorators wrap functions."),
+        openai.APIConnectionError(request=MagicMock()),
+        ModelBehaviorError("Invalid JSON when parsing StudentOutput"),
+        MagicMock(final_output=StudentOutput(is_goal_achieved=False, response_content="Why?")),
+        MagicMock(final_output="Because they return a new function."),
+        MagicMock(final_output=StudentOutput(is_goal_achieved=True, response_content="Got it!")),
+    ])
+
+    report = DialogueReport()
+    history = await run_dialogue(student, expert, max_turns=3, output_dir=str(tmp_path),
+                                 report=report, retry=FAST_RETRY)
+
+    assert report.stop_reason == 'goal_achieved'
+    assert len(history) == 5
+    assert [r['kind'] for r in history[2]['retries']] == ['transient', 'parse']
+    assert [r.kind for r in report.retries] == ['transient', 'parse']
+    assert all(r.recovered for r in report.retries)
+    assert 'retries' not in history[1]
+    # The re-ask tells the student what went wrong
+    reask_input = mock_run.call_args_list[3].kwargs['input']
+    assert "could not be used" in reask_input[-1]['content']
+    assert "could not be used" not in mock_run.call_args_list[2].kwargs['input'][-1]['content']
+    totals = report.to_dict()['totals']
+    assert totals['retries'] == 2 and totals['reasks'] == 1 and totals['recovered_calls'] == 1
+    # Aborting would have wasted everything spent before the first recovered error (the expert's call)
+    assert report.spend_saved_by_retries == pytest.approx(report.calls[0].cost)
+
+
+@pytest.mark.asyncio
+async def test_permanent_error_and_used_up_budget_end_dialogue(mocker, mock_summary_client, tmp_path):
+    student, expert = make_agents()
+    mock_run = mocker.patch('agents.Runner.run', new_callable=AsyncMock,
+                            side_effect=make_status_error(401))
+    report = DialogueReport()
+    await run_dialogue(student, expert, max_turns=2, output_dir=str(tmp_path), report=report, retry=FAST_RETRY)
+    assert report.stop_reason == 'expert_error' and mock_run.call_count == 1
+
+    mock_run.reset_mock(side_effect=True)
+    mock_run.side_effect = openai.APIConnectionError(request=MagicMock())
+    report = DialogueReport()
+    await run_dialogue(student, expert, max_turns=2, output_dir=str(tmp_path), report=report, retry=FAST_RETRY)
+    assert report.stop_reason == 'expert_error' and mock_run.call_count == 3
+    assert not any(r.recovered for r in report.retries) and report.spend_saved_by_retries == 0.0
@@ -4,10 +4,15 @@ from unittest.mock import MagicMock, AsyncMock
 
 from student_expert_flow.participants import StudentAgent, ExpertAgent
 from student_expert_flow.config import load_config
-from student_expert_flow.runner import run_dialogue
-from agents import Runner
+from student_expert_flow.runner import run_dialogue, _run_agent, _agent_cache_key
+from student_expert_flow.cache import ResponseCache
+from agents import Runner, Model, ModelProvider, RunConfig
+from openai.types.responses import (
+    Response, ResponseCompletedEvent, ResponseOutputMessage, ResponseOutputText, ResponseTextDeltaEvent)
+from openai.types.responses.response_usage import ResponseUsage
 # Import the structured output model for mocking
 from student_expert_flow.models import StudentOutput
+from student_expert_flow.accounting import DialogueReport
 
 # Config paths
 EXPERT_CONFIG_PATH = "configs/expert_config.yaml"
@@ -37,7 +42,7 @@ def create_mock_structured_run_result(output_model: StudentOutput, history_list:
 
 
 @pytest.mark.asyncio
-async def test_run_dialogue_mocked_flow_structured(mocker):  # Renamed test
+async def test_run_dialogue_mocked_flow_structured(mocker, mock_summary_client, tmp_path):  # Renamed test
     """Tests the dialogue flow logic with mocked Runner calls and structured output."""
     expert_config = load_config(EXPERT_CONFIG_PATH, 'expert')
     student_config = load_config(STUDENT_CONFIG_PATH, 'student')
@@ -92,7 +97,7 @@ async def test_run_dialogue_mocked_flow_structured(mocker):  # Renamed test
         mock_student_result_2,  # S2
     ]
 
-    history = await run_dialogue(student, expert, max_turns=test_max_turns)
+    history = await run_dialogue(student, expert, max_turns=test_max_turns, output_dir=str(tmp_path))
 
     # Expect E1, S1, E2 calls. Loop breaks before S2.
     expected_calls = (test_max_turns * 2) - 1
@@ -113,7 +118,7 @@ async def test_run_dialogue_mocked_flow_structured(mocker):  # Renamed test
 
 @pytest.mark.asyncio
 # Renamed test
-async def test_run_dialogue_mocked_goal_achieved_structured(mocker):
+async def test_run_dialogue_mocked_goal_achieved_structured(mocker, mock_summary_client, tmp_path):
     """Tests the dialogue flow ending early with mocked structured output."""
     expert_config = load_config(EXPERT_CONFIG_PATH, 'expert')
     student_config = load_config(STUDENT_CONFIG_PATH, 'student')
@@ -146,7 +151,7 @@ async def test_run_dialogue_mocked_goal_achieved_structured(mocker):
         # Loop should break here, no more calls expected
     ]
 
-    history = await run_dialogue(student, expert, max_turns=5)
+    history = await run_dialogue(student, expert, max_turns=5, output_dir=str(tmp_path))
 
     # Expect 2 calls: Expert T1, Student T1
     assert mock_run.call_count == 2
@@ -159,3 +164,279 @@ async def test_run_dialogue_mocked_goal_achieved_structured(mocker):
     assert history[2]['role'] == 'user' and history[2]['agent'] == student.config.name
     assert history[2]['content'] == "Great, I understand now."
     assert history[2]['goal_achieved_flag'] is True
+
+
+def _prompt_chars(input_list: list) -> int:
+    """Total characters of string content in a model input list."""
+    return sum(len(str(item.get('content', ''))) for item in input_list)
+
+
+@pytest.mark.asyncio
+async def test_run_dialogue_prompt_size_linear_without_duplicates(mocker, mock_summary_client, make_fake_run, tmp_path):
+    """Tests that each utterance is sent once and prompt size grows linearly per turn.
+
+    The previous input scheme (``to_input_list()`` plus a duplicate user message, with the student's
+    JSON-wrapped output on top) is reconstructed alongside for comparison.
+    """
+    expert_config = load_config(EXPERT_CONFIG_PATH, 'expert')
+    student_config = load_config(STUDENT_CONFIG_PATH, 'student')
+    expert = ExpertAgent(expert_config)
+    student = StudentAgent(student_config)
+    test_max_turns = 6
+    response_text = "x" * 1000
+
+    fake_run = make_fake_run(goal_after=None, student_reply=response_text, expert_reply=response_text)
+    mocker.patch('agents.Runner.run', side_effect=fake_run)
+    history = await run_dialogue(student, expert, max_turns=test_max_turns, output_dir=str(tmp_path))
+    captured_inputs = fake_run.inputs
+
+    assert len(captured_inputs) == test_max_turns * 2 - 1
+    new_sizes = [_prompt_chars(i) for i in captured_inputs]
+
+    # Reconstruct the legacy per-call prompt sizes
+    student_json = StudentOutput(
+        is_goal_achieved=False, response_content=response_text).model_dump_json()
+    legacy_sizes = []
+    legacy_size = len(history[0]['content'])
+    for call_index in range(len(captured_inputs)):
+        legacy_sizes.append(legacy_size)
+        if call_index % 2 == 0:  # Expert: assistant item + duplicated user message
+            legacy_size += 2 * len(response_text)
+        else:  # Student: JSON assistant item + duplicated user message
+            legacy_size += len(student_json) + len(response_text)
+
+    # Every utterance appears exactly once in the final prompt
+    last_input = captured_inputs[-1]
+    assert [m['content'] for m in last_input] == [e['content']
+                                                  for e in history[:-1]]
+
+    # Linear growth: each call adds exactly one utterance
+    increments = [b - a for a, b in zip(new_sizes, new_sizes[1:])]
+    assert all(inc == len(response_text) for inc in increments)
+
+    # About half of the legacy prompt size once the conversation is under way
+    ratio = new_sizes[-1] / legacy_sizes[-1]
+    assert 0.4 <= ratio <= 0.6
+
+
+@pytest.mark.asyncio
+async def test_run_dialogue_usage_and_token_budget(mocker, mock_summary_client, make_fake_run, tmp_path):
+    """Tests that per-turn usage is recorded and the dialogue ends once the token budget is hit."""
+    expert_config = load_config(EXPERT_CONFIG_PATH, 'expert')
+    student_config = load_config(STUDENT_CONFIG_PATH, 'student')
+    expert = ExpertAgent(expert_config)
+    student = StudentAgent(student_config)
+
+    mock_run = mocker.patch('agents.Runner.run', side_effect=make_fake_run(
+        goal_after=None, student_reply="More?", expert_reply="Answer.", usage=(400, 100)))
+    mock_summary_client.chat.completions.create.return_value.usage = MagicMock(
+        prompt_tokens=300, completion_tokens=50, prompt_tokens_details=MagicMock(cached_tokens=0))
+    report = DialogueReport()
+    history = await run_dialogue(student, expert, max_turns=5, output_dir=str(tmp_path),
+                                 max_total_tokens=1200, report=report)
+
+    # E1 (500) + S1 (1000) + E2 (1500 >= 1200) -> stop after the third call
+    assert mock_run.call_count == 3
+    assert report.stop_reason == 'budget_exceeded'
+    assert history[1]['usage']['input_tokens'] == 400
+    assert history[1]['usage']['stage'] == 'expert'
+    assert history[2]['usage']['stage'] == 'student'
+    assert [c.stage for c in report.calls][:3] == ['expert', 'student', 'expert']
+    # The summary still runs after the budget ended the dialogue, and its usage is reported too
+    mock_summary_client.chat.completions.create.assert_awaited_once()
+    summary_call = report.calls[-1]
+    assert summary_call.stage == 'summary'
+    assert (summary_call.input_tokens, summary_call.output_tokens) == (300, 50)
+    # The transcript and usage report are still written when the budget ends the dialogue
+    assert len(list(tmp_path.glob("transcript_*.md"))) == 1
+    assert len(list(tmp_path.glob("transcript_*.report.json"))) == 1
+
+
+class ChunkedStreamModel(Model):
+    """Fake streaming model: answers as the expert (text) or the student (JSON) in small deltas."""
+
+    def __init__(self, first_delta_delay: float = 0.0):
+        self.first_delta_delay = first_delta_delay
+
+    async def get_response(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                              *, previous_response_id):
+        if output_schema is not None and not output_schema.is_plain_text():
+            text = StudentOutput(is_goal_achieved=len(input) > 3,
+                                 response_content="Tell me more.").model_dump_json()
+        else:
+            text = "Decorators\nwrap functions."
+        await asyncio.sleep(self.first_delta_delay)
+        for i in range(0, len(text), 5):
+            await asyncio.sleep(0.001)
+            yield ResponseTextDeltaEvent.model_construct(
+                type="response.output_text.delta", delta=text[i:i + 5], item_id="msg_1",
+                output_index=0, content_index=0, sequence_number=i, logprobs=[])
+        message = ResponseOutputMessage(
+            id="msg_1", type="message", role="assistant", status="completed",
+            content=[ResponseOutputText(type="output_text", text=text, annotations=[])])
+        yield ResponseCompletedEvent.model_construct(
+            type="response.completed", sequence_number=len(text),
+            response=Response.model_construct(
+                id="resp_1", output=[message],
+                usage=ResponseUsage.model_construct(input_tokens=50, output_tokens=20, total_tokens=70)))
+
+
+class ChunkedStreamProvider(ModelProvider):
+    def __init__(self, model: Model):
+        self.model = model
+
+    def get_model(self, model_name):
+        return self.model
+
+
+@pytest.mark.asyncio
+async def test_run_dialogue_streaming_forwards_deltas_and_records_ttft(mocker, mock_summary_client, tmp_path):
+    """Tests that streamed deltas reach the callback and the live transcript, and TTFT/tokens/s are recorded."""
+    expert = ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    student = StudentAgent(load_config(STUDENT_CONFIG_PATH, 'student'))
+    mock_run = mocker.patch('agents.Runner.run')
+    live_paths = []
+    deltas = []
+
+    def on_token(stage, agent_name, delta):
+        deltas.append((stage, agent_name, delta))
+        # The live transcript is written while the dialogue is still running
+        live_paths.extend(p for p in tmp_path.glob("*.live.md") if p not in live_paths)
+
+    report = DialogueReport()
+    run_config = RunConfig(model_provider=ChunkedStreamProvider(ChunkedStreamModel()), tracing_disabled=True)
+    history = await run_dialogue(student, expert, max_turns=3, output_dir=str(tmp_path), report=report,
+                                 run_config=run_config, stream=True, on_token=on_token)
+
+    mock_run.assert_not_called()
+    assert history[1]['content'] == "Decorators\nwrap functions."
+    assert history[-1]['goal_achieved_flag'] is True
+    expert_text = "".join(d for stage, _, d in deltas if stage == 'expert')
+    assert expert_text == "Decorators\nwrap functions." * 2
+    assert {name for _, name, _ in deltas} == {expert.config.name, student.config.name}
+    for call in report.calls[:3]:
+        assert call.ttft_s is not None and call.ttft_s > 0
+        assert call.tokens_per_s and call.tokens_per_s > 0
+    # The live file existed during the run and is replaced by the final transcript afterwards
+    assert len(live_paths) == 1 and not live_paths[0].exists()
+    assert len(list(tmp_path.glob("transcript_*.md"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_run_dialogue_streaming_idle_timeout_cancels_stuck_generation(mocker, mock_summary_client, tmp_path):
+    """Tests that a generation producing no output within the idle timeout is cancelled early."""
+    expert = ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    student = StudentAgent(load_config(STUDENT_CONFIG_PATH, 'student'))
+
+    report = DialogueReport()
+    run_config = RunConfig(model_provider=ChunkedStreamProvider(
+        ChunkedStreamModel(first_delta_delay=30)), tracing_disabled=True)
+    start = asyncio.get_running_loop().time()
+    history = await run_dialogue(student, expert, max_turns=3, output_dir=str(tmp_path), report=report,
+                                 run_config=run_config, stream=True, stream_idle_timeout=0.1)
+
+    assert asyncio.get_running_loop().time() - start < 5
+    assert report.stop_reason == 'expert_error'
+    assert len(history) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_streamed_call_raises_and_is_not_cached(tmp_path):
+    """A streamed call cancelled from outside raises CancelledError instead of returning an unfinished result."""
+    expert = ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    run_config = RunConfig(model_provider=ChunkedStreamProvider(
+        ChunkedStreamModel(first_delta_delay=0.3)), tracing_disabled=True)
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    agent_input = [{"role": "user", "content": "Explain decorators."}]
+    call = asyncio.ensure_future(_run_agent(expert.agent, agent_input, 'expert', expert.config.model,
+                                            cache=cache, run_config=run_config, stream=True))
+    await asyncio.sleep(0.1)
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    assert cache.get(_agent_cache_key(expert.agent, expert.config.model, agent_input)) is None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_run_dialogue_killed_mid_dialogue_keeps_partial_transcript(mocker, make_fake_run, tmp_path):
+    """Tests that completed turns are already on disk when the dialogue is killed mid-way."""
+    expert = ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    student = StudentAgent(load_config(STUDENT_CONFIG_PATH, 'student'))
+    # The third call is cancelled, e.g. because the process is being shut down
+    mocker.patch('agents.Runner.run', side_effect=make_fake_run(
+        goal_after=None, student_reply="Question 1", expert_reply="Answer 1", die_on_call=3))
+    with pytest.raises(asyncio.CancelledError):
+        await run_dialogue(student, expert, max_turns=5, output_dir=str(tmp_path))
+
+    assert not list(tmp_path.glob("transcript_*.md"))
+    parts = list(tmp_path.glob("transcript_*.md.part"))
+    assert len(parts) == 1
+    partial = parts[0].read_text(encoding='utf-8')
+    assert "## Turn 1" in partial and "> Answer 1" in partial and "> Question 1" in partial
+    assert len(list(tmp_path.glob("transcript_*.jsonl.part"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_run_dialogue_rolling_summary(mocker, mock_summary_client, make_fake_run, tmp_path):
+    """Tests that the rolling summary is built during the dialogue and used as the final summary."""
+    expert = ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    student = StudentAgent(load_config(STUDENT_CONFIG_PATH, 'student'))
+
+    mocker.patch('agents.Runner.run', side_effect=make_fake_run(
+        goal_after=None, student_reply="More?", expert_reply="Answer.", delay=0.01))
+    report = DialogueReport()
+    await run_dialogue(student, expert, max_turns=3, output_dir=str(tmp_path), report=report,
+                       rolling_summary=True)
+
+    assert report.summary_mode == 'rolling'
+    assert report.summary_tail_latency_s is not None
+    assert report.summary_latency_saved_s is not None
+    # One fold per completed turn (2) plus the final expert response; never the whole transcript
+    prompts = [c.kwargs['messages'][1]['content'] for c in mock_summary_client.chat.completions.create.call_args_list]
+    assert 2 <= len(prompts) <= 3
+    assert all("Conversation Transcript" not in p for p in prompts)
+    summary_files = list(tmp_path.glob("*.summary.txt"))
+    assert summary_files[0].read_text(encoding='utf-8') == "Summary."
+
+
+@pytest.mark.asyncio
+async def test_run_dialogue_turn_timeout_and_deadline_save_partial_dialogue(mocker, mock_summary_client, tmp_path):
+    """Tests that a hung call is cancelled by the turn timeout or deadline and the partial dialogue is still saved."""
+    expert = ExpertAgent(load_config(EXPERT_CONFIG_PATH, 'expert'))
+    student = StudentAgent(load_config(STUDENT_CONFIG_PATH, 'student'))
+    cancelled = []
+
+    async def fake_run(agent, input, **kwargs):
+        if agent is student.agent:
+            try:
+                await asyncio.sleep(30)  # e.g. a hung connection
+            except asyncio.CancelledError:
+                cancelled.append(agent.name)
+                raise
+        return create_mock_text_run_result("Answer.", [])
+
+    mocker.patch('agents.Runner.run', side_effect=fake_run)
+    report = DialogueReport()
+    history = await run_dialogue(student, expert, max_turns=3, output_dir=str(tmp_path / "turn"), report=report,
+                                 turn_timeout=0.1)
+
+    assert report.stop_reason == 'turn_timeout'
+    assert cancelled == [student.config.name]
+    assert [(c.stage, c.turn, c.reason) for c in report.cancellations] == [('student', 1, 'turn_timeout')]
+    assert len(history) == 2
+    assert len(list((tmp_path / "turn").glob("transcript_*.md"))) == 1
+    assert len(list((tmp_path / "turn").glob("*.summary.txt"))) == 1
+
+    # The deadline caps the call to what is left of it, even below the turn timeout
+    report = DialogueReport()
+    start = asyncio.get_running_loop().time()
+    await run_dialogue(student, expert, max_turns=3, output_dir=str(tmp_path / "deadline"), report=report,
+                       turn_timeout=10, dialogue_deadline=0.2)
+    assert asyncio.get_running_loop().time() - start < 5
+    assert report.stop_reason == 'deadline_exceeded'
+    assert report.cancellations[0].stage == 'student' and report.cancellations[0].reason == 'dialogue_deadline'
+    assert len(list((tmp_path / "deadline").glob("*.summary.txt"))) == 1
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import openai
+import pytest
+
+from student_expert_flow.config import ModelRateLimit, RateLimitConfig, load_config
+from student_expert_flow.models import StudentOutput
+from student_expert_flow.participants import StudentAgent, ExpertAgent
+from student_expert_flow.runner import run_dialogue
+from student_expert_flow.scheduler import RateLimitScheduler, TokenBucket, retry_after_s
+
+
+def make_rate_limit_error(headers=None):
+    response = MagicMock(status_code=429, headers=headers or {})
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def test_retry_after_headers_are_parsed():
+    assert retry_after_s(make_rate_limit_error({'retry-after-ms': '250'})) == pytest.approx(0.25)
+    assert retry_after_s(make_rate_limit_error({'retry-after': '3'})) == 3.0
+    assert retry_after_s(make_rate_limit_error(
+        {'x-ratelimit-reset-requests': '1m0.5s', 'x-ratelimit-reset-tokens': '250ms'})) == pytest.approx(60.5)
+    assert retry_after_s(make_rate_limit_error()) is None
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_queues_calls_beyond_capacity():
+    """Calls beyond the bucket's capacity wait for the refill instead of failing."""
+    bucket = TokenBucket(capacity=2, refill_per_s=20)
+    start = time.perf_counter()
+    await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+    # Two calls go straight through, the other two wait for 1/20s each
+    assert time.perf_counter() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_scheduler_shares_buckets_between_snapshots_and_settles_usage():
+    scheduler = RateLimitScheduler(RateLimitConfig(
+        models={'gpt-4.1-mini': ModelRateLimit(tpm=1000)}, headroom=1.0))
+
+    async def call():
+        return 'ok'
+
+    await scheduler.run('gpt-4.1-mini-2025-04-14', call, estimated_tokens=100, tokens_used=lambda r: 300)
+    await scheduler.run('gpt-4.1-mini', call, estimated_tokens=100, tokens_used=lambda r: 100)
+    # Both calls drew on the same TPM bucket, corrected to their real usage
+    assert scheduler._limiter('gpt-4.1-mini').tokens.available == pytest.approx(600, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_calls_are_retried_not_failed():
+    """A 429 pauses the model for the retry-after the provider asked for, then the call is retried."""
+    scheduler = RateLimitScheduler(RateLimitConfig(max_retries=3, base_delay_s=0.001))
+    call = AsyncMock(side_effect=[make_rate_limit_error({'retry-after-ms': '30'}),
+                                  make_rate_limit_error({'retry-after-ms': '30'}), 'done'])
+
+    start = time.perf_counter()
+    assert await scheduler.run('gpt-4.1-mini', call) == 'done'
+    assert time.perf_counter() - start >= 0.06
+    assert scheduler.stats.rate_limited == 2 and scheduler.stats.retries == 2
+
+    # Other errors, and rate limits beyond max_retries, still propagate
+    with pytest.raises(ValueError):
+        await scheduler.run('gpt-4.1-mini', AsyncMock(side_effect=ValueError("bad")))
+    scheduler.config.max_retries = 0
+    with pytest.raises(openai.RateLimitError):
+        await scheduler.run('gpt-4.1-mini', AsyncMock(side_effect=make_rate_limit_error()))
+    assert scheduler.stats.gave_up == 1
+
+
+@pytest.mark.asyncio
+async def test_dialogue_survives_rate_limited_turn(mocker, mock_summary_client, tmp_path):
+    """A 429 on an agent call delays the turn instead of ending the dialogue."""
+    mocker.patch('student_expert_flow.scheduler._scheduler',
+                 RateLimitScheduler(RateLimitConfig(base_delay_s=0.001)))
+    expert = ExpertAgent(load_config("configs/expert_config.yaml", 'expert'))
+    student = StudentAgent(load_config("configs/student_config.yaml", 'student'))
+
+    student_output = StudentOutput(is_goal_achieved=True, response_content="Got it, thanks!")
+    mocker.patch('agents.Runner.run', new_callable=AsyncMock, side_effect=[
+        make_rate_limit_error({'retry-after-ms': '10'}),
+        MagicMock(final_output="Decorators wrap functions."),
+        MagicMock(final_output=student_output),
+    ])
+
+    history = await run_dialogue(student, expert, max_turns=2, output_dir=str(tmp_path))
+
+    assert [entry['agent'] for entry in history] == ['System', expert.config.name, student.config.name]
+    assert history[-1]['goal_achieved_flag'] is True
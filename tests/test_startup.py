@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from student_expert_flow import main as main_module
+from student_expert_flow.startup import HEAVY_MODULES, STARTUP_BUDGET_S, parse_importtime, profile_imports
+
+# Wall-clock budgets fail on loaded machines, so timing tests only run when asked for
+BENCHMARKS_ENV_VAR = "STUDENT_EXPERT_FLOW_BENCHMARKS"
+
+# Runs in a fresh interpreter and reports the import time of the CLI and which heavy modules got loaded
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import student_expert_flow.main as main
+elapsed = time.perf_counter() - start
+if sys.argv[1:]:
+    sys.argv = ["student-expert-flow"] + sys.argv[1:]
+    main.main()
+print(json.dumps({"elapsed": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe(*cli_args):
+    completed = subprocess.run([sys.executable, "-c", PROBE, *cli_args], capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_cli_startup_imports_no_heavy_modules():
+    """Importing the CLI loads none of the agents SDK, openai or httpx."""
+    imported = {timing.module.split('.', 1)[0] for timing in profile_imports(['student_expert_flow.main'])}
+    assert 'student_expert_flow' in imported
+    assert imported.isdisjoint(HEAVY_MODULES)
+
+    # Validating a batch manifest (and every config its jobs name) stays on the light path, too
+    probe = run_probe("--validate-only", "--batch", "configs/batch_manifest_example.yaml",
+                      "--rate-limits", "configs/rate_limits.yaml")
+    assert probe["heavy"] == []
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(os.environ.get(BENCHMARKS_ENV_VAR) != "1", reason=f"set {BENCHMARKS_ENV_VAR}=1 to run")
+def test_cli_startup_stays_within_budget():
+    """Importing the CLI in a fresh interpreter takes less than the startup budget."""
+    probes = [run_probe() for _ in range(3)]
+    assert min(probe["elapsed"] for probe in probes) < STARTUP_BUDGET_S
+
+
+def test_validate_only_reports_invalid_configs(tmp_path):
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text("jobs:\n  - student_config: configs/student_config.yaml\n"
+                        "    expert_config: configs/missing.yaml\n")
+    parser = main_module._build_parser()
+    assert main_module.validate_configs(parser.parse_args(
+        ["--validate-only", "--student-config", "configs/student_config.yaml"])) == 0
+    # An expert config is not a valid student config, and a manifest is invalid if a job's config is missing
+    assert main_module.validate_configs(parser.parse_args(
+        ["--validate-only", "--student-config", "configs/expert_config.yaml"])) == 1
+    assert main_module.validate_configs(parser.parse_args(["--validate-only", "--batch", str(manifest)])) == 1
+
+
+def test_parse_importtime():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |     yaml.error\n"
+              "import time:       300 |        420 |   yaml\n"
+              "import time:        50 |        470 | student_expert_flow.config\n"
+              "unrelated warning\n")
+    timings = parse_importtime(stderr)
+    assert [(t.module, t.self_us, t.cumulative_us, t.depth) for t in timings] == [
+        ("yaml.error", 120, 120, 2), ("yaml", 300, 420, 1), ("student_expert_flow.config", 50, 470, 0)]
@@ -1,9 +1,15 @@
 import pytest
+import asyncio
 import os
 import re
+import json
+import time
+import datetime
 from unittest.mock import AsyncMock, MagicMock  # Import mocking utilities
 # Add generate_summary
-from student_expert_flow.transcript import save_transcript, _sanitize_filename, format_transcript, generate_summary
+from student_expert_flow.transcript import save_transcript, _sanitize_filename, format_transcript, generate_summary, TranscriptWriter, RollingSummarizer, split_transcript_on_turns
+from student_expert_flow.transcript import entry_from_record, iter_transcript_records, transcript_markdown_from_jsonl
+from student_expert_flow.accounting import DialogueReport
 from openai import OpenAIError  # Import specific exception for testing
 
 # Sample history data for testing
@@ -43,10 +49,8 @@ def test_save_transcript(tmp_path):
     """Tests saving a transcript to a temporary directory in Markdown format."""
     output_dir = tmp_path / "test_transcripts"
 
-    # Run the function - Pass the formatted transcript
-    formatted_transcript = format_transcript(MOCK_HISTORY, MOCK_GOAL)
-    saved_path = save_transcript(
-        MOCK_HISTORY, MOCK_GOAL, formatted_transcript=formatted_transcript, output_dir=str(output_dir))
+    # Run the function
+    saved_path = save_transcript(MOCK_HISTORY, MOCK_GOAL, output_dir=str(output_dir))
 
     # 1. Check if the path is correct and file exists
     assert os.path.exists(saved_path)
@@ -139,3 +143,240 @@ async def test_generate_summary_openai_error(mocker):
 
     assert "[Summary generation failed due to API error" in summary
     assert "API connection error" in summary
+
+
+def _without_timestamp(text: str) -> str:
+    return re.sub(r"## Timestamp\n> .*", "", text)
+
+
+@pytest.mark.parametrize("history", [
+    MOCK_HISTORY,
+    # Expert first, a trailing expert turn without a student reply, and multi-line content
+    [{"role": "user", "agent": "System", "content": "Goal"},
+     {"role": "assistant", "agent": "ExpertB", "content": "Line 1\nLine 2", "used_web_search": False},
+     {"role": "user", "agent": "StudentA", "content": "Thanks", "goal_achieved_flag": False},
+     {"role": "assistant", "agent": "ExpertB", "content": "More", "used_web_search": True}],
+])
+def test_transcript_writer_matches_format_transcript(tmp_path, history):
+    """Tests that the incremental writer produces exactly the Markdown of format_transcript plus a JSONL log."""
+    writer = TranscriptWriter(MOCK_GOAL, output_dir=str(tmp_path))
+    for entry in history:
+        writer.append(entry)
+    path = writer.finalize()
+
+    assert path.endswith(".md") and not os.path.exists(path + ".part")
+    with open(path, 'r', encoding='utf-8') as f:
+        assert _without_timestamp(f.read()) == _without_timestamp(
+            format_transcript(history, MOCK_GOAL))
+
+    with open(writer.jsonl_path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert records[0]['type'] == 'header' and records[0]['goal'] == MOCK_GOAL
+    assert [entry_from_record(r) for r in records[1:-1]] == history
+    assert records[-1] == {"type": "end"}
+    # The records alone reproduce the Markdown
+    with open(path, 'r', encoding='utf-8') as f:
+        assert transcript_markdown_from_jsonl(writer.jsonl_path) == f.read()
+
+
+def test_transcript_writer_leaves_partial_transcript_without_finalize(tmp_path):
+    """Tests that entries are on disk as soon as they are appended, before the dialogue finishes."""
+    writer = TranscriptWriter(MOCK_GOAL, output_dir=str(tmp_path))
+    for entry in MOCK_HISTORY[:3]:
+        writer.append(entry)
+
+    # Simulated crash: nothing finalized, but the .part files already hold every entry
+    assert not os.path.exists(writer.path)
+    with open(writer.part_path, 'r', encoding='utf-8') as f:
+        partial = f.read()
+    assert "**[ExpertB (assistant)]**\n> Answer 1" in partial
+    assert "--- End Transcript ---" not in partial
+    with open(writer.jsonl_path + ".part", 'r', encoding='utf-8') as f:
+        assert len(f.readlines()) == 4  # header + 3 entries
+    writer.close()
+
+    # A second dialogue with the same goal gets its own files
+    other = TranscriptWriter(MOCK_GOAL, output_dir=str(tmp_path))
+    assert other.path != writer.path
+    other.close()
+
+
+@pytest.mark.asyncio
+async def test_transcript_writer_async_fsyncs_off_the_event_loop(mocker, tmp_path):
+    """Slow fsyncs of append_async/finalize_async run in a thread while the event loop keeps going."""
+    writer = TranscriptWriter(MOCK_GOAL, output_dir=str(tmp_path))
+    mocker.patch('student_expert_flow.transcript.os.fsync', side_effect=lambda fd: time.sleep(0.05))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.ensure_future(ticker())
+    for entry in MOCK_HISTORY:
+        await writer.append_async(entry)
+    path = await writer.finalize_async()
+    task.cancel()
+    assert ticks >= 20  # 12 fsyncs of 0.05s; a blocked loop would not have ticked at all
+    with open(path, 'r', encoding='utf-8') as f:
+        assert _without_timestamp(f.read()) == _without_timestamp(format_transcript(MOCK_HISTORY, MOCK_GOAL))
+
+
+def test_save_transcript_pairs_files_under_one_name_and_timestamp(mocker, tmp_path):
+    """The .md and .jsonl share the header's timestamp and skip a name taken by either file."""
+    now = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    mocker.patch('student_expert_flow.transcript.datetime').datetime.now.return_value = now
+    stem = tmp_path / f"transcript_20260102_030405_{_sanitize_filename(MOCK_GOAL)}"
+    (tmp_path / (stem.name + ".jsonl")).write_text("taken\n", encoding='utf-8')
+
+    path = save_transcript(MOCK_HISTORY, MOCK_GOAL, output_dir=str(tmp_path))
+    second_path = save_transcript(MOCK_HISTORY, MOCK_GOAL, output_dir=str(tmp_path))
+
+    assert path == str(stem) + "_1.md" and second_path == str(stem) + "_2.md"
+    assert not os.path.exists(str(stem) + ".md")  # The name reserved during the collision was released
+    assert (tmp_path / (stem.name + ".jsonl")).read_text(encoding='utf-8') == "taken\n"
+    header = next(iter_transcript_records(str(stem) + "_1.jsonl"))
+    assert header['timestamp'] == now.isoformat()
+    with open(path, 'r', encoding='utf-8') as f:
+        assert f.read() == transcript_markdown_from_jsonl(str(stem) + "_1.jsonl")
+
+
+def test_jsonl_records_stream_and_render_markdown(tmp_path):
+    """save_transcript writes JSONL records next to the Markdown; the reader streams them, also from a crashed run."""
+    history = MOCK_HISTORY[:3] + [{"role": "user", "agent": "StudentA", "content": "Got it", "goal_achieved_flag": True,
+                                   "usage": {"input_tokens": 12, "output_tokens": 3, "latency_s": 0.4}}]
+    path = save_transcript(history, MOCK_GOAL, output_dir=str(tmp_path))
+    jsonl_path = path[:-len(".md")] + ".jsonl"
+
+    records = list(iter_transcript_records(jsonl_path))
+    assert [r['type'] for r in records] == ['header', 'entry', 'entry', 'entry', 'entry', 'end']
+    assert [r['turn'] for r in records[1:-1]] == [0, 0, 1, 1]
+    assert records[-2]['goal_achieved_flag'] is True and records[-2]['usage']['latency_s'] == 0.4
+    with open(path, 'r', encoding='utf-8') as f:
+        assert f.read() == transcript_markdown_from_jsonl(jsonl_path)
+
+    # A crash mid-write leaves a truncated last line, which the reader skips
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    partial_path = tmp_path / "partial.jsonl.part"
+    partial_path.write_text("".join(lines[:3]) + lines[3][:20])
+    assert len(list(iter_transcript_records(str(partial_path)))) == 3
+    assert "--- End Transcript ---" not in transcript_markdown_from_jsonl(str(partial_path))
+    # Corruption elsewhere is an error
+    partial_path.write_text(lines[0] + "{broken\n" + lines[1])
+    with pytest.raises(ValueError, match="line 2"):
+        list(iter_transcript_records(str(partial_path)))
+
+
+def make_fold_client(fail: bool = False):
+    """Summary client stand-in that returns "Summary <n>" after a short delay, recording each request."""
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        await asyncio.sleep(0.01)
+        if fail:
+            raise OpenAIError("boom")
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=f"Summary {len(requests)}"))],
+                         usage=MagicMock(prompt_tokens=10, completion_tokens=5))
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    return client, requests
+
+
+@pytest.mark.asyncio
+async def test_rolling_summarizer_folds_only_new_turns(mocker):
+    """Tests that each background update sends only the entries added since the previous one."""
+    client, requests = make_fold_client()
+    mocker.patch('student_expert_flow.transcript.async_openai_client', client)
+    report = DialogueReport()
+    summarizer = RollingSummarizer(model="gpt-4.1-mini", report=report)
+
+    history = list(MOCK_HISTORY[:3])
+    summarizer.update(history)
+    await asyncio.sleep(0.05)  # The next turn runs while the fold happens
+    history.extend(MOCK_HISTORY[3:])
+    summary = await summarizer.finish(history)
+
+    assert summary == "Summary 2"
+    assert len(requests) == 2
+    second_prompt = requests[1]['messages'][1]['content']
+    assert "Current summary:\nSummary 1" in second_prompt
+    assert "Answer 2 with citation" in second_prompt and "Answer 1" not in second_prompt
+    assert [c.stage for c in report.calls] == ['summary', 'summary']
+    assert summarizer.tail_latency_s is not None
+
+
+@pytest.mark.asyncio
+async def test_rolling_summarizer_failure_falls_back(mocker):
+    """Tests that a failed update makes finish() return None so the caller summarizes post-hoc."""
+    client, requests = make_fold_client(fail=True)
+    mocker.patch('student_expert_flow.transcript.async_openai_client', client)
+    summarizer = RollingSummarizer()
+    summarizer.update(list(MOCK_HISTORY[:3]))
+    assert await summarizer.finish(list(MOCK_HISTORY)) is None
+    assert len(requests) == 1  # No further updates once rolling has failed
+
+
+def _long_history(turns: int):
+    history = [{"role": "user", "agent": "System", "content": "Goal: Test goal"}]
+    for i in range(1, turns + 1):
+        history.append({"role": "assistant", "agent": "ExpertB", "content": f"Answer {i} " + "x" * 400,
+                        "used_web_search": False})
+        history.append({"role": "user", "agent": "StudentA", "content": f"Question {i}"})
+    return history
+
+
+def test_split_transcript_on_turns():
+    """Tests that chunks hold whole turns, each with the header, and cover every turn once."""
+    transcript = format_transcript(_long_history(10), MOCK_GOAL)
+    chunks = split_transcript_on_turns(transcript, chunk_tokens=320)  # ~1280 chars: header + two ~520-char turns
+
+    assert len(chunks) == 5
+    for chunk in chunks:
+        assert chunk.startswith("# Conversation Transcript") and MOCK_GOAL in chunk
+        assert chunk.count("## Turn ") == 2
+    assert [t for chunk in chunks for t in re.findall(r"## Turn (\d+)", chunk)] == [str(i) for i in range(1, 11)]
+    assert chunks[-1].endswith("--- End Transcript ---")
+    # Short transcripts stay in one piece
+    assert split_transcript_on_turns(MOCK_FORMATTED_TRANSCRIPT, chunk_tokens=8000) == [MOCK_FORMATTED_TRANSCRIPT]
+
+
+@pytest.mark.asyncio
+async def test_generate_summary_map_reduce_for_long_transcripts(mocker):
+    """Tests that long transcripts are summarized in concurrent chunks plus a merge, short ones in one call."""
+    in_flight = max_in_flight = 0
+    requests = []
+
+    async def create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        requests.append(kwargs)
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=f"Partial {len(requests)}"))])
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    mocker.patch('student_expert_flow.transcript.async_openai_client', client)
+
+    transcript = format_transcript(_long_history(10), MOCK_GOAL)
+    report = DialogueReport()
+    summary = await generate_summary(transcript, chunk_tokens=320, max_concurrency=2, report=report)
+
+    # 5 chunk summaries (at most 2 at a time), then one merge call over the partial summaries
+    assert len(requests) == 6
+    assert max_in_flight == 2
+    merge_input = requests[-1]['messages'][1]['content']
+    assert "### Part 5" in merge_input and "## Turn" not in merge_input
+    assert summary == "Partial 6"
+    assert len(report.calls) == 6
+
+    requests.clear()
+    await generate_summary(MOCK_FORMATTED_TRANSCRIPT, chunk_tokens=8000)
+    assert len(requests) == 1
+    assert requests[0]['messages'][1]['content'] == MOCK_FORMATTED_TRANSCRIPT